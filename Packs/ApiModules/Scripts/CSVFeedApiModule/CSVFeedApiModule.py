@@ -4,21 +4,25 @@ from CommonServerUserPython import *
 
 ''' IMPORTS '''
 import csv
-import gzip
+import codecs
+import zlib
 import urllib3
 from dateutil.parser import parse
-from typing import Optional, Pattern, Dict, Any, Tuple, Union
+from typing import Optional, Pattern, Dict, Any, Tuple, Union, Iterator
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
+# the size of the chunks the feed content is read in
+CHUNK_SIZE = 64 * 1024
+
 
 class Client(BaseClient):
     def __init__(self, url: str, feed_url_to_config: Optional[Dict[str, dict]] = None, fieldnames: str = '',
                  insecure: bool = False, credentials: dict = None, ignore_regex: str = None, encoding: str = 'latin-1',
                  delimiter: str = ',', doublequote: bool = True, escapechar: str = '',
                  quotechar: str = '"', skipinitialspace: bool = False, polling_timeout: int = 20, proxy: bool = False,
-                 **kwargs):
+                 max_workers: int = 10, **kwargs):
         """
         :param url: URL of the feed.
         :param feed_url_to_config: for each URL, a configuration of the feed that contains
@@ -59,6 +63,7 @@ class Client(BaseClient):
             <https://docs.python.org/2/library/csv.html#dialects-and-formatting-parameters>`. Default False
         :param polling_timeout: timeout of the polling request in seconds. Default: 20
         :param proxy: Sets whether use proxy when sending requests
+        :param max_workers: The maximal number of feed URLs to request at the same time. Default: 10
         """
         if not credentials:
             credentials = {}
@@ -77,7 +82,12 @@ class Client(BaseClient):
             if username is not None and password is not None:
                 auth = (username, password)
 
-        super().__init__(base_url=url, proxy=proxy, verify=not insecure, auth=auth)
+        try:
+            self.max_workers = int(max_workers)
+        except (ValueError, TypeError):
+            return_error('Please provide an integer value for "Max Workers"')
+        # a single pooled session is shared by the concurrent requests of all the feed URLs
+        super().__init__(base_url=url, proxy=proxy, verify=not insecure, auth=auth, pool_maxsize=self.max_workers)
 
         try:
             self.polling_timeout = int(polling_timeout)
@@ -96,51 +106,84 @@ class Client(BaseClient):
             'quotechar': quotechar,
             'skipinitialspace': skipinitialspace
         }
-
-    def _build_request(self, url):
+        # when set, feed URLs which were not modified since the last fetch are skipped
+        self.source_tracker: Optional[FeedSourceTracker] = None
+        # when set, only indicators which are new or were changed since the last fetch are returned
+        self.delta_tracker: Optional[FeedDeltaTracker] = None
+        # the feed URLs which failed in the last build_iterator call, mapped to their errors
+        self.failed_urls: Dict[str, Exception] = {}
+
+    def _build_request(self, url, headers=None):
         r = requests.Request(
             'GET',
             url,
+            headers=headers,
             auth=self._auth
         )
 
         return r.prepare()
 
+    def _send_request(self, url, spool_content=False, **kwargs):
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.headers)
+        if self.source_tracker:
+            headers.update(self.source_tracker.get_request_headers(url))
+        prepreq = self._build_request(url, headers)
+
+        # this is to honour the proxy environment variables
+        kwargs.update(self._session.merge_environment_settings(
+            prepreq.url,
+            {}, None, None, None  # defaults
+        ))
+        kwargs['stream'] = True
+        kwargs['verify'] = self._verify
+        kwargs['timeout'] = self.polling_timeout
+
+        try:
+            r = self._session.send(prepreq, **kwargs)
+        except requests.ConnectionError:
+            raise requests.ConnectionError('Failed to establish a new connection.'
+                                           ' Please make sure your URL is valid.')
+        try:
+            r.raise_for_status()
+        except Exception:
+            raise DemistoException('Exception in request: {} {}'.format(r.status_code, r.content))
+        if self.source_tracker:
+            if self.source_tracker.is_not_modified(url, r):
+                return None
+            if self.source_tracker.needs_digest(r):
+                # the server does not support conditional requests, compare the content itself
+                content_file, digest = FeedSourceTracker.spool_response_content(r, chunk_size=CHUNK_SIZE)
+                if self.source_tracker.is_content_unchanged(url, digest):
+                    content_file.close()
+                    return None
+                return content_file
+        if spool_content:
+            # the body is read right away, so the server does not wait for it while other feeds are parsed
+            content_file, _ = FeedSourceTracker.spool_response_content(r, chunk_size=CHUNK_SIZE)
+            return content_file
+        return r
+
     def build_iterator(self, **kwargs):
         results = []
         urls = self._base_url
         if not isinstance(urls, list):
             urls = [urls]
-        for url in urls:
-            _session = requests.Session()
-
-            prepreq = self._build_request(url)
-
-            # this is to honour the proxy environment variables
-            kwargs.update(_session.merge_environment_settings(
-                prepreq.url,
-                {}, None, None, None  # defaults
-            ))
-            kwargs['stream'] = True
-            kwargs['verify'] = self._verify
-            kwargs['timeout'] = self.polling_timeout
-
-            if self.headers:
-                if 'headers' in kwargs:
-                    kwargs['headers'].update(self.headers)
-                else:
-                    kwargs['headers'] = self.headers
-
-            try:
-                r = _session.send(prepreq, **kwargs)
-            except requests.ConnectionError:
-                raise requests.ConnectionError('Failed to establish a new connection.'
-                                               ' Please make sure your URL is valid.')
-            try:
-                r.raise_for_status()
-            except Exception:
-                return_error('Exception in request: {} {}'.format(r.status_code, r.content))
-                raise
+
+        # the feeds are downloaded concurrently and parsed later on, one at a time.
+        # a single feed is streamed while it is parsed.
+        spool_content = len(urls) > 1
+        responses = run_concurrently(lambda url: self._send_request(url, spool_content=spool_content, **kwargs), urls,
+                                     max_workers=self.max_workers)
+        self.failed_urls = {}
+        for url, (r, error) in zip(urls, responses):
+            if error:
+                self.failed_urls[url] = error
+                demisto.error(f'Failed to fetch {url}: {error}')
+                continue
+            if r is None:
+                demisto.debug(f'{url} was not modified since the last fetch, skipping it')
+                continue
 
             response = self.get_feed_content_divided_to_lines(url, r)
             if self.feed_url_to_config:
@@ -161,24 +204,70 @@ class Client(BaseClient):
 
             results.append({url: csvreader})
 
+        if self.failed_urls and len(self.failed_urls) == len(urls):
+            raise self.failed_urls[urls[0]]
+
         return results
 
-    def get_feed_content_divided_to_lines(self, url, raw_response):
-        """Fetch feed data and divides its content to lines
+    def raise_for_failed_urls(self):
+        """Raises an error if some of the feed URLs failed in the last build_iterator call.
+        It is called once the indicators of the other URLs were handled, so a partial failure is not silent.
+        """
+        if self.failed_urls:
+            raise DemistoException('Failed to fetch {} of the feed URLs: {}'.format(
+                len(self.failed_urls), ', '.join(f'{url} ({error})' for url, error in self.failed_urls.items())))
+
+    def get_feed_content_divided_to_lines(self, url, raw_response) -> Iterator[str]:
+        """Fetch feed data and divides its content to lines.
+        The content is read, decompressed and decoded incrementally, so only a single chunk of it is held in memory.
 
         Args:
             url: Current feed's url.
-            raw_response: The raw response from the feed's url.
+            raw_response: The raw (streamed) response from the feed's url, or a file with its content.
 
         Returns:
-            List. List of lines from the feed content.
+            Iterator. Iterator of the lines of the feed content.
         """
-        if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
-            response_content = gzip.decompress(raw_response.content)
+        if isinstance(raw_response, requests.Response):
+            chunks = raw_response.iter_content(chunk_size=CHUNK_SIZE)
         else:
-            response_content = raw_response.content
+            chunks = iter(lambda: raw_response.read(CHUNK_SIZE), b'')
+
+        if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
+            chunks = gunzip_chunks(chunks)
 
-        return response_content.decode(self.encoding).split('\n')
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        remainder = ''
+        try:
+            for chunk in chunks:
+                lines = (remainder + decoder.decode(chunk)).split('\n')
+                remainder = lines.pop()
+                yield from lines
+            yield remainder + decoder.decode(b'', final=True)
+        finally:
+            # the spooled file or the connection of the streamed response is released once the feed was parsed
+            raw_response.close()
+
+
+def gunzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Decompresses a gzip stream chunk by chunk, including streams of multiple gzip members.
+
+    Args:
+        chunks: The chunks of the compressed stream.
+
+    Returns:
+        Iterator. Iterator of the decompressed chunks.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data
+            if chunk:
+                # a new gzip member starts
+                yield decompressor.flush()
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, value):
@@ -240,32 +329,42 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
     return fields_mapping
 
 
-def fetch_indicators_command(client: Client, default_indicator_type: str, **kwargs):
+def iterate_reader_indicators(reader, url_config: dict, default_indicator_type: str):
+    mapping = url_config.get('mapping', {})
+    for item in reader:
+        raw_json = dict(item)
+        value = item.get('value')
+        if not value and len(item) > 1:
+            value = next(iter(item.values()))
+        if value:
+            raw_json['value'] = value
+            conf_indicator_type = url_config.get('indicator_type')
+            indicator_type = determine_indicator_type(conf_indicator_type, default_indicator_type, value)
+            raw_json['type'] = indicator_type
+            indicator = {
+                'value': value,
+                'type': indicator_type,
+                'rawJSON': raw_json,
+                'fields': create_fields_mapping(raw_json, mapping) if mapping else {}
+            }
+            yield indicator
+
+
+def iterate_indicators(client: Client, default_indicator_type: str, **kwargs) -> Iterator[dict]:
+    """Lazily parses the feeds and yields the indicators one by one, so the whole feed is never held in memory."""
     iterator = client.build_iterator(**kwargs)
-    indicators = []
     config = client.feed_url_to_config or {}
     for url_to_reader in iterator:
         for url, reader in url_to_reader.items():
-            mapping = config.get(url, {}).get('mapping', {})
-            for item in reader:
-                raw_json = dict(item)
-                value = item.get('value')
-                if not value and len(item) > 1:
-                    value = next(iter(item.values()))
-                if value:
-                    raw_json['value'] = value
-                    conf_indicator_type = config.get(url, {}).get('indicator_type')
-                    indicator_type = determine_indicator_type(conf_indicator_type, default_indicator_type, value)
-                    raw_json['type'] = indicator_type
-                    indicator = {
-                        'value': value,
-                        'type': indicator_type,
-                        'rawJSON': raw_json,
-                        'fields': create_fields_mapping(raw_json, mapping) if mapping else {}
-                    }
-                    indicators.append(indicator)
-
-    return indicators
+            url_indicators = iterate_reader_indicators(reader, config.get(url, {}), default_indicator_type)
+            if client.delta_tracker:
+                # only the indicators which are new or were changed since the last fetch
+                url_indicators = client.delta_tracker.filter_changed(url, url_indicators)
+            yield from url_indicators
+
+
+def fetch_indicators_command(client: Client, default_indicator_type: str, **kwargs):
+    return list(iterate_indicators(client, default_indicator_type, **kwargs))
 
 
 def get_indicators_command(client, args):
@@ -294,14 +393,23 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, params.get('indicator_type'))
-            # we submit the indicators in batches
+            client.source_tracker = FeedSourceTracker.from_params(params, demisto.getLastRun())
+            client.delta_tracker = FeedDeltaTracker.from_params(params, demisto.getIntegrationContext())
+            indicators = iterate_indicators(client, params.get('indicator_type'))
+            # we submit the indicators in batches while the feed is still being parsed
             for b in batch(indicators, batch_size=2000):
                 demisto.createIndicators(b)  # type: ignore
+            demisto.setLastRun(client.source_tracker.to_last_run())
+            if client.delta_tracker:
+                integration_context = demisto.getIntegrationContext()
+                demisto.setIntegrationContext(client.delta_tracker.to_integration_context(integration_context))
+            # the failed URLs are fully fetched again in the next fetch
+            client.raise_for_failed_urls()
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
             readable_output, outputs, raw_response = commands[command](client, args)
+            client.raise_for_failed_urls()
             return_outputs(readable_output, outputs, raw_response)
     except Exception as e:
         err_msg = f'Error in {feed_name} Integration - Encountered an issue with createIndicators' if \
@@ -1,3 +1,4 @@
+import pytest
 import requests
 import requests_mock
 from CSVFeedApiModule import *
@@ -145,9 +146,34 @@ def test_get_feed_content():
             )
 
             m.get(url, content=feed_url_to_config.get(url).get('content'))
-            raw_response = requests.get(url)
+            raw_response = requests.get(url, stream=True)
 
-            assert client.get_feed_content_divided_to_lines(url, raw_response) == expected_output
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == expected_output
+
+
+def test_get_feed_content_multiple_chunks(mocker):
+    """
+    Given
+    - A zipped feed made of two gzip members, with multi-byte characters.
+
+    When
+    - Reading its content in chunks of 7 bytes.
+
+    Then
+    - Ensure the lines are decompressed and decoded correctly across the chunks and the gzip members.
+    """
+    import gzip
+    content = '\n'.join(f'{i}.{i}.{i}.{i},\u05d0\u05d1' for i in range(100)) + '\n'
+    half = len(content) // 2
+    zipped_content = gzip.compress(content[:half].encode('utf8')) + gzip.compress(content[half:].encode('utf8'))
+    mocker.patch('CSVFeedApiModule.CHUNK_SIZE', 7)
+    url = 'https://ipstack.com'
+    client = Client(url=url, feed_url_to_config={url: {'is_zipped_file': True}}, encoding='utf8')
+
+    with requests_mock.Mocker() as m:
+        m.get(url, content=zipped_content)
+        raw_response = requests.get(url, stream=True)
+        assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == content.split('\n')
 
 
 def test_date_format_parsing():
@@ -156,3 +182,142 @@ def test_date_format_parsing():
 
     formatted_date = date_format_parsing('2020-02-01 12:13:14.11111')
     assert formatted_date == '2020-02-01T12:13:14Z'
+
+
+def test_build_iterator_multiple_urls_with_one_failure(mocker):
+    """
+    Given
+    - Two feed URLs, one of them returns an error.
+
+    When
+    - Building the iterators of the feeds.
+
+    Then
+    - Ensure only the iterator of the healthy URL is returned and the failure is logged.
+    """
+    feed_url_to_config = {
+        'https://ipstack.com': {
+            'fieldnames': ['value'],
+            'indicator_type': 'IP'
+        },
+        'https://broken.com': {
+            'fieldnames': ['value'],
+            'indicator_type': 'IP'
+        }
+    }
+
+    with open('test_data/ip_ranges.txt') as ip_ranges_txt:
+        ip_ranges = ip_ranges_txt.read().encode('utf8')
+
+    mocker.patch.object(demisto, 'error')
+    with requests_mock.Mocker() as m:
+        m.get('https://ipstack.com', content=ip_ranges)
+        m.get('https://broken.com', status_code=500)
+        client = Client(
+            url=list(feed_url_to_config.keys()),
+            feed_url_to_config=feed_url_to_config,
+        )
+        iterators = client.build_iterator()
+        assert [list(iterator.keys())[0] for iterator in iterators] == ['https://ipstack.com']
+        assert demisto.error.call_count == 1
+
+
+def test_feed_main_fetch_indicators_with_one_failed_url(mocker):
+    """
+    Given
+    - Two feed URLs, one of them returns an error.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators of the healthy URL are created, and the failure of the other URL is returned as an error.
+    """
+    feed_url_to_config = {
+        'https://ipstack.com': {
+            'fieldnames': ['value'],
+            'indicator_type': 'IP'
+        },
+        'https://broken.com': {
+            'fieldnames': ['value'],
+            'indicator_type': 'IP'
+        }
+    }
+    params = {
+        'url': list(feed_url_to_config.keys()),
+        'feed_url_to_config': feed_url_to_config
+    }
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'error')
+    mocker.patch.object(demisto, 'createIndicators')
+    return_error_mock = mocker.patch('CSVFeedApiModule.return_error')
+
+    with requests_mock.Mocker() as m:
+        m.get('https://ipstack.com', content=b'1.1.1.1\n2.2.2.2')
+        m.get('https://broken.com', status_code=500)
+        feed_main('CSV', params=params)
+
+    assert [indicator['value'] for indicator in demisto.createIndicators.call_args[0][0]] == ['1.1.1.1', '2.2.2.2']
+    assert 'Failed to fetch 1 of the feed URLs: https://broken.com' in return_error_mock.call_args[0][0]
+
+
+def test_build_iterator_all_urls_failed():
+    """
+    Given
+    - A feed URL which returns an error.
+
+    When
+    - Building the iterators of the feed.
+
+    Then
+    - Ensure the error is raised.
+    """
+    with requests_mock.Mocker() as m:
+        m.get('https://broken.com', status_code=500)
+        client = Client(url='https://broken.com')
+        with pytest.raises(DemistoException, match='Exception in request: 500'):
+            client.build_iterator()
+
+
+def test_feed_main_fetch_indicators_delta_mode(mocker):
+    """
+    Given
+    - A feed configured with delta mode.
+
+    When
+    - Fetching indicators twice, where a single line was added to the feed before the second fetch.
+
+    Then
+    - Ensure all the indicators are created in the first fetch and only the new one in the second fetch.
+    """
+    feed_url_to_config = {
+        'https://ipstack.com': {
+            'fieldnames': ['value'],
+            'indicator_type': 'IP'
+        }
+    }
+    params = {
+        'url': 'https://ipstack.com',
+        'feed_url_to_config': feed_url_to_config,
+        'delta_mode': True
+    }
+    integration_context: dict = {}
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'getIntegrationContext', side_effect=lambda: integration_context)
+    mocker.patch.object(demisto, 'setIntegrationContext', side_effect=integration_context.update)
+    mocker.patch.object(demisto, 'createIndicators')
+
+    with open('test_data/ip_ranges.txt') as ip_ranges_txt:
+        ip_ranges = ip_ranges_txt.read()
+
+    with requests_mock.Mocker() as m:
+        m.get('https://ipstack.com', content=ip_ranges.encode('utf8'))
+        feed_main('CSV', params=dict(params))
+        first_fetch_count = sum(len(call_args[0][0]) for call_args in demisto.createIndicators.call_args_list)
+        assert first_fetch_count > 1
+
+        demisto.createIndicators.reset_mock()
+        m.get('https://ipstack.com', content=(ip_ranges + '\n8.8.8.8').encode('utf8'))
+        feed_main('CSV', params=dict(params))
+        assert demisto.createIndicators.call_count == 1
+        assert [indicator['value'] for indicator in demisto.createIndicators.call_args[0][0]] == ['8.8.8.8']
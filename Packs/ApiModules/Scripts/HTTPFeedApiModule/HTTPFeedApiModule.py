@@ -7,7 +7,8 @@ import urllib3
 import requests
 import traceback
 from dateutil.parser import parse
-from typing import Optional, Pattern, List
+from itertools import islice
+from typing import Optional, Pattern, List, Iterator, Dict
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -20,7 +21,8 @@ class Client(BaseClient):
     def __init__(self, url: str, feed_name: str = 'http', insecure: bool = False, credentials: dict = None,
                  ignore_regex: str = None, encoding: str = None, indicator_type: str = '',
                  indicator: str = '', fields: str = '{}', feed_url_to_config: dict = None, polling_timeout: int = 20,
-                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None, **kwargs):
+                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None, max_workers: int = 10,
+                 **kwargs):
         """Implements class for miners of plain text feeds over HTTP.
         **Config parameters**
         :param: url: URL of the feed.
@@ -60,6 +62,14 @@ class Client(BaseClient):
             }]
         }
         :param: proxy: Use proxy in requests.
+        :param: max_workers: The maximal number of feed URLs to request at the same time. Default: 10
+        **feed_main parameters**
+        :param: batch_size: The number of indicators to create in each batch. Default: 2000
+        :param: delta_mode: boolean, if *true* only indicators which are new or were changed since the last fetch
+            are created. All the indicators are still created once a day. Ignored under any expiration policy
+            other than *never*. Default: *false*
+        :param: track_removed_indicators: boolean, in delta mode, whether to list the indicators which were removed
+            from the feed since the last fetch under *removed_indicators* in the integration context. Default: *false*
         **Extraction dictionary**
             Extraction dictionaries contain the following keys:
             :regex: Python regular expression for searching the text.
@@ -95,7 +105,12 @@ class Client(BaseClient):
                 url: https://ransomwaretracker.abuse.ch/downloads/CW_C2_URLBL.txt
                 ignore_regex: '^#'
         """
-        super().__init__(base_url=url, verify=not insecure, proxy=proxy)
+        try:
+            self.max_workers = int(max_workers)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide an integer value for "Max Workers"')
+        # a single pooled session is shared by the concurrent requests of all the feed URLs
+        super().__init__(base_url=url, verify=not insecure, proxy=proxy, pool_maxsize=self.max_workers)
         try:
             self.polling_timeout = int(polling_timeout)
         except (ValueError, TypeError):
@@ -136,6 +151,13 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self._compiled_feed_url_to_config: dict = {}
+        # when set, feed URLs which were not modified since the last fetch are skipped
+        self.source_tracker: Optional[FeedSourceTracker] = None
+        # when set, only indicators which are new or were changed since the last fetch are returned
+        self.delta_tracker: Optional[FeedDeltaTracker] = None
+        # the feed URLs which failed in the last build_iterator call, mapped to their errors
+        self.failed_urls: Dict[str, Exception] = {}
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -188,6 +210,41 @@ class Client(BaseClient):
 
         return config
 
+    def get_compiled_feed_config(self, url: str) -> dict:
+        """
+        Get the feed configuration of the given URL with all of its regexes compiled.
+        The configuration is compiled on the first call for each URL and reused for the following lines.
+        :param url: The feed URL
+        :return: The compiled feed configuration - the indicator type, the indicator extraction dictionary and
+            a list of (field name, compiled regex, transform) tuples.
+        """
+        compiled_config = self._compiled_feed_url_to_config.get(url)
+        if compiled_config is not None:
+            return compiled_config
+
+        feed_config = self.feed_url_to_config.get(url, {})
+        compiled_config = {
+            'indicator_type': feed_config.get('indicator_type', self.indicator_type),
+            'indicator': None,
+            'fields': []
+        }
+        indicator = feed_config.get('indicator')
+        if indicator:
+            if 'regex' not in indicator:
+                raise ValueError(f'{self.feed_name} - indicator stanza should have a regex')
+            compiled_config['indicator'] = {
+                'regex': re.compile(indicator['regex']),
+                'transform': indicator.get('transform', r'\g<0>')
+            }
+        for field in feed_config.get('fields', []):
+            for f, fattrs in field.items():
+                if 'regex' not in fattrs:
+                    raise ValueError(f'{self.feed_name} - {f} field does not have a regex')
+                compiled_config['fields'].append((f, re.compile(fattrs['regex']), fattrs.get('transform', r'\g<0>')))
+
+        self._compiled_feed_url_to_config[url] = compiled_config
+        return compiled_config
+
     def build_iterator(self, **kwargs):
         """
         For each URL (service), send an HTTP request to get indicators and return them after filtering by Regex
@@ -203,30 +260,70 @@ class Client(BaseClient):
 
         if self.username is not None and self.password is not None:
             kwargs['auth'] = (self.username, self.password)
-        try:
-            urls = self._base_url
-            url_to_response_list: List[dict] = []
-            if not isinstance(urls, list):
-                urls = [urls]
-            for url in urls:
-                r = requests.get(
+
+        urls = self._base_url
+        if not isinstance(urls, list):
+            urls = [urls]
+
+        # the feeds are downloaded concurrently and parsed later on, one at a time.
+        # a single feed is streamed while it is parsed.
+        spool_content = len(urls) > 1
+
+        def send_request(url):
+            request_kwargs = kwargs
+            if self.source_tracker:
+                headers = dict(kwargs.get('headers') or {})
+                headers.update(self.source_tracker.get_request_headers(url))
+                request_kwargs = dict(kwargs, headers=headers)
+            try:
+                r = self._session.get(
                     url,
-                    **kwargs
+                    **request_kwargs
                 )
-                try:
-                    r.raise_for_status()
-                except Exception:
-                    LOG(f'{self.feed_name!r} - exception in request:'
-                        f' {r.status_code!r} {r.content!r}')
-                    raise
+            except requests.ConnectionError:
+                raise requests.ConnectionError('Failed to establish a new connection. Please make sure your URL is valid.')
+            try:
+                r.raise_for_status()
+            except Exception:
+                LOG(f'{self.feed_name!r} - exception in request:'
+                    f' {r.status_code!r} {r.content!r}')
+                raise
+            if self.source_tracker:
+                if self.source_tracker.is_not_modified(url, r):
+                    return None
+                if self.source_tracker.needs_digest(r):
+                    # the server does not support conditional requests, compare the content itself
+                    content_file, digest = FeedSourceTracker.spool_response_content(r)
+                    if self.source_tracker.is_content_unchanged(url, digest):
+                        content_file.close()
+                        return None
+                    return content_file
+            if spool_content:
+                # the body is read right away, so the server does not wait for it while other feeds are parsed
+                content_file, _ = FeedSourceTracker.spool_response_content(r)
+                return content_file
+            return r
+
+        url_to_response_list: List[dict] = []
+        self.failed_urls = {}
+        for url, (r, error) in zip(urls, run_concurrently(send_request, urls, max_workers=self.max_workers)):
+            if error:
+                self.failed_urls[url] = error
+                demisto.error(f'{self.feed_name} - failed to fetch {url}: {error}')
+            elif r is None:
+                demisto.debug(f'{self.feed_name} - {url} was not modified since the last fetch, skipping it')
+            else:
                 url_to_response_list.append({url: r})
-        except requests.ConnectionError:
-            raise requests.ConnectionError('Failed to establish a new connection. Please make sure your URL is valid.')
+        if self.failed_urls and len(self.failed_urls) == len(urls):
+            raise self.failed_urls[urls[0]]
 
         results = []
         for url_to_response in url_to_response_list:
             for url, lines in url_to_response.items():
-                result = lines.iter_lines()
+                if isinstance(lines, requests.Response):
+                    result = lines.iter_lines()
+                else:
+                    result = iterate_file_lines(lines)
                 if self.encoding is not None:
                     result = map(
                         lambda x: x.decode(self.encoding).encode('utf_8'),
@@ -245,6 +342,15 @@ class Client(BaseClient):
                 results.append({url: result})
         return results
 
+    def raise_for_failed_urls(self):
+        """
+        Raises an error if some of the feed URLs failed in the last build_iterator call.
+        It is called once the indicators of the other URLs were handled, so a partial failure is not silent.
+        """
+        if self.failed_urls:
+            raise DemistoException('Failed to fetch {} of the feed URLs: {}'.format(
+                len(self.failed_urls), ', '.join(f'{url} ({error})' for url, error in self.failed_urls.items())))
+
     def custom_fields_creator(self, attributes: dict):
         created_custom_fields = {}
         for attribute in attributes.keys():
@@ -257,6 +363,20 @@ class Client(BaseClient):
         return created_custom_fields
 
 
+def iterate_file_lines(content_file):
+    """
+    Yields the lines of the spooled content of a feed and closes the file once they were all read.
+    The generator holds the file itself and not only its iterator, so the file is not closed when it is collected.
+    :param content_file: The file with the feed content
+    :return: Iterator of the lines, without their line breaks
+    """
+    try:
+        for line in content_file:
+            yield line.rstrip(b'\r\n')
+    finally:
+        content_file.close()
+
+
 def datestring_to_millisecond_timestamp(datestring):
     date = parse(str(datestring))
     return int(date.timestamp() * 1000)
@@ -273,29 +393,8 @@ def get_indicator_fields(line, url, feed_tags: list, client: Client):
     """
     attributes = None
     value: str = ''
-    indicator = None
-    fields_to_extract = []
-    feed_config = client.feed_url_to_config.get(url, {})
-    if feed_config:
-        if 'indicator' in feed_config:
-            indicator = feed_config['indicator']
-            if 'regex' in indicator:
-                indicator['regex'] = re.compile(indicator['regex'])
-            if 'transform' not in indicator:
-                indicator['transform'] = r'\g<0>'
-
-    if 'fields' in feed_config:
-        fields = feed_config['fields']
-        for field in fields:
-            for f, fattrs in field.items():
-                field = {f: {}}
-                if 'regex' in fattrs:
-                    field[f]['regex'] = re.compile(fattrs['regex'])
-                if 'transform' not in fattrs:
-                    field[f]['transform'] = r'\g<0>'
-                else:
-                    field[f]['transform'] = fattrs['transform']
-                fields_to_extract.append(field)
+    feed_config = client.get_compiled_feed_config(url)
+    indicator = feed_config['indicator']
 
     line = line.strip()
     if line:
@@ -304,65 +403,91 @@ def get_indicator_fields(line, url, feed_tags: list, client: Client):
             extracted_indicator = indicator['regex'].search(line)
             if extracted_indicator is None:
                 return attributes, value
-            if 'transform' in indicator:
-                extracted_indicator = extracted_indicator.expand(indicator['transform'])
+            extracted_indicator = extracted_indicator.expand(indicator['transform'])
         attributes = {}
-        for field in fields_to_extract:
-            for f, fattrs in field.items():
-                m = fattrs['regex'].search(line)
+        for f, regex, transform in feed_config['fields']:
+            m = regex.search(line)
 
-                if m is None:
-                    continue
+            if m is None:
+                continue
 
-                attributes[f] = m.expand(fattrs['transform'])
+            attributes[f] = m.expand(transform)
 
-                try:
-                    i = int(attributes[f])
-                except Exception:
-                    pass
-                else:
-                    attributes[f] = i
+            try:
+                i = int(attributes[f])
+            except Exception:
+                pass
+            else:
+                attributes[f] = i
         attributes['value'] = value = extracted_indicator
-        attributes['type'] = feed_config.get('indicator_type', client.indicator_type)
+        attributes['type'] = feed_config['indicator_type']
         attributes['tags'] = feed_tags
     return attributes, value
 
 
-def fetch_indicators_command(client, feed_tags, itype, **kwargs):
+def iterate_url_indicators(client, url, lines, feed_tags, itype) -> Iterator[dict]:
+    """
+    Parses the lines of a single feed URL and yields its indicators one by one.
+    :param client: The client
+    :param url: The feed URL
+    :param lines: The lines of the feed
+    :param feed_tags: The indicator tags.
+    :param itype: The default indicator type
+    :return: Iterator of indicators
+    """
+    indicator_type = client.feed_url_to_config.get(url, {}).get('indicator_type', itype)
+    for line in lines:
+        attributes, value = get_indicator_fields(line, url, feed_tags, client)
+        if value:
+            if 'lastseenbysource' in attributes.keys():
+                attributes['lastseenbysource'] = datestring_to_millisecond_timestamp(
+                    attributes['lastseenbysource'])
+
+            if 'firstseenbysource' in attributes.keys():
+                attributes['firstseenbysource'] = datestring_to_millisecond_timestamp(
+                    attributes['firstseenbysource'])
+
+            indicator_data = {
+                "value": value,
+                "type": indicator_type,
+                "rawJSON": attributes,
+            }
+
+            if len(client.custom_fields_mapping.keys()) > 0 or TAGS in attributes.keys():
+                custom_fields = client.custom_fields_creator(attributes)
+                indicator_data["fields"] = custom_fields
+
+            yield indicator_data
+
+
+def iterate_indicators(client, feed_tags, itype, **kwargs) -> Iterator[dict]:
+    """
+    Lazily parses the feeds and yields the indicators one by one, so the whole feed is never held in memory.
+    In delta mode, only the indicators which are new or were changed since the last fetch are yielded.
+    :param client: The client
+    :param feed_tags: The indicator tags.
+    :param itype: The default indicator type
+    :param kwargs: Arguments to send to the HTTP API endpoint
+    :return: Iterator of indicators
+    """
     iterators = client.build_iterator(**kwargs)
-    indicators = []
     for iterator in iterators:
         for url, lines in iterator.items():
-            for line in lines:
-                attributes, value = get_indicator_fields(line, url, feed_tags, client)
-                if value:
-                    if 'lastseenbysource' in attributes.keys():
-                        attributes['lastseenbysource'] = datestring_to_millisecond_timestamp(
-                            attributes['lastseenbysource'])
-
-                    if 'firstseenbysource' in attributes.keys():
-                        attributes['firstseenbysource'] = datestring_to_millisecond_timestamp(
-                            attributes['firstseenbysource'])
+            url_indicators = iterate_url_indicators(client, url, lines, feed_tags, itype)
+            if client.delta_tracker:
+                url_indicators = client.delta_tracker.filter_changed(url, url_indicators)
+            yield from url_indicators
 
-                    indicator_data = {
-                        "value": value,
-                        "type": client.feed_url_to_config.get(url, {}).get('indicator_type', itype),
-                        "rawJSON": attributes,
-                    }
 
-                    if len(client.custom_fields_mapping.keys()) > 0 or TAGS in attributes.keys():
-                        custom_fields = client.custom_fields_creator(attributes)
-                        indicator_data["fields"] = custom_fields
-
-                    indicators.append(indicator_data)
-    return indicators
+def fetch_indicators_command(client, feed_tags, itype, **kwargs):
+    return list(iterate_indicators(client, feed_tags, itype, **kwargs))
 
 
 def get_indicators_command(client: Client, args):
     itype = args.get('indicator_type', client.indicator_type)
     limit = int(args.get('limit'))
     feed_tags = args.get('feedTags')
-    indicators_list = fetch_indicators_command(client, feed_tags, itype)[:limit]
+    indicators_list = list(islice(iterate_indicators(client, feed_tags, itype), limit))
     entry_result = camelize(indicators_list)
     hr = tableToMarkdown('Indicators', entry_result, headers=['Value', 'Type', 'Rawjson'])
     return hr, {}, indicators_list
@@ -389,6 +514,10 @@ def feed_main(feed_name, params=None, prefix=''):
     if 'feed_name' not in params:
         params['feed_name'] = feed_name
     feed_tags = argToList(demisto.params().get('feedTags'))
+    try:
+        batch_size = int(params.get('batch_size', 2000))
+    except (ValueError, TypeError):
+        return_error('Please provide an integer value for "Indicators batch size"')
     client = Client(**params)
     command = demisto.command()
     if command != 'fetch-indicators':
@@ -402,16 +531,25 @@ def feed_main(feed_name, params=None, prefix=''):
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, feed_tags, params.get('indicator_type'))
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
+            client.source_tracker = FeedSourceTracker.from_params(params, demisto.getLastRun())
+            client.delta_tracker = FeedDeltaTracker.from_params(params, demisto.getIntegrationContext())
+            indicators = iterate_indicators(client, feed_tags, params.get('indicator_type'))
+            # we submit the indicators in batches while the feed is still being parsed
+            for b in batch(indicators, batch_size=batch_size):
                 demisto.createIndicators(b)
+            demisto.setLastRun(client.source_tracker.to_last_run())
+            if client.delta_tracker:
+                integration_context = demisto.getIntegrationContext()
+                demisto.setIntegrationContext(client.delta_tracker.to_integration_context(integration_context))
+            # the failed URLs are fully fetched again in the next fetch
+            client.raise_for_failed_urls()
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
             if feed_tags:
                 args['feedTags'] = feed_tags
             readable_output, outputs, raw_response = commands[command](client, args)
+            client.raise_for_failed_urls()
             return_outputs(readable_output, outputs, raw_response)
     except Exception as e:
         err_msg = f'Error in {feed_name} integration [{e}]\nTrace\n:{traceback.format_exc()}'
@@ -1,6 +1,9 @@
-from HTTPFeedApiModule import get_indicators_command, Client, datestring_to_millisecond_timestamp, feed_main
+from HTTPFeedApiModule import get_indicators_command, Client, datestring_to_millisecond_timestamp, feed_main, \
+    fetch_indicators_command
+import pytest
 import requests_mock
 import demistomock as demisto
+import time
 
 
 def test_get_indicators():
@@ -287,3 +290,171 @@ def test_feed_main_test_module(mocker, requests_mock):
     assert demisto.results.call_count == 1
     results = demisto.results.call_args[0][0]
     assert results['HumanReadable'] == 'ok'
+
+
+def test_feed_main_fetch_indicators_in_batches(mocker, requests_mock):
+    """
+    Given
+    - Parameters (url, ignore_regex, feed_url_to_config and batch_size) to configure a feed.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure createIndicators is called once per batch and all the 466 indicators are created.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    feed_url_to_config = {
+        feed_url: {
+            'indicator_type': 'ASN',
+            'indicator': {
+                'regex': '^AS[0-9]+'
+            }
+        }
+    }
+    mocker.patch.object(
+        demisto, 'params',
+        return_value={
+            'url': feed_url,
+            'ignore_regex': '^;.*',
+            'feed_url_to_config': feed_url_to_config,
+            'batch_size': 100
+        }
+    )
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        asn_ranges = asn_ranges_txt.read().encode('utf8')
+
+    requests_mock.get(feed_url, content=asn_ranges)
+    feed_main('great_feed_name')
+
+    assert demisto.createIndicators.call_count == 5
+    batch_sizes = [len(call_args[0][0]) for call_args in demisto.createIndicators.call_args_list]
+    assert batch_sizes == [100, 100, 100, 100, 66]
+
+
+def test_get_compiled_feed_config():
+    """
+    Given
+    - A feed configuration with string regexes and a field without a transform.
+
+    When
+    - Getting the compiled configuration of the feed URL twice.
+
+    Then
+    - Ensure the regexes are compiled, default transforms are set and the result is cached.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    client = Client(
+        url=feed_url,
+        feed_url_to_config={
+            feed_url: {
+                'indicator_type': 'ASN',
+                'indicator': {
+                    'regex': '^AS[0-9]+'
+                },
+                'fields': [
+                    {
+                        'asndrop_org': {
+                            'regex': r'^.*\|\W+(.*)'
+                        }
+                    }
+                ]
+            }
+        }
+    )
+
+    config = client.get_compiled_feed_config(feed_url)
+    assert config['indicator_type'] == 'ASN'
+    assert config['indicator']['regex'].match('AS397539')
+    assert config['indicator']['transform'] == r'\g<0>'
+    assert config['fields'][0][0] == 'asndrop_org'
+    assert config['fields'][0][2] == r'\g<0>'
+    assert client.get_compiled_feed_config(feed_url) is config
+
+
+def test_get_compiled_feed_config_without_regex():
+    """
+    Given
+    - A feed configuration whose indicator stanza has no regex.
+
+    When
+    - Getting the compiled configuration of the feed URL.
+
+    Then
+    - Ensure a ValueError which names the feed is raised.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    client = Client(url=feed_url, feed_name='Spamhaus',
+                    feed_url_to_config={feed_url: {'indicator_type': 'ASN', 'indicator': {'transform': r'\1'}}})
+    with pytest.raises(ValueError, match='Spamhaus - indicator stanza should have a regex'):
+        client.get_compiled_feed_config(feed_url)
+
+
+def test_build_iterator_multiple_urls_with_one_failure(mocker, requests_mock):
+    """
+    Given
+    - Two feed URLs, one of them returns an error.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators of the healthy URL are fetched and the failure is logged.
+    """
+    feed_url_to_config = {
+        'https://www.spamhaus.org/drop/asndrop.txt': {
+            'indicator_type': 'ASN',
+            'indicator': {
+                'regex': '^AS[0-9]+'
+            }
+        },
+        'https://broken.com/asndrop.txt': {
+            'indicator_type': 'ASN'
+        }
+    }
+    mocker.patch.object(demisto, 'error')
+
+    with open('test_data/asn_ranges.txt') as asn_ranges_txt:
+        asn_ranges = asn_ranges_txt.read().encode('utf8')
+
+    requests_mock.get('https://www.spamhaus.org/drop/asndrop.txt', content=asn_ranges)
+    requests_mock.get('https://broken.com/asndrop.txt', status_code=500)
+    client = Client(
+        url=list(feed_url_to_config.keys()),
+        ignore_regex='^;.*',
+        feed_url_to_config=feed_url_to_config
+    )
+
+    indicators = fetch_indicators_command(client, [], 'ASN')
+    assert len(indicators) == 466
+    assert demisto.error.call_count == 1
+
+
+def test_feed_main_fetch_indicators_not_modified(mocker, requests_mock):
+    """
+    Given
+    - A feed which returned an ETag header in the previous fetch.
+
+    When
+    - Fetching indicators and the server answers the conditional request with 304.
+
+    Then
+    - Ensure the ETag is sent, no indicators are created and the feed state is kept in the last run.
+    """
+    feed_url = 'https://www.spamhaus.org/drop/asndrop.txt'
+    last_run = {'feed_sources': {feed_url: {'etag': '"abc"', 'last_modified': None, 'fetched': int(time.time())}}}
+    mocker.patch.object(demisto, 'params', return_value={'url': feed_url, 'indicator_type': 'ASN'})
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'getLastRun', return_value=last_run)
+    mocker.patch.object(demisto, 'setLastRun')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, status_code=304)
+
+    feed_main('great_feed_name')
+
+    assert requests_mock.last_request.headers['If-None-Match'] == '"abc"'
+    assert demisto.createIndicators.call_count == 0
+    assert demisto.setLastRun.call_args[0][0] == last_run
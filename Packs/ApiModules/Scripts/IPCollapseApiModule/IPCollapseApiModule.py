@@ -0,0 +1,125 @@
+''' IMPORTS '''
+import ipaddress
+import socket
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+''' GLOBALS '''
+IP_VERSION_TO_MAX_PREFIX = {4: 32, 6: 128}
+
+
+def ip_to_int(ip) -> Tuple[int, int]:
+    """Converts an IP to its version and integer value.
+
+    :param ip: An IP string, or an IP object which supports ``int()`` and has a ``version`` (e.g. netaddr.IPAddress).
+    :return: The (version, integer value) of the IP.
+    """
+    if not isinstance(ip, str):
+        return ip.version, int(ip)
+    # inet_pton is much faster than building ipaddress objects when collapsing large lists
+    ip = ip.strip()
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+    except OSError:
+        raise ValueError('{} does not appear to be an IPv4 or IPv6 address'.format(ip))
+
+
+def int_to_ip(value: int, version: int) -> str:
+    """Converts the integer value of an IP back to its string.
+
+    :param value: The integer value of the IP.
+    :param version: The IP version - 4 or 6.
+    :return: The IP string.
+    """
+    if version == 4:
+        return str(ipaddress.IPv4Address(value))
+    return str(ipaddress.IPv6Address(value))
+
+
+def group_ips_by_version(ips: Iterable) -> Dict[int, List[int]]:
+    """Converts IPs to integers, grouped by the IP version.
+
+    :param ips: The IPs to convert.
+    :return: A dict from the IP version to the integer values of its IPs.
+    """
+    ips_by_version = {4: [], 6: []}  # type: Dict[int, List[int]]
+    for ip in ips:
+        version, value = ip_to_int(ip)
+        ips_by_version[version].append(value)
+    return ips_by_version
+
+
+def merge_int_ips(values: Iterable[int]) -> List[Tuple[int, int]]:
+    """Merges integer IPs into ranges of consecutive IPs. The IPs are sorted once and merged in a single pass.
+
+    :param values: The integer values of the IPs, of the same IP version. May contain duplicates.
+    :return: A sorted list of (first, last) inclusive ranges.
+    """
+    ranges = []  # type: List[Tuple[int, int]]
+    start = end = None
+    for value in sorted(set(values)):
+        if end is not None and value == end + 1:
+            end = value
+            continue
+        if start is not None:
+            ranges.append((start, end))
+        start = end = value
+    if start is not None:
+        ranges.append((start, end))
+    return ranges
+
+
+def int_range_to_cidrs(start: int, end: int, version: int) -> Iterator[Tuple[int, int]]:
+    """Splits an inclusive range of integer IPs into the minimal list of CIDRs which covers it exactly.
+
+    :param start: The first IP of the range.
+    :param end: The last IP of the range.
+    :param version: The IP version - 4 or 6.
+    :return: A generator of (network address, prefix length) tuples.
+    """
+    max_prefix = IP_VERSION_TO_MAX_PREFIX[version]
+    while start <= end:
+        # the block must be aligned to the start address, and must not pass the end of the range
+        alignment_bits = (start & -start).bit_length() - 1 if start else max_prefix
+        remaining_bits = (end - start + 1).bit_length() - 1
+        block_bits = min(alignment_bits, remaining_bits)
+        yield start, max_prefix - block_bits
+        start += 1 << block_bits
+
+
+def collapse_ips_to_ranges(ips: Iterable) -> List[str]:
+    """Collapses IPs to ranges of consecutive IPs, e.g. "1.1.1.1-1.1.1.3". Single IPs are returned as they are.
+
+    :param ips: IP strings or IP objects, IPv4 and IPv6 addresses may be mixed.
+    :return: The IPv4 ranges followed by the IPv6 ranges, sorted.
+    """
+    collapsed = []  # type: List[str]
+    for version, values in group_ips_by_version(ips).items():
+        for start, end in merge_int_ips(values):
+            if start == end:
+                collapsed.append(int_to_ip(start, version))
+            else:
+                collapsed.append('{}-{}'.format(int_to_ip(start, version), int_to_ip(end, version)))
+    return collapsed
+
+
+def collapse_ips_to_cidrs(ips: Iterable) -> List[str]:
+    """Collapses IPs to the minimal list of CIDRs which covers them exactly, e.g. "1.1.1.2/31".
+    Single IPs (/32 or /128 CIDRs) are returned as they are.
+
+    :param ips: IP strings or IP objects, IPv4 and IPv6 addresses may be mixed.
+    :return: The IPv4 CIDRs followed by the IPv6 CIDRs, sorted.
+    """
+    collapsed = []  # type: List[str]
+    for version, values in group_ips_by_version(ips).items():
+        max_prefix = IP_VERSION_TO_MAX_PREFIX[version]
+        for start, end in merge_int_ips(values):
+            for network, prefix in int_range_to_cidrs(start, end, version):
+                if prefix == max_prefix:
+                    collapsed.append(int_to_ip(network, version))
+                else:
+                    collapsed.append('{}/{}'.format(int_to_ip(network, version), prefix))
+    return collapsed
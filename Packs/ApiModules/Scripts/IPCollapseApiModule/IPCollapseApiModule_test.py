@@ -0,0 +1,76 @@
+import ipaddress
+import random
+
+import pytest
+from netaddr import IPAddress
+
+from IPCollapseApiModule import collapse_ips_to_cidrs, collapse_ips_to_ranges, int_range_to_cidrs, merge_int_ips
+
+IPS = ['1.1.1.1', '25.24.23.22', '22.21.20.19', '1.1.1.2', '1.2.3.4', '1.1.1.3', '2.2.2.2', '1.2.3.5', '1.1.1.2']
+
+
+def test_collapse_ips_to_ranges():
+    assert collapse_ips_to_ranges(IPS) == ['1.1.1.1-1.1.1.3', '1.2.3.4-1.2.3.5', '2.2.2.2', '22.21.20.19',
+                                           '25.24.23.22']
+
+
+def test_collapse_ips_to_cidrs():
+    assert collapse_ips_to_cidrs(IPS) == ['1.1.1.1', '1.1.1.2/31', '1.2.3.4/31', '2.2.2.2', '22.21.20.19',
+                                          '25.24.23.22']
+
+
+def test_collapse_mixed_versions_and_ip_objects():
+    ips = [IPAddress('2001:db8::1'), IPAddress('10.0.0.1'), '2001:db8::', '10.0.0.0', IPAddress('2001:db8::3')]
+    assert collapse_ips_to_ranges(ips) == ['10.0.0.0-10.0.0.1', '2001:db8::-2001:db8::1', '2001:db8::3']
+    assert collapse_ips_to_cidrs(ips) == ['10.0.0.0/31', '2001:db8::/127', '2001:db8::3']
+
+
+def test_collapse_invalid_ip():
+    with pytest.raises(ValueError):
+        collapse_ips_to_ranges(['1.1.1.1', 'not.an.ip'])
+
+
+@pytest.mark.parametrize('first, last', [
+    ('10.0.0.1', '10.0.0.254'),
+    ('0.0.0.0', '255.255.255.255'),
+    ('192.168.3.7', '192.168.200.1'),
+    ('2001:db8::5', '2001:db8::1:3'),
+    ('::', '::'),
+])
+def test_int_range_to_cidrs_minimal_exact_cover(first, last):
+    first, last = ipaddress.ip_address(first), ipaddress.ip_address(last)
+    expected = [(int(net.network_address), net.prefixlen) for net in ipaddress.summarize_address_range(first, last)]
+    assert list(int_range_to_cidrs(int(first), int(last), first.version)) == expected
+
+
+def test_collapse_shuffled_blocks():
+    """
+    Given
+    - Synthetic IPv4 addresses in blocks of random lengths, shuffled
+
+    When
+    - Merging them to ranges and splitting the ranges to CIDRs
+
+    Then
+    - Ensure every block is merged to a single range, and the CIDRs cover exactly the given IPs
+    """
+    rand = random.Random(0)
+    values = []
+    blocks = []
+    start = int(ipaddress.ip_address('10.0.0.0'))
+    while len(values) < 5000:
+        length = rand.randint(1, 300)
+        blocks.append((start, start + length - 1))
+        values.extend(range(start, start + length))
+        start += length + rand.randint(1, 50)
+    rand.shuffle(values)
+
+    ranges = merge_int_ips(values)
+    assert ranges == blocks
+
+    covered = 0
+    for first, last in ranges:
+        for network, prefix in int_range_to_cidrs(first, last, 4):
+            assert network & ((1 << (32 - prefix)) - 1) == 0
+            covered += 1 << (32 - prefix)
+    assert covered == len(values)
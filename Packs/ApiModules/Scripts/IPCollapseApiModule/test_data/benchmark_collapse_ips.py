@@ -0,0 +1,32 @@
+"""
+Measures the time it takes to collapse a synthetic list of IPv4 addresses, made of shuffled blocks of consecutive
+addresses, to ranges and to CIDRs.
+Run it from the module directory, with CommonServerPython and demistomock in the PYTHONPATH:
+    python test_data/benchmark_collapse_ips.py [number of IPs]
+"""
+import ipaddress
+import random
+import sys
+import timeit
+
+from IPCollapseApiModule import collapse_ips_to_cidrs, collapse_ips_to_ranges
+
+
+def generate_ips(count, seed=0):
+    rand = random.Random(seed)
+    values = []
+    start = int(ipaddress.ip_address('10.0.0.0'))
+    while len(values) < count:
+        length = rand.randint(1, 300)
+        values.extend(range(start, start + length))
+        start += length + rand.randint(1, 50)
+    rand.shuffle(values)
+    return [str(ipaddress.ip_address(value)) for value in values]
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    ips = generate_ips(count)
+    for collapse in (collapse_ips_to_ranges, collapse_ips_to_cidrs):
+        seconds = timeit.timeit(lambda: collapse(ips), number=1)
+        print('{}: {:.3f} s for {} IPs'.format(collapse.__name__, seconds, len(ips)))
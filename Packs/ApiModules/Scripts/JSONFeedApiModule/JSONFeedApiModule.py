@@ -1,6 +1,7 @@
 from CommonServerPython import *
 
 ''' IMPORTS '''
+import hashlib
 import urllib3
 import jmespath
 from typing import List, Dict, Union, Optional
@@ -13,7 +14,8 @@ class Client:
     def __init__(self, url: str = '', credentials: dict = None,
                  feed_name_to_config: Dict[str, dict] = None, source_name: str = 'JSON',
                  extractor: str = '', indicator: str = 'indicator',
-                 insecure: bool = False, cert_file: str = None, key_file: str = None, headers: dict = None, **_):
+                 insecure: bool = False, cert_file: str = None, key_file: str = None, headers: dict = None,
+                 polling_timeout: int = 20, max_workers: int = 10, **_):
         """
         Implements class for miners of JSON feeds over http/https.
         :param url: URL of the feed.
@@ -30,6 +32,8 @@ class Client:
         :param: headers: Header parameters are optional to specify a user-agent or an api-token
         Example: headers = {'user-agent': 'my-app/0.0.1'} or Authorization: Bearer
         (curl -H "Authorization: Bearer " "https://api-url.com/api/v1/iocs?first_seen_since=2016-1-1")
+        :param: polling_timeout: timeout of the polling request of each feed in seconds. Default: 20
+        :param: max_workers: The maximal number of feeds to request at the same time. Default: 10
          Example:
             Example feed config:
             'AMAZON': {
@@ -70,75 +74,153 @@ class Client:
                     self.auth = (username, password)
 
         self.cert = (cert_file, key_file) if cert_file and key_file else None
+        try:
+            self.polling_timeout = int(polling_timeout)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide an integer value for "Request Timeout"')
+        try:
+            self.max_workers = int(max_workers)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide an integer value for "Max Workers"')
+
+        # a single pooled session is shared by the concurrent requests of all the feeds
+        self.session = requests.Session()
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+        # when set, feeds which were not modified since the last fetch are skipped
+        self.source_tracker: Optional[FeedSourceTracker] = None
+        # when set, only indicators which are new or were changed since the last fetch are returned
+        self.delta_tracker: Optional[FeedDeltaTracker] = None
+        # the feeds which failed in the last build_iterator call, mapped to their errors
+        self.failed_feeds: Dict[str, Exception] = {}
+
+    def fetch_feed(self, feed: dict, **kwargs):
+        """
+        Gets the data of a single feed and extracts the indicators out of it.
+        :param feed: The feed configuration
+        :param kwargs: Arguments to send to the HTTP API endpoint
+        :return: The extracted data, None if the feed was not modified since the last fetch
+        """
+        url = feed.get('url', self.url)
+        headers = self.headers
+        if self.source_tracker:
+            headers = dict(self.headers or {})
+            headers.update(self.source_tracker.get_request_headers(url))
+        kwargs.setdefault('timeout', self.polling_timeout)
+        r = self.session.get(
+            url=url,
+            verify=self.verify,
+            auth=self.auth,
+            cert=self.cert,
+            headers=headers,
+            **kwargs
+        )
+
+        try:
+            r.raise_for_status()
+            if self.source_tracker:
+                if self.source_tracker.is_not_modified(url, r):
+                    return None
+                # the server does not support conditional requests, compare the content itself
+                if self.source_tracker.needs_digest(r) and \
+                        self.source_tracker.is_content_unchanged(url, hashlib.sha256(r.content).hexdigest()):
+                    return None
+            data = r.json()
+            return jmespath.search(expression=feed.get('extractor'), data=data)
+
+        except ValueError as VE:
+            raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
 
     def build_iterator(self, **kwargs) -> List:
         results = []
-        for feed_name, feed in self.feed_name_to_config.items():
-            r = requests.get(
-                url=feed.get('url', self.url),
-                verify=self.verify,
-                auth=self.auth,
-                cert=self.cert,
-                headers=self.headers,
-                **kwargs
-            )
-
-            try:
-                r.raise_for_status()
-                data = r.json()
-                result = jmespath.search(expression=feed.get('extractor'), data=data)
+        feeds = list(self.feed_name_to_config.items())
+        # the feeds are requested and parsed concurrently, each one in its own thread
+        responses = run_concurrently(lambda feed: self.fetch_feed(feed[1], **kwargs), feeds, max_workers=self.max_workers)
+        self.failed_feeds = {}
+        for (feed_name, _), (result, error) in zip(feeds, responses):
+            if error:
+                self.failed_feeds[feed_name] = error
+                demisto.error(f'Failed to fetch the {feed_name} feed: {error}')
+            elif result is None:
+                demisto.debug(f'The {feed_name} feed was not modified since the last fetch, skipping it')
+            else:
                 results.append({feed_name: result})
 
-            except ValueError as VE:
-                raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
+        if self.failed_feeds and len(self.failed_feeds) == len(feeds):
+            raise self.failed_feeds[feeds[0][0]]
 
         return results
 
+    def raise_for_failed_feeds(self):
+        """Raises an error if some of the feeds failed in the last build_iterator call.
+        It is called once the indicators of the other feeds were handled, so a partial failure is not silent.
+        """
+        if self.failed_feeds:
+            raise DemistoException('Failed to fetch {} of the feeds: {}'.format(
+                len(self.failed_feeds), ', '.join(f'{name} ({error})' for name, error in self.failed_feeds.items())))
+
 
 def test_module(client, params) -> str:
     client.build_iterator()
+    client.raise_for_failed_feeds()
     return 'ok'
 
 
-def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list, **kwargs) -> Union[Dict, List[Dict]]:
+def iterate_service_indicators(service_name: str, items: list, feed_config: dict, indicator_type: str,
+                               feedTags: list):
     """
-    Fetches the indicators from client.
-    :param client: Client of a JSON Feed
+    Yields the indicators of a single feed (service).
+    :param service_name: the name of the feed
+    :param items: the items extracted from the feed
+    :param feed_config: the configuration of the feed
     :param indicator_type: the default indicator type
     :param feedTags: the indicator tags
     """
-    indicators = []
-    for result in client.build_iterator(**kwargs):
-        for service_name, items in result.items():
-            feed_config = client.feed_name_to_config.get(service_name, {})
-            indicator_field = feed_config.get('indicator') if feed_config.get('indicator') else 'indicator'
-            indicator_type = feed_config.get('indicator_type', indicator_type)
-            for item in items:
-                mapping = feed_config.get('mapping')
+    indicator_field = feed_config.get('indicator') if feed_config.get('indicator') else 'indicator'
+    indicator_type = feed_config.get('indicator_type', indicator_type)
+    mapping = feed_config.get('mapping')
+    for item in items:
+        if isinstance(item, str):
+            item = {indicator_field: item}
+        indicator_value = item.get(indicator_field)
 
-                if isinstance(item, str):
-                    item = {indicator_field: item}
-                indicator_value = item.get(indicator_field)
+        current_indicator_type = indicator_type or auto_detect_indicator_type(indicator_value)
+        if not current_indicator_type:
+            continue
 
-                current_indicator_type = indicator_type or auto_detect_indicator_type(indicator_value)
-                if not current_indicator_type:
-                    continue
+        indicator = {'value': indicator_value, 'type': current_indicator_type, 'fields': {'tags': feedTags}}
 
-                indicator = {'value': indicator_value, 'type': current_indicator_type, 'fields': {'tags': feedTags}}
+        attributes = {'source_name': service_name, 'value': indicator_value,
+                      'type': current_indicator_type}
 
-                attributes = {'source_name': service_name, 'value': indicator_value,
-                              'type': current_indicator_type}
+        attributes.update(extract_all_fields_from_indicator(item, indicator_field))
 
-                attributes.update(extract_all_fields_from_indicator(item, indicator_field))
+        if mapping:
+            for map_key in mapping:
+                if map_key in attributes:
+                    indicator['fields'][mapping[map_key]] = attributes.get(map_key)  # type: ignore
 
-                if mapping:
-                    for map_key in mapping:
-                        if map_key in attributes:
-                            indicator['fields'][mapping[map_key]] = attributes.get(map_key)  # type: ignore
+        indicator['rawJSON'] = item
 
-                indicator['rawJSON'] = item
+        yield indicator
 
-                indicators.append(indicator)
+
+def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list, **kwargs) -> Union[Dict, List[Dict]]:
+    """
+    Fetches the indicators from client.
+    :param client: Client of a JSON Feed
+    :param indicator_type: the default indicator type
+    :param feedTags: the indicator tags
+    """
+    indicators: List[Dict] = []
+    for result in client.build_iterator(**kwargs):
+        for service_name, items in result.items():
+            feed_config = client.feed_name_to_config.get(service_name, {})
+            service_indicators = iterate_service_indicators(service_name, items, feed_config, indicator_type, feedTags)
+            if client.delta_tracker:
+                # only the indicators which are new or were changed since the last fetch
+                service_indicators = client.delta_tracker.filter_changed(service_name, service_indicators)
+            indicators.extend(service_indicators)
 
     return indicators
 
@@ -195,14 +277,23 @@ def feed_main(params, feed_name, prefix):
             return_outputs(test_module(client, params))
 
         elif command == 'fetch-indicators':
+            client.source_tracker = FeedSourceTracker.from_params(params, demisto.getLastRun())
+            client.delta_tracker = FeedDeltaTracker.from_params(params, demisto.getIntegrationContext())
             indicators = fetch_indicators_command(client, indicator_type, feedTags)
             for b in batch(indicators, batch_size=2000):
                 demisto.createIndicators(b)
+            demisto.setLastRun(client.source_tracker.to_last_run())
+            if client.delta_tracker:
+                integration_context = demisto.getIntegrationContext()
+                demisto.setIntegrationContext(client.delta_tracker.to_integration_context(integration_context))
+            # the failed feeds are fully fetched again in the next fetch
+            client.raise_for_failed_feeds()
 
         elif command == f'{prefix}get-indicators':
             # dummy command for testing
             limit = int(demisto.args().get('limit', 10))
             indicators = fetch_indicators_command(client, indicator_type, feedTags)[:limit]
+            client.raise_for_failed_feeds()
             hr = tableToMarkdown('Indicators', indicators, headers=['value', 'type', 'rawJSON'])
             return_outputs(hr, {}, indicators)
 
@@ -1,3 +1,4 @@
+import pytest
 from JSONFeedApiModule import Client, fetch_indicators_command, jmespath
 from CommonServerPython import *
 import requests_mock
@@ -118,3 +119,55 @@ def test_list_of_indicators_with_no_json_object():
         assert indicators[0].get('value') == '1.1.1.1'
         assert indicators[0].get('type') == 'IP'
         assert indicators[1].get('rawJSON') == {'indicator': '2.2.2.2'}
+
+
+def test_json_feed_multiple_feeds_with_one_failure(mocker):
+    """
+    Given
+    - Two feeds, one of them returns an error.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators of the healthy feed are fetched, and the failure is logged and raised afterwards.
+    """
+    with open('test_data/amazon_ip_ranges.json') as ip_ranges_json:
+        ip_ranges = json.load(ip_ranges_json)
+
+    feed_name_to_config = {
+        'AMAZON': {
+            'url': 'https://ip-ranges.amazonaws.com/ip-ranges.json',
+            'extractor': "prefixes[?service=='AMAZON']",
+            'indicator': 'ip_prefix',
+            'indicator_type': FeedIndicatorType.CIDR
+        },
+        'BROKEN': {
+            'url': 'https://broken.com/ip-ranges.json',
+            'extractor': '@',
+            'indicator': 'ip_prefix',
+            'indicator_type': FeedIndicatorType.CIDR
+        }
+    }
+    mocker.patch.object(demisto, 'error')
+
+    with requests_mock.Mocker() as m:
+        m.get('https://ip-ranges.amazonaws.com/ip-ranges.json', json=ip_ranges)
+        m.get('https://broken.com/ip-ranges.json', status_code=500)
+
+        client = Client(feed_name_to_config=feed_name_to_config)
+
+        indicators = fetch_indicators_command(client=client, indicator_type='CIDR', feedTags=['test'])
+        assert len(indicators) == 1117
+        assert demisto.error.call_count == 1
+        with pytest.raises(DemistoException, match='Failed to fetch 1 of the feeds: BROKEN'):
+            client.raise_for_failed_feeds()
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'polling_timeout': 'abc'}, 'Please provide an integer value for "Request Timeout"'),
+    ({'max_workers': None}, 'Please provide an integer value for "Max Workers"'),
+])
+def test_client_invalid_integer_params(params, error):
+    with pytest.raises(ValueError, match=error):
+        Client(url='https://ip-ranges.amazonaws.com/ip-ranges.json', **params)
@@ -0,0 +1,137 @@
+from CommonServerPython import *
+
+''' IMPORTS '''
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from flask import Response, request
+from typing import Optional
+
+''' GLOBALS '''
+RENDERED_OUTPUTS_MAX_BYTES = 64 * 1024 * 1024
+
+
+class RenderedOutputsCache:
+    """
+    Keeps the latest outputs rendered by a server, by the request arguments which created them.
+    The cache is limited by the total size of the rendered bodies, so a few large lists can not exhaust the memory of
+    the server. The least recently used outputs are dropped first, and an output larger than the limit is not cached.
+    """
+
+    def __init__(self, max_bytes: int = RENDERED_OUTPUTS_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._outputs: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def get_size(rendered_output: dict) -> int:
+        return len(rendered_output['body']) + len(rendered_output['gzip_body'])
+
+    def get(self, key: str) -> Optional[dict]:
+        rendered_output = self._outputs.get(key)
+        if rendered_output is not None:
+            self._outputs.move_to_end(key)
+        return rendered_output
+
+    def set(self, key: str, rendered_output: dict):
+        self.pop(key)
+        size = self.get_size(rendered_output)
+        if size > self.max_bytes:
+            return
+        while self._outputs and self.size + size > self.max_bytes:
+            self.pop(next(iter(self._outputs)))
+        self._outputs[key] = rendered_output
+        self.size += size
+
+    def pop(self, key: str):
+        rendered_output = self._outputs.pop(key, None)
+        if rendered_output is not None:
+            self.size -= self.get_size(rendered_output)
+
+    def clear(self):
+        self._outputs.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+
+RENDERED_OUTPUTS = RenderedOutputsCache()
+
+
+def get_request_args_key(request_args) -> str:
+    """Returns a key which identifies the output of the request arguments"""
+    return json.dumps(vars(request_args), sort_keys=True)
+
+
+def render_output(values: str, last_run, mimetype: str = 'text/plain') -> dict:
+    """
+    Renders the output values once, so every request for them is answered without formatting, encoding or
+    compressing them again
+
+    Args:
+        values: The output values
+        last_run: The time of the refresh which created the values
+        mimetype: The output mimetype
+
+    Returns:
+        dict. The rendered output - the body, its gzip compressed variant, its ETag and mimetype.
+    """
+    body = values.encode('utf-8')
+    return {
+        'body': body,
+        'gzip_body': gzip.compress(body),
+        'etag': hashlib.md5(body).hexdigest(),
+        'mimetype': mimetype,
+        'last_run': last_run
+    }
+
+
+def get_cached_output(request_args, params: dict, integration_context: dict = None) -> Optional[dict]:
+    """
+    Gets the rendered output of the request arguments, if it is still valid
+
+    Args:
+        request_args: The request arguments
+        params: The integration parameters
+        integration_context: The integration context, required in on-demand mode
+
+    Returns:
+        dict. The rendered output, or None if it was not rendered or it is outdated.
+    """
+    rendered_output = RENDERED_OUTPUTS.get(get_request_args_key(request_args))
+    if not rendered_output or not rendered_output.get('last_run'):
+        return None
+
+    if params.get('on_demand'):
+        # the list is updated by a command, so the output is valid as long as the list was not updated since
+        if integration_context and rendered_output['last_run'] == integration_context.get('last_run'):
+            return rendered_output
+
+    else:
+        cache_time, _ = parse_date_range(params.get('cache_refresh_rate'), to_timestamp=True)
+        if rendered_output['last_run'] > cache_time:
+            return rendered_output
+
+    return None
+
+
+def cache_output(request_args, rendered_output: dict):
+    """Saves the rendered output of the request arguments"""
+    RENDERED_OUTPUTS.set(get_request_args_key(request_args), rendered_output)
+
+
+def create_output_response(rendered_output: dict) -> Response:
+    """
+    Creates the response of a rendered output. The output is gzip compressed if the client accepts it, and the
+    response supports conditional (ETag) and range requests.
+    """
+    use_gzip = 'gzip' in request.accept_encodings and 'Range' not in request.headers
+    body = rendered_output['gzip_body'] if use_gzip else rendered_output['body']
+    response = Response(body, status=200, mimetype=rendered_output['mimetype'])
+    response.set_etag(rendered_output['etag'] + ('-gzip' if use_gzip else ''))
+    response.vary.add('Accept-Encoding')
+    if use_gzip:
+        response.content_encoding = 'gzip'
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(body))
@@ -0,0 +1,140 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from CommonServerPython import date_to_timestamp
+from RenderedOutputApiModule import RENDERED_OUTPUTS, RenderedOutputsCache, cache_output, create_output_response, \
+    get_cached_output, render_output
+
+
+class RequestArguments:
+    def __init__(self, query: str = 'type:IP', limit: int = 10):
+        self.query = query
+        self.limit = limit
+
+
+@pytest.fixture
+def client():
+    RENDERED_OUTPUTS.clear()
+    app = Flask('test')
+    values = '\n'.join('10.0.{}.{}'.format(i, j) for i in range(10) for j in range(256))
+    rendered_output = render_output(values, date_to_timestamp(datetime.now()))
+    app.add_url_rule('/', 'route', lambda: create_output_response(rendered_output))
+    return app.test_client()
+
+
+def test_create_output_response_gzip(client):
+    """
+    Given
+    - A rendered list
+
+    When
+    - Requesting the list with and without gzip encoding
+
+    Then
+    - Ensure the list is compressed only when gzip is accepted
+    """
+    response = client.get('/')
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.startswith(b'10.0.0.0\n10.0.0.1')
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(response.data) * 5 < len(gzip.decompress(response.data))
+    assert gzip.decompress(response.data).startswith(b'10.0.0.0\n10.0.0.1')
+
+
+def test_create_output_response_etag(client):
+    """
+    Given
+    - A rendered list
+
+    When
+    - Requesting the list with the ETag it was served with
+
+    Then
+    - Ensure 304 is returned with no body
+    """
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    # the uncompressed list has a different ETag
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_create_output_response_range(client):
+    """
+    Given
+    - A rendered list
+
+    When
+    - Requesting a range of the list with gzip encoding
+
+    Then
+    - Ensure the range of the uncompressed list is returned
+    """
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=9-16'})
+    assert response.status_code == 206
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'10.0.0.1'
+
+
+def test_get_cached_output():
+    """
+    Given
+    - A list rendered two minutes ago
+
+    When
+    - Getting the cached list with a longer and a shorter cache refresh rate, and in on-demand mode
+
+    Then
+    - Ensure the list is returned only while it is valid
+    """
+    RENDERED_OUTPUTS.clear()
+    last_run = date_to_timestamp(datetime.now()) - 2 * 60 * 1000
+    rendered_output = render_output('1.1.1.1', last_run)
+    cache_output(RequestArguments(), rendered_output)
+
+    assert get_cached_output(RequestArguments(), {'cache_refresh_rate': '5 minutes'}) == rendered_output
+    assert get_cached_output(RequestArguments(), {'cache_refresh_rate': '1 minute'}) is None
+    assert get_cached_output(RequestArguments(limit=5), {'cache_refresh_rate': '5 minutes'}) is None
+    assert get_cached_output(RequestArguments(), {'on_demand': True}, {'last_run': last_run}) == rendered_output
+    assert get_cached_output(RequestArguments(), {'on_demand': True}, {'last_run': last_run + 1}) is None
+
+
+def test_rendered_outputs_cache_size_limit():
+    """
+    Given
+    - A cache limited to 3 outputs of 100 bytes
+
+    When
+    - Caching outputs, using one of them and caching an output larger than the limit
+
+    Then
+    - Ensure the least recently used outputs are dropped to keep the total size under the limit
+    """
+    cache = RenderedOutputsCache(max_bytes=300)
+    rendered_output = {'body': b'a' * 50, 'gzip_body': b'b' * 50}
+    cache.set('1', rendered_output)
+    cache.set('2', rendered_output)
+    cache.set('3', rendered_output)
+    assert cache.size == 300
+
+    cache.get('1')
+    cache.set('4', rendered_output)
+    assert len(cache) == 3
+    assert cache.get('2') is None
+    assert cache.get('1') == rendered_output
+
+    cache.set('1', {'body': b'a' * 150, 'gzip_body': b'b' * 50})
+    assert cache.get('3') is None
+    assert cache.size == 300
+
+    cache.set('5', {'body': b'a' * 301, 'gzip_body': b''})
+    assert cache.get('5') is None
+    assert cache.size == 300
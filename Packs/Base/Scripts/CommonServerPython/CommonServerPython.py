@@ -3499,11 +3499,19 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_connections: ``int``
+        :param pool_connections: The number of connection pools (one per host) to keep open.
+
+        :type pool_maxsize: ``int``
+        :param pool_maxsize: The maximal number of connections to keep open in each pool.
+            Should be at least the number of requests sent at the same time.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_connections=10, pool_maxsize=10):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
@@ -3512,6 +3520,12 @@ if 'requests' in sys.modules:
             self._session = requests.Session()
             if not proxy:
                 self._session.trust_env = False
+            self._pool_connections = pool_connections
+            self._pool_maxsize = pool_maxsize
+            # adapters (each with its own connection pool) per retry configuration, see _implement_retry
+            self._adapters = {}
+            self._mounted_retry_signature = None
+            self._implement_retry()
 
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
@@ -3554,22 +3568,34 @@ if 'requests' in sys.modules:
                 whether we should raise an exception, or return a response,
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
+
+            The adapter of each distinct retry configuration is created once and kept, so the open (keep-alive)
+            connections of its pool are reused by the following requests with the same configuration.
             """
+            retry_signature = (retries, tuple(status_list_to_retry) if status_list_to_retry else None, backoff_factor,
+                               raise_on_redirect, raise_on_status)
+            if retry_signature == self._mounted_retry_signature:
+                return
             try:
-                retry = Retry(
-                    total=retries,
-                    read=retries,
-                    connect=retries,
-                    backoff_factor=backoff_factor,
-                    status=retries,
-                    status_forcelist=status_list_to_retry,
-                    method_whitelist=frozenset(['GET', 'POST', 'PUT']),
-                    raise_on_status=raise_on_status,
-                    raise_on_redirect=raise_on_redirect
-                )
-                adapter = HTTPAdapter(max_retries=retry)
+                adapter = self._adapters.get(retry_signature)
+                if adapter is None:
+                    retry = Retry(
+                        total=retries,
+                        read=retries,
+                        connect=retries,
+                        backoff_factor=backoff_factor,
+                        status=retries,
+                        status_forcelist=status_list_to_retry,
+                        method_whitelist=frozenset(['GET', 'POST', 'PUT']),
+                        raise_on_status=raise_on_status,
+                        raise_on_redirect=raise_on_redirect
+                    )
+                    adapter = HTTPAdapter(max_retries=retry, pool_connections=self._pool_connections,
+                                          pool_maxsize=self._pool_maxsize)
+                    self._adapters[retry_signature] = adapter
                 self._session.mount('http://', adapter)
                 self._session.mount('https://', adapter)
+                self._mounted_retry_signature = retry_signature
             except NameError:
                 pass
 
@@ -3692,10 +3718,10 @@ if 'requests' in sys.modules:
                         # Try to parse json error response
                         error_entry = res.json()
                         err_msg += '\n{}'.format(json.dumps(error_entry))
-                        raise DemistoException(err_msg)
+                        raise DemistoException(err_msg, res=res)
                     except ValueError:
                         err_msg += '\n{}'.format(res.text)
-                        raise DemistoException(err_msg)
+                        raise DemistoException(err_msg, res=res)
 
                 is_response_empty_and_successful = (res.status_code == 204)
                 if is_response_empty_and_successful and return_empty_response:
@@ -3745,6 +3771,77 @@ if 'requests' in sys.modules:
                 raise DemistoException(err_msg, exception)
 
 
+        def _http_request_batch(self, requests_params, max_workers=None, rate_limit_retries=3,
+                                max_rate_limit_wait=60):
+            """Sends many requests concurrently over a bounded pool of threads which share the client session.
+            When the server answers with 429 (Too Many Requests), all the threads wait for the time given in its
+            Retry-After header (or an exponential backoff when the header is missing) and the request is sent again.
+
+            Note: all the requests should use the same retry arguments (retries, status_list_to_retry, etc.),
+            as the retry configuration is set on the shared session.
+
+            :type requests_params: ``list``
+            :param requests_params: The keyword arguments of ``_http_request`` for each request, for example:
+                [{'method': 'GET', 'url_suffix': '/alerts/1'}, {'method': 'GET', 'url_suffix': '/alerts/2'}]
+
+            :type max_workers: ``int``
+            :param max_workers: The maximal number of requests to send at the same time. Default is the
+                *pool_maxsize* of the client.
+
+            :type rate_limit_retries: ``int``
+            :param rate_limit_retries: How many times to resend a request which was rate limited.
+
+            :type max_rate_limit_wait: ``float``
+            :param max_rate_limit_wait: The maximal number of seconds to wait before resending a rate limited request.
+
+            :return: list of (result, exception) tuples, in the same order as the given requests.
+                result is the return value of ``_http_request``, exception is None if the request succeeded.
+            :rtype: ``list``
+            """
+            self._rate_limited_until = 0
+
+            def send_request(request_params):
+                for attempt in range(rate_limit_retries + 1):
+                    wait = self._rate_limited_until - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                    try:
+                        return self._http_request(**request_params)
+                    except DemistoException as exception:
+                        if exception.res is None or exception.res.status_code != 429 or attempt == rate_limit_retries:
+                            raise
+                        retry_after = self._get_retry_after(exception.res, default=2 ** attempt)
+                        self._rate_limited_until = max(self._rate_limited_until,
+                                                       time.time() + min(retry_after, max_rate_limit_wait))
+
+            return run_concurrently(send_request, requests_params, max_workers=max_workers or self._pool_maxsize)
+
+        @staticmethod
+        def _get_retry_after(response, default=1):
+            """Gets the number of seconds to wait according to the Retry-After header of the response.
+
+            :type response: ``requests.Response``
+            :param response: The response.
+
+            :type default: ``float``
+            :param default: The number of seconds to return when the header is missing or invalid.
+
+            :return: The number of seconds to wait.
+            :rtype: ``float``
+            """
+            retry_after = response.headers.get('Retry-After')
+            if not retry_after:
+                return default
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                pass
+            from email.utils import parsedate_tz, mktime_tz
+            retry_date = parsedate_tz(retry_after)
+            if not retry_date:
+                return default
+            return max(mktime_tz(retry_date) - time.time(), 0)
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -3770,7 +3867,7 @@ def batch(iterable, batch_size=1):
     """Gets an iterable and yields slices of it.
 
     :type iterable: ``list``
-    :param iterable: list or other iterable object.
+    :param iterable: list or other iterable object (e.g. a generator, which is consumed lazily).
 
     :type batch_size: ``int``
     :param batch_size: the size of batches to fetch
@@ -3778,13 +3875,386 @@ def batch(iterable, batch_size=1):
     :rtype: ``list``
     :return:: Iterable slices of given
     """
-    current_batch = iterable[:batch_size]
-    not_batched = iterable[batch_size:]
-    while current_batch:
+    if isinstance(iterable, (list, tuple) + STRING_TYPES):
+        for i in range(0, len(iterable), batch_size):
+            yield iterable[i:i + batch_size]
+        return
+
+    current_batch = []
+    for item in iterable:
+        current_batch.append(item)
+        if len(current_batch) == batch_size:
+            yield current_batch
+            current_batch = []
+    if current_batch:
         yield current_batch
-        current_batch = not_batched[:batch_size]
-        not_batched = not_batched[batch_size:]
+
+
+def run_concurrently(func, items, max_workers=10):
+    """Runs the given function on each of the given items over a bounded pool of threads.
+    An exception raised for one item is captured and returned with its result, so it does not stop the other items.
+
+    :type func: ``function``
+    :param func: The function to run, gets a single item as an argument.
+
+    :type items: ``list``
+    :param items: list or other iterable object of the items to run the function on.
+
+    :type max_workers: ``int``
+    :param max_workers: The maximal number of threads to run at the same time.
+
+    :rtype: ``list``
+    :return:: list of (result, exception) tuples, in the same order as the given items.
+        For each item, exception is None if the function did not raise.
+    """
+    def run(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [run(item) for item in items]
+
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(max_workers, len(items)))
+    try:
+        return pool.map(run, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class FeedSourceTracker(object):
+    """Tracks the sources (URLs) of a feed between fetches, so sources which were not modified since the last
+    fetch can be skipped without parsing them.
+    A source is unchanged when the server answers the conditional request (If-None-Match / If-Modified-Since)
+    with 304, or - for servers which do not send an ETag or Last-Modified header - when the digest of its content
+    did not change.
+
+    :type last_run: ``dict``
+    :param last_run: The last run of the feed, as returned by ``demisto.getLastRun()``.
+
+    :type full_fetch_interval: ``int``
+    :param full_fetch_interval: Seconds after which a source is fully fetched even if it was not modified,
+        so its indicators will not expire. 0 disables the tracking, i.e. every source is fully fetched.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    LAST_RUN_KEY = 'feed_sources'
+    DEFAULT_FULL_FETCH_INTERVAL = 24 * 60 * 60
+
+    def __init__(self, last_run=None, full_fetch_interval=DEFAULT_FULL_FETCH_INTERVAL):
+        self.full_fetch_interval = full_fetch_interval
+        self._previous_sources = (last_run or {}).get(self.LAST_RUN_KEY) or {}
+        self._current_sources = {}
+
+    @classmethod
+    def from_params(cls, params, last_run=None):
+        """Creates a tracker according to the expiration policy of the feed.
+        Indicators which are not fetched again expire immediately in the "suddenDeath" policy, so the tracking is
+        disabled for it. In the "interval" policy, sources are fully fetched at least twice per expiration interval.
+
+        :type params: ``dict``
+        :param params: The integration parameters.
+
+        :type last_run: ``dict``
+        :param last_run: The last run of the feed, as returned by ``demisto.getLastRun()``.
+
+        :return: The tracker
+        :rtype: ``FeedSourceTracker``
+        """
+        expiration_policy = params.get('feedExpirationPolicy')
+        full_fetch_interval = cls.DEFAULT_FULL_FETCH_INTERVAL
+        if expiration_policy == 'suddenDeath':
+            full_fetch_interval = 0
+        elif expiration_policy == 'interval':
+            try:
+                # the expiration interval is given in minutes
+                full_fetch_interval = min(full_fetch_interval, int(params.get('feedExpirationInterval')) * 30)
+            except (TypeError, ValueError):
+                pass
+        return cls(last_run, full_fetch_interval)
+
+    def _get_previous_source(self, url):
+        source = self._previous_sources.get(url)
+        if not self.full_fetch_interval or not source:
+            return {}
+        if time.time() - source.get('fetched', 0) > self.full_fetch_interval:
+            return {}
+        return source
+
+    def get_request_headers(self, url):
+        """Gets the headers of a conditional request to the given source.
+
+        :type url: ``str``
+        :param url: The source URL.
+
+        :return: The conditional request headers, empty if the source should be fully fetched.
+        :rtype: ``dict``
+        """
+        source = self._get_previous_source(url)
+        headers = {}
+        if source.get('etag'):
+            headers['If-None-Match'] = source['etag']
+        if source.get('last_modified'):
+            headers['If-Modified-Since'] = source['last_modified']
+        return headers
+
+    def is_not_modified(self, url, response):
+        """Checks whether the server reported that the source was not modified and records the ETag and
+        Last-Modified headers of the response for the next fetch.
+
+        :type url: ``str``
+        :param url: The source URL.
+
+        :type response: ``requests.Response``
+        :param response: The response of the request sent with the headers of ``get_request_headers``.
+
+        :return: True if the source was not modified since the last fetch.
+        :rtype: ``bool``
+        """
+        if not self.full_fetch_interval:
+            return False
+        source = self._get_previous_source(url)
+        if response.status_code == 304 and source:
+            self._current_sources[url] = source
+            return True
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._current_sources[url] = {'etag': etag, 'last_modified': last_modified, 'fetched': int(time.time())}
+        return False
+
+    def needs_digest(self, response):
+        """Checks whether the content digest of the response is required to detect an unchanged source, i.e. the
+        server does not support conditional requests.
+
+        :type response: ``requests.Response``
+        :param response: The response of the source.
+
+        :rtype: ``bool``
+        """
+        supports_conditional_requests = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        return bool(self.full_fetch_interval) and not supports_conditional_requests
+
+    def is_content_unchanged(self, url, digest):
+        """Checks whether the content digest of the source is the same as in the last fetch and records it for
+        the next fetch.
+
+        :type url: ``str``
+        :param url: The source URL.
+
+        :type digest: ``str``
+        :param digest: The digest of the source content.
+
+        :return: True if the content did not change since the last fetch.
+        :rtype: ``bool``
+        """
+        if not self.full_fetch_interval:
+            return False
+        source = self._get_previous_source(url)
+        if source.get('digest') == digest:
+            self._current_sources[url] = source
+            return True
+        self._current_sources[url] = {'digest': digest, 'fetched': int(time.time())}
+        return False
+
+    @staticmethod
+    def spool_response_content(response, chunk_size=64 * 1024):
+        """Reads the content of a streamed response into a temporary file (kept in memory while it is small)
+        and calculates its digest on the way.
+
+        :type response: ``requests.Response``
+        :param response: The streamed response.
+
+        :type chunk_size: ``int``
+        :param chunk_size: The size of the chunks to read.
+
+        :return: The file, positioned at its start, and the hex SHA-256 digest of the content.
+        :rtype: ``tuple``
+        """
+        import hashlib
+        import tempfile
+        content_file = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+        sha256 = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            sha256.update(chunk)
+            content_file.write(chunk)
+        content_file.seek(0)
+        return content_file, sha256.hexdigest()
+
+    def to_last_run(self):
+        """Gets the state of the sources to store with ``demisto.setLastRun``.
+        Only the sources which were fetched (or found unchanged) in the current fetch are kept.
+
+        :rtype: ``dict``
+        """
+        return {self.LAST_RUN_KEY: self._current_sources}
+
+
+class FeedDeltaTracker(object):
+    """Keeps a compact fingerprint of the indicators of each source (URL) of a feed from the previous fetch, so
+    only new or changed indicators are created in the next fetch.
+    Each indicator is stored as 16 bytes - 8 bytes of the hash of its type and value and 8 bytes of the hash of
+    the whole indicator.
+    All the indicators of a source are still created once per ``full_push_interval``.
+
+    :type integration_context: ``dict``
+    :param integration_context: The integration context, as returned by ``demisto.getIntegrationContext()``.
+
+    :type track_removed: ``bool``
+    :param track_removed: Whether to keep the values of the indicators as well, in order to list the indicators
+        which were removed from the feed since the previous fetch.
+
+    :type full_push_interval: ``int``
+    :param full_push_interval: Seconds after which all the indicators of a source are created, even if they
+        did not change.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    FINGERPRINTS_KEY = 'feed_fingerprints'
+    VALUES_KEY = 'feed_indicator_values'
+    REMOVED_KEY = 'removed_indicators'
+    FULL_PUSHES_KEY = 'feed_full_pushes'
+    DEFAULT_FULL_PUSH_INTERVAL = 24 * 60 * 60
+
+    def __init__(self, integration_context=None, track_removed=False, full_push_interval=DEFAULT_FULL_PUSH_INTERVAL):
+        integration_context = integration_context or {}
+        self.track_removed = track_removed
+        self.full_push_interval = full_push_interval
+        self._previous_fingerprints = integration_context.get(self.FINGERPRINTS_KEY) or {}
+        self._previous_values = (integration_context.get(self.VALUES_KEY) or {}) if track_removed else {}
+        self._previous_full_pushes = integration_context.get(self.FULL_PUSHES_KEY) or {}
+        self._current_fingerprints = {}
+        self._current_values = {}
+        self._current_full_pushes = {}
+        self._removed = []
+
+    @classmethod
+    def from_params(cls, params, integration_context=None):
+        """Creates a tracker if the delta mode of the feed is enabled.
+        Indicators which are not created again expire under any expiration policy other than "never", so the
+        delta mode is ignored for them.
+
+        :type params: ``dict``
+        :param params: The integration parameters.
+
+        :type integration_context: ``dict``
+        :param integration_context: The integration context, as returned by ``demisto.getIntegrationContext()``.
+
+        :return: The tracker, or None if only new and changed indicators should not be filtered.
+        :rtype: ``FeedDeltaTracker``
+        """
+        if not argToBoolean(params.get('delta_mode', False)):
+            return None
+        if params.get('feedExpirationPolicy', 'never') != 'never':
+            demisto.debug('Ignoring the delta mode, indicators expire under the {} expiration policy'.format(
+                params.get('feedExpirationPolicy')))
+            return None
+        return cls(integration_context, argToBoolean(params.get('track_removed_indicators', False)))
+
+    @staticmethod
+    def _unpack(packed_fingerprints):
+        raw = base64.b64decode(packed_fingerprints)
+        return {raw[i:i + 8]: raw[i + 8:i + 16] for i in range(0, len(raw), 16)}
+
+    @staticmethod
+    def _pack(fingerprints):
+        return base64.b64encode(b''.join(key + digest for key, digest in fingerprints.items())).decode('ascii')
+
+    @staticmethod
+    def _hash(data):
+        import hashlib
+        return hashlib.sha1(data.encode('utf-8')).digest()[:8]
+
+    def filter_changed(self, source, indicators):
+        """Yields only the indicators of the source which are new or were changed since the previous fetch, and
+        records the fingerprints of all of them for the next fetch.
+        All the indicators are yielded when the last full push of the source is older than ``full_push_interval``.
+
+        :type source: ``str``
+        :param source: The source (URL or feed name) of the indicators.
+
+        :type indicators: ``iterable``
+        :param indicators: The indicators of the source, each one is a dict with at least value and type.
+
+        :return: Generator of the new or changed indicators.
+        :rtype: ``generator``
+        """
+        previous = self._unpack(self._previous_fingerprints.get(source, ''))
+        now = int(time.time())
+        last_full_push = self._previous_full_pushes.get(source, 0)
+        full_push = now - last_full_push >= self.full_push_interval
+        self._current_full_pushes[source] = now if full_push else last_full_push
+        current = {}
+        values = {}
+        for indicator in indicators:
+            value = u'{}'.format(indicator.get('value'))
+            indicator_type = u'{}'.format(indicator.get('type'))
+            key = self._hash(indicator_type + u'\t' + value)
+            try:
+                serialized_indicator = json.dumps(indicator, sort_keys=True, default=str)
+            except TypeError:
+                # keys of different types can not be sorted, e.g. the None key of extra CSV columns
+                serialized_indicator = json.dumps(indicator, default=str)
+            digest = self._hash(serialized_indicator)
+            current[key] = digest
+            if self.track_removed:
+                values[base64.b64encode(key).decode('ascii')] = [value, indicator_type]
+            if full_push or previous.get(key) != digest:
+                yield indicator
+
+        self._current_fingerprints[source] = self._pack(current)
+        if self.track_removed:
+            previous_values = self._previous_values.get(source, {})
+            self._removed.extend({'value': value, 'type': indicator_type}
+                                 for key, (value, indicator_type) in previous_values.items() if key not in values)
+            self._current_values[source] = values
+
+    def get_removed_indicators(self):
+        """Gets the indicators which were removed from the sources since the previous fetch.
+        Available only when ``track_removed`` is set, after all the indicators were consumed from ``filter_changed``.
+
+        :return: list of dicts with the value and type of each removed indicator.
+        :rtype: ``list``
+        """
+        return self._removed
+
+    def to_integration_context(self, integration_context=None):
+        """Gets the fingerprints to store with ``demisto.setIntegrationContext``.
+        Sources which were not processed in the current fetch (e.g. unchanged or failed sources) keep their
+        previous fingerprints.
+
+        :type integration_context: ``dict``
+        :param integration_context: The current integration context, its other keys are kept.
+
+        :rtype: ``dict``
+        """
+        fingerprints = dict(self._previous_fingerprints)
+        fingerprints.update(self._current_fingerprints)
+        full_pushes = dict(self._previous_full_pushes)
+        full_pushes.update(self._current_full_pushes)
+        context = dict(integration_context or {})
+        context[self.FINGERPRINTS_KEY] = fingerprints
+        context[self.FULL_PUSHES_KEY] = full_pushes
+        if self.track_removed:
+            values = dict(self._previous_values)
+            values.update(self._current_values)
+            context[self.VALUES_KEY] = values
+            context[self.REMOVED_KEY] = self._removed
+        return context
 
 
 class DemistoException(Exception):
-    pass
+    """Exception raised by the common code, for example by ``BaseClient._http_request``.
+
+    :type res: ``requests.Response``
+    :param res: The response of the request which failed, if there is one.
+    """
+    def __init__(self, *args, **kwargs):
+        self.res = kwargs.pop('res', None)
+        super(DemistoException, self).__init__(*args, **kwargs)
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import demistomock as demisto
+import base64
 import copy
 import json
 import re
 import os
 import sys
+import time
 import requests
 from pytest import raises, mark
 import pytest
@@ -13,9 +15,9 @@ from CommonServerPython import xml2json, json2xml, entryTypes, formats, tableToM
     flattenCell, date_to_timestamp, datetime, camelize, pascalToSpace, argToList, \
     remove_nulls_from_dictionary, is_error, get_error, hash_djb2, fileResult, is_ip_valid, get_demisto_version, \
     IntegrationLogger, parse_date_string, IS_PY3, DebugLogger, b64_encode, parse_date_range, return_outputs, \
-    argToBoolean, ipv4Regex, ipv4cidrRegex, ipv6cidrRegex, ipv6Regex, batch, FeedIndicatorType, \
+    argToBoolean, ipv4Regex, ipv4cidrRegex, ipv6cidrRegex, ipv6Regex, batch, run_concurrently, FeedIndicatorType, \
     encode_string_results, safe_load_json, remove_empty_elements, aws_table_to_markdown, is_demisto_version_ge, \
-    appendContext, auto_detect_indicator_type, handle_proxy
+    appendContext, auto_detect_indicator_type, handle_proxy, FeedSourceTracker, FeedDeltaTracker
 
 try:
     from StringIO import StringIO
@@ -1314,6 +1316,94 @@ class TestBaseClient:
                                       retries=3,
                                       status_list_to_retry=[400, 401, 500])
 
+    def test_http_request_reuses_adapters(self, requests_mock):
+        """
+            Given
+            - A base client with custom connection pool sizes
+
+            When
+            - Making several http requests, with two different retry configurations
+
+            Then
+            -  Ensure a single adapter is created per retry configuration and reused by the following requests
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', pool_connections=2, pool_maxsize=20)
+        requests_mock.get('http://example.com/api/v2/event', text=json.dumps(self.text))
+        client._http_request('get', 'event')
+        default_adapter = client._session.get_adapter('http://example.com')
+        assert default_adapter._pool_maxsize == 20
+        assert default_adapter._pool_connections == 2
+
+        client._http_request('get', 'event')
+        assert client._session.get_adapter('http://example.com') is default_adapter
+
+        client._http_request('get', 'event', retries=2, status_list_to_retry=[429])
+        retry_adapter = client._session.get_adapter('http://example.com')
+        assert retry_adapter is not default_adapter
+        assert retry_adapter.max_retries.total == 2
+
+        client._http_request('get', 'event')
+        assert client._session.get_adapter('http://example.com') is default_adapter
+        client._http_request('get', 'event', retries=2, status_list_to_retry=[429])
+        assert client._session.get_adapter('http://example.com') is retry_adapter
+        assert len(client._adapters) == 2
+
+    def test_http_request_batch(self, requests_mock, mocker):
+        """
+            Given
+            - A base client
+
+            When
+            - Sending a batch of requests, where one is rate limited once and one fails
+
+            Then
+            -  Ensure the results are returned in order, the rate limited request is resent after Retry-After
+               and the failure is returned for its request only
+        """
+        from CommonServerPython import BaseClient, DemistoException
+        sleep_mock = mocker.patch('CommonServerPython.time.sleep')
+        client = BaseClient('http://example.com/api/v2/')
+        requests_mock.get('http://example.com/api/v2/event/1', json={'id': 1})
+        requests_mock.get('http://example.com/api/v2/event/2', [
+            {'status_code': 429, 'headers': {'Retry-After': '3'}, 'json': {}},
+            {'status_code': 200, 'json': {'id': 2}}
+        ])
+        requests_mock.get('http://example.com/api/v2/event/3', status_code=404, json={})
+
+        results = client._http_request_batch(
+            [{'method': 'GET', 'url_suffix': 'event/{}'.format(i)} for i in range(1, 4)], max_workers=1)
+
+        assert [result for result, _ in results] == [{'id': 1}, {'id': 2}, None]
+        assert results[0][1] is None and results[1][1] is None
+        assert isinstance(results[2][1], DemistoException)
+        assert results[2][1].res.status_code == 404
+        assert sleep_mock.called
+        assert 2 < sleep_mock.call_args_list[0][0][0] <= 3
+
+    def test_http_request_batch_rate_limit_exhausted(self, requests_mock, mocker):
+        from CommonServerPython import BaseClient
+        mocker.patch('CommonServerPython.time.sleep')
+        client = BaseClient('http://example.com/api/v2/')
+        requests_mock.get('http://example.com/api/v2/event', status_code=429, json={})
+
+        results = client._http_request_batch([{'method': 'GET', 'url_suffix': 'event'}], rate_limit_retries=2)
+
+        assert requests_mock.call_count == 3
+        assert results[0][1].res.status_code == 429
+
+    @pytest.mark.parametrize('headers, expected', [
+        ({}, 1),
+        ({'Retry-After': '5'}, 5),
+        ({'Retry-After': 'invalid'}, 1),
+        ({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, 0),
+    ])
+    def test_get_retry_after(self, headers, expected):
+        from CommonServerPython import BaseClient
+        response = requests.Response()
+        response.headers.update(headers)
+        assert BaseClient._get_retry_after(response) == expected
+
     def test_http_request_json(self, requests_mock):
         requests_mock.get('http://example.com/api/v2/event', text=json.dumps(self.text))
         res = self.client._http_request('get', 'event')
@@ -1636,14 +1726,215 @@ batch_params = [
     ([1, 2, 3], 5, [[1, 2, 3]]),
     # out of index in end with batches
     ([1, 2, 3, 4, 5], 2, [[1, 2], [3, 4], [5]]),
-    ([1] * 100, 2, [[1, 1]] * 50)
+    ([1] * 100, 2, [[1, 1]] * 50),
+    # generator case
+    ((i for i in range(1, 6)), 2, [[1, 2], [3, 4], [5]]),
+    # empty generator case
+    ((i for i in []), 2, [])
 ]
 
 
 @pytest.mark.parametrize('iterable, sz, expected', batch_params)
 def test_batch(iterable, sz, expected):
-    for i, item in enumerate(batch(iterable, sz)):
-        assert expected[i] == item
+    batches = list(batch(iterable, sz))
+    assert batches == expected
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_run_concurrently(max_workers):
+    """
+    Given
+    - A function which fails for one of the items.
+
+    When
+    - Running the function concurrently on all of the items.
+
+    Then
+    - Ensure the results are returned in the order of the items and the failure is captured for its item only.
+    """
+    def divide(x):
+        return 10 // x
+
+    results = run_concurrently(divide, [1, 2, 0, 5], max_workers=max_workers)
+    assert [result for result, _ in results] == [10, 5, None, 2]
+    assert [type(error) for _, error in results] == [type(None), type(None), ZeroDivisionError, type(None)]
+
+
+class TestFeedSourceTracker:
+    URL = 'http://example.com/feed.txt'
+
+    def test_etag_not_modified(self, requests_mock):
+        """
+        Given
+        - A source which returns an ETag header.
+
+        When
+        - Fetching the source again with the last run of the previous fetch and getting 304.
+
+        Then
+        - Ensure the conditional headers are sent and the source is reported as not modified.
+        """
+        requests_mock.get(self.URL, text='1.1.1.1', headers={'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jun 2020'})
+        tracker = FeedSourceTracker()
+        response = requests.get(self.URL, headers=tracker.get_request_headers(self.URL))
+        assert not tracker.is_not_modified(self.URL, response)
+        assert not tracker.needs_digest(response)
+
+        tracker = FeedSourceTracker(tracker.to_last_run())
+        headers = tracker.get_request_headers(self.URL)
+        assert headers == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jun 2020'}
+        requests_mock.get(self.URL, status_code=304)
+        assert tracker.is_not_modified(self.URL, requests.get(self.URL, headers=headers))
+        assert self.URL in tracker.to_last_run()[FeedSourceTracker.LAST_RUN_KEY]
+
+    def test_content_digest(self, requests_mock):
+        """
+        Given
+        - A source which does not support conditional requests.
+
+        When
+        - Fetching the source three times, the content changes before the third fetch.
+
+        Then
+        - Ensure the source is unchanged in the second fetch only.
+        """
+        requests_mock.get(self.URL, text='1.1.1.1\n2.2.2.2')
+        last_run = {}
+        unchanged = []
+        for content in ['1.1.1.1\n2.2.2.2', '1.1.1.1\n2.2.2.2', '1.1.1.1']:
+            requests_mock.get(self.URL, text=content)
+            tracker = FeedSourceTracker(last_run)
+            response = requests.get(self.URL, stream=True)
+            assert tracker.needs_digest(response)
+            content_file, digest = FeedSourceTracker.spool_response_content(response)
+            assert content_file.read().decode() == content
+            unchanged.append(tracker.is_content_unchanged(self.URL, digest))
+            last_run = tracker.to_last_run()
+        assert unchanged == [False, True, False]
+
+    @pytest.mark.parametrize('params, full_fetch_interval', [
+        ({}, FeedSourceTracker.DEFAULT_FULL_FETCH_INTERVAL),
+        ({'feedExpirationPolicy': 'suddenDeath'}, 0),
+        ({'feedExpirationPolicy': 'interval', 'feedExpirationInterval': '60'}, 1800),
+        ({'feedExpirationPolicy': 'interval', 'feedExpirationInterval': '20160'},
+         FeedSourceTracker.DEFAULT_FULL_FETCH_INTERVAL),
+    ])
+    def test_from_params(self, params, full_fetch_interval):
+        assert FeedSourceTracker.from_params(params).full_fetch_interval == full_fetch_interval
+
+    def test_full_fetch_interval_passed(self, mocker):
+        """
+        Given
+        - A source which was fully fetched more than full_fetch_interval seconds ago.
+
+        When
+        - Getting the conditional request headers.
+
+        Then
+        - Ensure no conditional headers are sent, so the source is fully fetched.
+        """
+        last_run = {FeedSourceTracker.LAST_RUN_KEY: {self.URL: {'etag': '"abc"', 'fetched': 1000}}}
+        mocker.patch('CommonServerPython.time.time', return_value=1000 + 61)
+        assert FeedSourceTracker(last_run, full_fetch_interval=60).get_request_headers(self.URL) == {}
+        assert FeedSourceTracker(last_run, full_fetch_interval=120).get_request_headers(self.URL) == \
+            {'If-None-Match': '"abc"'}
+
+
+class TestFeedDeltaTracker:
+    INDICATORS = [
+        {'value': '1.1.1.1', 'type': 'IP', 'rawJSON': {'score': 1}},
+        {'value': '2.2.2.2', 'type': 'IP', 'rawJSON': {'score': 1}},
+        {'value': u'\u05d0.com', 'type': 'Domain', 'rawJSON': {}},
+    ]
+
+    def test_filter_changed(self):
+        """
+        Given
+        - Indicators of a source which were fetched in the previous fetch.
+
+        When
+        - Fetching the source again, where one indicator changed, one was added and one was removed.
+
+        Then
+        - Ensure only the changed and the new indicators are returned, and the removed one is listed.
+        """
+        tracker = FeedDeltaTracker(track_removed=True)
+        assert list(tracker.filter_changed('url', self.INDICATORS)) == self.INDICATORS
+        assert tracker.get_removed_indicators() == []
+
+        indicators = [
+            {'value': '1.1.1.1', 'type': 'IP', 'rawJSON': {'score': 1}},
+            {'value': '2.2.2.2', 'type': 'IP', 'rawJSON': {'score': 3}},
+            {'value': '3.3.3.3', 'type': 'IP', 'rawJSON': {}},
+        ]
+        tracker = FeedDeltaTracker(tracker.to_integration_context(), track_removed=True)
+        assert list(tracker.filter_changed('url', indicators)) == indicators[1:]
+        assert tracker.get_removed_indicators() == [{'value': u'\u05d0.com', 'type': 'Domain'}]
+        assert tracker.to_integration_context()['removed_indicators'] == [{'value': u'\u05d0.com', 'type': 'Domain'}]
+
+    def test_unprocessed_source_is_kept(self):
+        """
+        Given
+        - Fingerprints of two sources from the previous fetch.
+
+        When
+        - Only one of the sources is processed in the current fetch (e.g. the other was not modified).
+
+        Then
+        - Ensure the fingerprints of the other source are kept, each indicator takes 16 bytes.
+        """
+        tracker = FeedDeltaTracker()
+        list(tracker.filter_changed('url1', self.INDICATORS))
+        list(tracker.filter_changed('url2', self.INDICATORS[:1]))
+        context = tracker.to_integration_context()
+        assert 'feed_indicator_values' not in context
+        assert len(base64.b64decode(context['feed_fingerprints']['url1'])) == 16 * 3
+
+        tracker = FeedDeltaTracker(context)
+        assert list(tracker.filter_changed('url2', [])) == []
+        context = tracker.to_integration_context()
+        assert set(context['feed_fingerprints'].keys()) == {'url1', 'url2'}
+        assert context['feed_fingerprints']['url2'] == ''
+
+    def test_full_push(self, mocker):
+        """
+        Given
+        - Indicators of a source which were all created in the previous fetch.
+
+        When
+        - Fetching the source again after the full push interval passed.
+
+        Then
+        - Ensure all the indicators are returned again, and the other keys of the integration context are kept.
+        """
+        tracker = FeedDeltaTracker({'other': 'value'})
+        list(tracker.filter_changed('url', self.INDICATORS))
+        context = tracker.to_integration_context({'other': 'value'})
+        assert context['other'] == 'value'
+
+        assert list(FeedDeltaTracker(context).filter_changed('url', self.INDICATORS)) == []
+        mocker.patch('CommonServerPython.time.time', return_value=time.time() + FeedDeltaTracker.DEFAULT_FULL_PUSH_INTERVAL)
+        assert list(FeedDeltaTracker(context).filter_changed('url', self.INDICATORS)) == self.INDICATORS
+
+    @pytest.mark.parametrize('params, is_enabled', [
+        ({'delta_mode': True}, True),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'never'}, True),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'indicatorType'}, False),
+        ({'delta_mode': True, 'feedExpirationPolicy': 'suddenDeath'}, False),
+        ({'delta_mode': False, 'feedExpirationPolicy': 'never'}, False),
+    ])
+    def test_from_params(self, params, is_enabled):
+        """
+        Given
+        - The delta mode and expiration policy parameters of a feed.
+
+        When
+        - Creating the delta tracker of a fetch.
+
+        Then
+        - Ensure the tracker is created only when the delta mode is on and indicators do not expire.
+        """
+        assert (FeedDeltaTracker.from_params(params) is not None) == is_enabled
 
 
 regexes_test = [
@@ -1,4 +1,5 @@
 # pylint: disable=no-member
+import hashlib
 from string import punctuation
 
 import demisto_ml
@@ -6,21 +7,67 @@ import demisto_ml
 from CommonServerPython import *
 
 
-def get_model_data(model_name, store_type, is_return_error):
+HIGHLIGHT_WORD_STYLE_TEMPLATE = '**%s**'
+
+# every run of the script is executed with new globals, so the decoded models of this container are kept on the
+# demisto_ml module, which outlives the run
+MODELS_CACHE_ATTRIBUTE = 'dbot_predict_phishing_words_models_cache'
+
+
+def read_model_from_list(model_name):
     res_model_list = demisto.executeCommand("getList", {"listName": model_name})[0]
+    if is_error(res_model_list):
+        return None
+    return res_model_list["Contents"]
+
+
+def read_model_from_ml_model(model_name):
     res_model = demisto.executeCommand("getMLModel", {"modelName": model_name})[0]
+    if is_error(res_model):
+        return None
+    return res_model['Contents']['modelData']
+
+
+def get_model_data(model_name, store_type, is_return_error):
+    # read the requested store first and fall back to the other one only when the model is not there
+    readers = [read_model_from_list, read_model_from_ml_model]
+    if store_type == "mlModel":
+        readers.reverse()
+    for reader in readers:
+        model_data = reader(model_name)
+        if model_data is not None:
+            return model_data
+    handle_error("error reading model %s from Demisto" % model_name, is_return_error)
+
+
+def get_model_data_version(model_data):
+    if not isinstance(model_data, bytes):
+        model_data = model_data.encode('utf-8')
+    return hashlib.md5(model_data).hexdigest()  # nosec
 
-    if is_error(res_model_list) and not is_error(res_model):
-        return res_model['Contents']['modelData']
-    elif not is_error(res_model_list) and is_error(res_model):
-        return res_model_list["Contents"]
-    elif not is_error(res_model_list) and not is_error(res_model):
-        if store_type == "list":
-            return res_model_list["Contents"]
-        elif store_type == "mlModel":
-            return res_model['Contents']['modelData']
-    else:
-        handle_error("error reading model %s from Demisto" % model_name, is_return_error)
+
+def get_models_cache():
+    """
+    Returns the decoded models of this container, by model name: (model data digest, decoded model).
+    """
+    if not hasattr(demisto_ml, MODELS_CACHE_ATTRIBUTE):
+        setattr(demisto_ml, MODELS_CACHE_ATTRIBUTE, {})
+    return getattr(demisto_ml, MODELS_CACHE_ATTRIBUTE)
+
+
+def load_model(model_name, store_type, is_return_error):
+    """
+    Returns the decoded model, decoding it only if this container has not decoded the same model version before.
+    The version is the digest of the stored model data, so a retrained model is always decoded again.
+    """
+    model_data = get_model_data(model_name, store_type, is_return_error)
+    version = get_model_data_version(model_data)
+    models_cache = get_models_cache()
+    cached_version, model = models_cache.get(model_name, (None, None))
+    if cached_version != version:
+        model = demisto_ml.decode_model(model_data)
+        models_cache[model_name] = (version, model)
+    return model
 
 
 def handle_error(message, is_return_error):
@@ -31,23 +78,58 @@ def handle_error(message, is_return_error):
         sys.exit(1)
 
 
-def predict_phishing_words(model_name, model_store_type, email_subject, email_body, min_text_length, label_threshold,
-                           word_threshold, top_word_limit, is_return_error, set_incidents_fields=False):
-    model_data = get_model_data(model_name, model_store_type, is_return_error)
-    model = demisto_ml.decode_model(model_data)
-    text = "%s %s" % (email_subject, email_body)
-    res = demisto.executeCommand('WordTokenizerNLP', {'value': text,
-                                                      'hashWordWithSeed': demisto.args().get('hashSeed')})
+def tokenize_texts(texts, is_return_error):
+    """
+    Tokenizes all the texts with a single WordTokenizerNLP call.
+    :param texts: list of texts
+    :param is_return_error: whether to return an error entry when the tokenization fails
+    :return: list of tokenization results, in the same order as the texts
+    """
+    tokenizer_args = {'hashWordWithSeed': demisto.args().get('hashSeed')}
+    if len(texts) == 1:
+        tokenizer_args['value'] = texts[0]
+    else:
+        tokenizer_args['value'] = json.dumps(texts)
+        tokenizer_args['isValueJson'] = 'yes'
+    res = demisto.executeCommand('WordTokenizerNLP', tokenizer_args)
     if is_error(res[0]):
         handle_error(res[0]['Contents'], is_return_error)
-    tokenized_text_result = res[0]['Contents']
+    tokenized_text_results = res[0]['Contents']
+    if isinstance(tokenized_text_results, dict):
+        tokenized_text_results = [tokenized_text_results]
+    return tokenized_text_results
+
+
+def highlight_words(text, terms):
+    """
+    Marks the words of the text that contain any of the terms, the same way the HighlightWords script does.
+    :param text: the text to highlight
+    :param terms: list of words
+    :return: the lower-cased highlighted text, or None if the text does not contain any of the terms
+    """
+    terms = sorted(set(t.strip().lower() for t in terms if t.strip()), key=len, reverse=True)
+    text_words = text.lower().split(" ")
+    found = False
+    for i, text_word in enumerate(text_words):
+        if any(term in text_word for term in terms):
+            text_words[i] = HIGHLIGHT_WORD_STYLE_TEMPLATE % text_word
+            found = True
+    return " ".join(text_words) if found else None
+
+
+def explain_tokenized_text(model, tokenized_text_result, min_text_length, label_threshold, word_threshold,
+                           top_word_limit):
+    """
+    Predicts the label of a tokenized text and finds the words that explain the prediction.
+    :return: tuple of the explain result and an error message, exactly one of them is None
+    """
     input_text = tokenized_text_result['hashedTokenizedText'] if tokenized_text_result.get('hashedTokenizedText') else \
         tokenized_text_result['tokenizedText']
     filtered_text, filtered_text_number_of_words = demisto_ml.filter_model_words(input_text, model)
     if filtered_text_number_of_words == 0:
-        handle_error("The model does not contains any of the input text words", is_return_error)
+        return None, "The model does not contains any of the input text words"
     if filtered_text_number_of_words < min_text_length:
-        handle_error("The model contains less then %d words" % min_text_length, is_return_error)
+        return None, "The model contains less then %d words" % min_text_length
 
     explain_result = demisto_ml.explain_model_words(model,
                                                     input_text,
@@ -56,8 +138,7 @@ def predict_phishing_words(model_name, model_store_type, email_subject, email_bo
                                                     top_word_limit)
     predicted_prob = explain_result["Probability"]
     if predicted_prob < label_threshold:
-        handle_error("Label probability is {:.2f} and it's below the input threshold".format(
-            predicted_prob), is_return_error)
+        return None, "Label probability is {:.2f} and it's below the input threshold".format(predicted_prob)
 
     if tokenized_text_result.get('hashedTokenizedText'):
         words_to_token_maps = tokenized_text_result['wordsToHashedTokens']
@@ -70,39 +151,49 @@ def predict_phishing_words(model_name, model_store_type, email_subject, email_bo
     positive_words = [s.strip(punctuation) for s in positive_words]
     negative_words = [s.strip(punctuation) for s in negative_words]
 
-    if len(positive_words) > 0:
-        res = demisto.executeCommand('HighlightWords', {'text': tokenized_text_result['originalText'],
-                                                        'terms': ",".join(positive_words)})
-        res = res[0]
-        if not is_error(res):
-            highlighted_text_markdown = res['Contents']
-        else:
-            highlighted_text_markdown = tokenized_text_result['originalText'].strip()
-    else:
-        highlighted_text_markdown = tokenized_text_result['originalText'].strip()
+    original_text = tokenized_text_result['originalText'].strip()
+    highlighted_text_markdown = None
+    if len(positive_words) > 0 and original_text:
+        highlighted_text_markdown = highlight_words(original_text, positive_words)
 
     explain_result['PositiveWords'] = positive_words
     explain_result['NegativeWords'] = negative_words
-    explain_result['OriginalText'] = tokenized_text_result['originalText'].strip()
-    explain_result['TextTokensHighlighted'] = highlighted_text_markdown
-    predicted_label = explain_result["Label"]
-
-    explain_result_hr = dict()
-    explain_result_hr['TextTokensHighlighted'] = highlighted_text_markdown
-    explain_result_hr['Label'] = predicted_label
-    explain_result_hr['Probability'] = "%.2f" % predicted_prob
-    explain_result_hr['PositiveWords'] = ", ".join(positive_words)
-    explain_result_hr['NegativeWords'] = ", ".join(negative_words)
+    explain_result['OriginalText'] = original_text
+    explain_result['TextTokensHighlighted'] = highlighted_text_markdown or original_text
+    return explain_result, None
+
+
+def explain_result_to_hr(explain_result):
+    return {
+        'TextTokensHighlighted': explain_result['TextTokensHighlighted'],
+        'Label': explain_result['Label'],
+        'Probability': "%.2f" % explain_result['Probability'],
+        'PositiveWords': ", ".join(explain_result['PositiveWords']),
+        'NegativeWords': ", ".join(explain_result['NegativeWords'])
+    }
+
+
+def predict_phishing_words(model_name, model_store_type, email_subject, email_body, min_text_length, label_threshold,
+                           word_threshold, top_word_limit, is_return_error, set_incidents_fields=False):
+    model = load_model(model_name, model_store_type, is_return_error)
+    text = "%s %s" % (email_subject, email_body)
+    tokenized_text_result = tokenize_texts([text], is_return_error)[0]
+    explain_result, error = explain_tokenized_text(model, tokenized_text_result, min_text_length, label_threshold,
+                                                   word_threshold, top_word_limit)
+    if error:
+        handle_error(error, is_return_error)
+
     incident_context = demisto.incidents()[0]
     if not incident_context['isPlayground'] and set_incidents_fields:
-        demisto.executeCommand("setIncident", {'dbotprediction': predicted_label,
-                                               'dbotpredictionprobability': predicted_prob,
-                                               'dbottextsuggestionhighlighted': highlighted_text_markdown})
+        demisto.executeCommand("setIncident", {'dbotprediction': explain_result['Label'],
+                                               'dbotpredictionprobability': explain_result['Probability'],
+                                               'dbottextsuggestionhighlighted':
+                                                   explain_result['TextTokensHighlighted']})
     return {
         'Type': entryTypes['note'],
         'Contents': explain_result,
         'ContentsFormat': formats['json'],
-        'HumanReadable': tableToMarkdown('DBot Predict Phishing Words', explain_result_hr,
+        'HumanReadable': tableToMarkdown('DBot Predict Phishing Words', explain_result_to_hr(explain_result),
                                          headers=['TextTokensHighlighted', 'Label', 'Probability',
                                                   'PositiveWords', 'NegativeWords'],
                                          removeNull=True),
@@ -113,6 +204,43 @@ def predict_phishing_words(model_name, model_store_type, email_subject, email_bo
     }
 
 
+def predict_phishing_words_batch(model_name, model_store_type, emails, min_text_length, label_threshold,
+                                 word_threshold, top_word_limit, is_return_error):
+    """
+    Predicts a list of emails with a single model load and a single tokenization call.
+    An email that cannot be predicted gets an Error field instead of failing the whole batch.
+    :param emails: list of dicts with emailSubject and emailBody (or emailBodyHTML) keys
+    """
+    model = load_model(model_name, model_store_type, is_return_error)
+    texts = ["%s %s" % (email.get('emailSubject', ''), email.get('emailBody', '') or email.get('emailBodyHTML', ''))
+             for email in emails]
+    tokenized_text_results = tokenize_texts(texts, is_return_error)
+    explain_results = []
+    hr_results = []
+    for tokenized_text_result in tokenized_text_results:
+        explain_result, error = explain_tokenized_text(model, tokenized_text_result, min_text_length,
+                                                       label_threshold, word_threshold, top_word_limit)
+        if error:
+            explain_result = {'OriginalText': tokenized_text_result['originalText'].strip(), 'Error': error}
+            hr_results.append({'Error': error})
+        else:
+            hr_results.append(explain_result_to_hr(explain_result))
+        explain_results.append(explain_result)
+    return {
+        'Type': entryTypes['note'],
+        'Contents': explain_results,
+        'ContentsFormat': formats['json'],
+        'HumanReadable': tableToMarkdown('DBot Predict Phishing Words', hr_results,
+                                         headers=['TextTokensHighlighted', 'Label', 'Probability',
+                                                  'PositiveWords', 'NegativeWords', 'Error'],
+                                         removeNull=True),
+        'HumanReadableFormat': formats['markdown'],
+        'EntryContext': {
+            'DBotPredictPhishingWords': explain_results
+        }
+    }
+
+
 def find_words_contain_tokens(positive_tokens, words_to_token_maps):
     positive_words = []
     for word, word_in_tokens_list in words_to_token_maps.items():
@@ -122,6 +250,17 @@ def find_words_contain_tokens(positive_tokens, words_to_token_maps):
 
 
 def main():
+    emails = demisto.args().get('emails')
+    if emails:
+        return predict_phishing_words_batch(demisto.args()['modelName'],
+                                            demisto.args()['modelStoreType'],
+                                            json.loads(emails) if isinstance(emails, str) else emails,
+                                            int(demisto.args()['minTextLength']),
+                                            float(demisto.args().get("labelProbabilityThreshold", 0)),
+                                            float(demisto.args().get('wordThreshold', 0)),
+                                            int(demisto.args()['topWordsLimit']),
+                                            demisto.args()['returnError'] == 'true'
+                                            )
     result = predict_phishing_words(demisto.args()['modelName'],
                                     demisto.args()['modelStoreType'],
                                     demisto.args().get('emailSubject', ''),
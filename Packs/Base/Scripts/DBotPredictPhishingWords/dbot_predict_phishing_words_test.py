@@ -3,7 +3,9 @@ from collections import defaultdict
 import pytest
 
 from CommonServerPython import *
-from DBotPredictPhishingWords import get_model_data, predict_phishing_words, main
+import DBotPredictPhishingWords
+from DBotPredictPhishingWords import get_model_data, load_model, predict_phishing_words, predict_phishing_words_batch, \
+    main
 
 TOKENIZATION_RESULT = None
 
@@ -17,7 +19,7 @@ def get_args():
 
 
 def bold(word):
-    return '<b>{}</b>'.format(word)
+    return '**{}**'.format(word)
 
 
 def executeCommand(command, args=None):
@@ -31,14 +33,6 @@ def executeCommand(command, args=None):
         TOKENIZATION_RESULT['tokenizedText'] = args['value']
         return [{'Contents': TOKENIZATION_RESULT,
                  'Type': 'note'}]
-    elif command == 'HighlightWords':
-        text = args['text']
-        terms = set(args['terms'].split(','))
-        words = text.split()
-        for i, w in enumerate(words):
-            if w in terms:
-                words[i] = bold(w)
-        return [{'Contents': ' '.join(words), 'Type': 'note'}]
 
 
 def test_get_model_data(mocker):
@@ -47,6 +41,67 @@ def test_get_model_data(mocker):
     assert "ModelDataML" == get_model_data("test", "mlModel", True)
 
 
+def test_get_model_data_reads_requested_store_first(mocker):
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
+    assert "ModelDataML" == get_model_data("test", "mlModel", True)
+    assert [c[0][0] for c in execute_command.call_args_list] == ['getMLModel']
+
+    def execute_command_no_ml_model(command, args=None):
+        if command == 'getMLModel':
+            return [{'Contents': 'Item not found', 'Type': entryTypes['error']}]
+        return executeCommand(command, args)
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command_no_ml_model)
+    assert "ModelDataList" == get_model_data("test", "mlModel", True)
+    assert [c[0][0] for c in execute_command.call_args_list] == ['getMLModel', 'getList']
+
+
+def test_load_model_decodes_each_version_once(mocker):
+    mocker.patch.object(DBotPredictPhishingWords.demisto_ml, DBotPredictPhishingWords.MODELS_CACHE_ATTRIBUTE, {},
+                        create=True)
+    mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
+    decode_model = mocker.patch('demisto_ml.decode_model', side_effect=lambda data: 'Model' + data, create=True)
+    assert load_model("test", "list", True) == "ModelModelDataList"
+    assert load_model("test", "list", True) == "ModelModelDataList"
+    assert decode_model.call_count == 1
+    assert load_model("test", "mlModel", True) == "ModelModelDataML"
+    assert decode_model.call_count == 2
+
+
+def test_predict_phishing_words_batch(mocker):
+    def execute_command(command, args=None):
+        if command == 'WordTokenizerNLP':
+            assert args['isValueJson'] == 'yes'
+            return [{'Contents': [{'originalText': text,
+                                   'tokenizedText': text,
+                                   'originalWordsToTokens': {w: [w] for w in text.split()}}
+                                  for text in json.loads(args['value'])],
+                     'Type': 'note'}]
+        return executeCommand(command, args)
+
+    execute_command_mock = mocker.patch.object(demisto, 'executeCommand', side_effect=execute_command)
+    mocker.patch.object(demisto, 'args', return_value={'topWordsLimit': 10})
+    mocker.patch('demisto_ml.decode_model', return_value="Model", create=True)
+    mocker.patch('demisto_ml.filter_model_words', side_effect=lambda text, model: (text, len(text.split())),
+                 create=True)
+    mocker.patch('demisto_ml.explain_model_words', side_effect=lambda model, text, *args: {
+        "Label": 'Valid', 'Probability': 0.7, 'PositiveWords': ['word1'], 'NegativeWords': ['word2']}, create=True)
+    emails = [{'emailSubject': 'word1', 'emailBody': 'word2 word3'},
+              {'emailSubject': 'word1', 'emailBodyHTML': 'word2'},
+              {'emailSubject': 'word1'}]
+
+    res = predict_phishing_words_batch("modelName", "list", emails, 2, 0, 0, 10, True)
+    assert res['Contents'] == [{'OriginalText': 'word1 word2 word3',
+                                'Probability': 0.7, 'NegativeWords': ['word2'],
+                                'TextTokensHighlighted': '**word1** word2 word3',
+                                'PositiveWords': ['word1'], 'Label': 'Valid'},
+                               {'OriginalText': 'word1 word2',
+                                'Probability': 0.7, 'NegativeWords': ['word2'],
+                                'TextTokensHighlighted': '**word1** word2',
+                                'PositiveWords': ['word1'], 'Label': 'Valid'},
+                               {'OriginalText': 'word1', 'Error': 'The model contains less then 2 words'}]
+    assert [c[0][0] for c in execute_command_mock.call_args_list].count('WordTokenizerNLP') == 1
+
+
 def test_predict_phishing_words(mocker):
     global TOKENIZATION_RESULT
     mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
@@ -67,7 +122,7 @@ def test_predict_phishing_words(mocker):
     res = predict_phishing_words("modelName", "list", "word1", "word2 word3", 0, 0, 0, 10, True)
     correct_res = {'OriginalText': 'word1 word2 word3',
                    'Probability': 0.7, 'NegativeWords': ['word2'],
-                   'TextTokensHighlighted': '<b>word1</b> word2 word3',
+                   'TextTokensHighlighted': '**word1** word2 word3',
                    'PositiveWords': ['word1'], 'Label': 'Valid'}
     assert res['Contents'] == correct_res
 
@@ -133,7 +188,7 @@ def test_predict_phishing_words_hashed(mocker):
     res = predict_phishing_words("modelName", "list", "word1", "word2 word3", 0, 0, 0, 10, True)
     assert res['Contents'] == {'OriginalText': 'word1 word2 word3',
                                'Probability': 0.7, 'NegativeWords': ['word2'],
-                               'TextTokensHighlighted': '<b>word1</b> word2 word3',
+                               'TextTokensHighlighted': '**word1** word2 word3',
                                'PositiveWords': ['word1'], 'Label': 'Valid'}
 
 
@@ -231,7 +286,7 @@ def test_main(mocker):
     res = main()
     correct_res = {'OriginalText': 'word1 word2 word3',
                    'Probability': 0.7, 'NegativeWords': ['word2'],
-                   'TextTokensHighlighted': '<b>word1</b> word2 word3',
+                   'TextTokensHighlighted': '**word1** word2 word3',
                    'PositiveWords': ['word1'], 'Label': 'Valid'}
     assert res['Contents'] == correct_res
 
@@ -7,6 +7,7 @@ from dateutil import parser
 from CommonServerPython import *
 
 PREFIXES_TO_REMOVE = ['incident.']
+DEFAULT_PAGE_SIZE = 500
 
 
 def parse_datetime(datetime_str):
@@ -67,8 +68,8 @@ def build_incidents_query(extra_query, incident_types, time_field, from_date, to
     return query
 
 
-def get_incidents(query, time_field, size, from_date):
-    args = {"query": query, "size": size, "sort": time_field}
+def get_incidents(query, time_field, size, from_date, page=0):
+    args = {"query": query, "size": size, "sort": time_field, "page": page}
     if time_field == "created" and from_date:
         from_datetime = None
         try:
@@ -87,6 +88,36 @@ def get_incidents(query, time_field, size, from_date):
     return incident_list
 
 
+def get_incidents_pages(query, time_field, limit, from_date, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yield the incidents which match the query page by page, until limit incidents were fetched
+    """
+    page_size = min(page_size, limit)
+    fetched = 0
+    page = 0
+    while fetched < limit:
+        incident_list = get_incidents(query, time_field, page_size, from_date, page)[:limit - fetched]
+        if not incident_list:
+            break
+        fetched += len(incident_list)
+        yield incident_list
+        if len(incident_list) < page_size:
+            break
+        page += 1
+
+
+def process_incident(incident, fields_to_populate, include_context):
+    # we flat the custom field to the incident structure, like in the context
+    custom_fields = incident.get('CustomFields', {}) or {}
+    incident.update(custom_fields)
+    incident_id = incident['id']
+    if fields_to_populate:
+        incident = {k: v for k, v in incident.items() if k in fields_to_populate}
+    if include_context and (not fields_to_populate or 'context' in fields_to_populate):
+        incident['context'] = get_context(incident_id)
+    return incident
+
+
 def get_comma_sep_list(value):
     return map(lambda x: x.strip(), value.split(","))
 
@@ -115,28 +146,18 @@ def main():
                                   d_args.get('fromDate'),
                                   d_args.get('toDate'),
                                   d_args.get('NonEmptyFields'))
-    incident_list = get_incidents(query, d_args['timeField'],
-                                  int(d_args['limit']),
-                                  d_args.get('fromDate'))
     fields_to_populate = d_args.get('populateFields')   # type: ignore
     if len(fields_to_populate) > 0:  # type: ignore
         fields_to_populate += d_args['NonEmptyFields']
         fields_to_populate = set([x for x in fields_to_populate if x])  # type: ignore
     include_context = d_args['includeContext'] == 'true'
-    # extend incidents fields \ context
-    new_incident_list = []
-    for i in incident_list:
-        # we flat the custom field to the incident structure, like in the context
-        custom_fields = i.get('CustomFields', {}) or {}
-        i.update(custom_fields)
-        if include_context:
-            i['context'] = get_context(i['id'])
-
-        if fields_to_populate and len(fields_to_populate) > 0:
-            i = {k: v for k, v in i.items() if k in fields_to_populate}
-        new_incident_list.append(i)
-
-    incident_list = new_incident_list
+    # extend incidents fields \ context, one page at a time
+    incident_list = []
+    for page in get_incidents_pages(query, d_args['timeField'],
+                                    int(d_args['limit']),
+                                    d_args.get('fromDate'),
+                                    int(d_args.get('pageSize') or DEFAULT_PAGE_SIZE)):
+        incident_list += [process_incident(i, fields_to_populate, include_context) for i in page]
 
     # output
     file_name = str(uuid.uuid4())
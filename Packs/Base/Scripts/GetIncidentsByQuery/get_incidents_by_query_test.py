@@ -1,6 +1,8 @@
+import pytest
 from CommonServerPython import *
+import GetIncidentsByQuery
 from GetIncidentsByQuery import build_incidents_query, get_incidents, parse_relative_time, main,\
-    preprocess_incidents_fields_list
+    preprocess_incidents_fields_list, get_incidents_pages
 
 incident1 = {
     'id': 1,
@@ -20,6 +22,13 @@ incident2 = dict(incident1)
 incident2['id'] = 2
 
 
+@pytest.fixture(autouse=True)
+def mock_file_result(mocker):
+    # the output file is not written to the working directory
+    mocker.patch.object(GetIncidentsByQuery, 'fileResult',
+                        side_effect=lambda filename, data: {'Type': entryTypes['file'], 'File': filename})
+
+
 def get_args():
     args = {}
     args['incidentTypes'] = 'Phishing,Malware'
@@ -70,6 +79,47 @@ def test_get_incidents(mocker):
     get_incidents(query, "modified", size, "3 weeks ago")
 
 
+def test_get_incidents_pages(mocker):
+    incidents = [{'id': i} for i in range(7)]
+
+    def get_page(command, args):
+        start = args['page'] * args['size']
+        return [{'Type': entryTypes['note'], 'Contents': {'data': incidents[start:start + args['size']]}}]
+
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=get_page)
+    pages = list(get_incidents_pages('query', 'modified', 100, None, page_size=3))
+    assert pages == [incidents[:3], incidents[3:6], incidents[6:]]
+    assert execute_command.call_count == 3
+
+    pages = list(get_incidents_pages('query', 'modified', 5, None, page_size=3))
+    assert pages == [incidents[:3], incidents[3:5]]
+
+
+def test_main_context_not_fetched_when_not_populated(mocker):
+    args = get_args()
+    args['includeContext'] = 'true'
+    args['populateFields'] = 'testField'
+    mocker.patch.object(demisto, 'args', return_value=args)
+    execute_command = mocker.patch.object(demisto, 'executeCommand', return_value=[
+        {'Type': entryTypes['note'], 'Contents': {'data': [dict(incident1), dict(incident2)]}}])
+    entry = main()
+    assert entry['Contents'] == [{'testField': 'testValue'}, {'testField': 'testValue'}]
+    assert execute_command.call_count == 1
+
+
+def test_main_context_populated_without_id(mocker):
+    args = get_args()
+    args['includeContext'] = 'true'
+    args['populateFields'] = 'context,name'
+    mocker.patch.object(demisto, 'args', return_value=args)
+    execute_command = mocker.patch.object(demisto, 'executeCommand', side_effect=[
+        [{'Type': entryTypes['note'], 'Contents': {'data': [dict(incident1)]}}],
+        [{'Type': entryTypes['note'], 'Contents': {'context': {'key': 'value'}}}]])
+    entry = main()
+    assert entry['Contents'] == [{'name': 'This is incident1', 'context': {'key': 'value'}}]
+    assert execute_command.call_args_list[1][0][1] == {'id': 1}
+
+
 def test_parse_relative_time():
     threshold = 2
     t1 = parse_relative_time("3 days ago")
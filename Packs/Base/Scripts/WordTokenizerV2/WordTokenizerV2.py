@@ -24,6 +24,8 @@ REPLACE_URLS = demisto.args()['replaceUrls'] == 'yes'
 REPLACE_NUMBERS = demisto.args()['replaceNumbers'] == 'yes'
 LEMMATIZER = demisto.args()['useLemmatization'] == 'yes'
 VALUE_IS_JSON = demisto.args()['isValueJson'] == 'yes'
+BATCH_SIZE = int(demisto.args().get('batchSize', 1000))
+N_PROCESS = int(demisto.args().get('numberOfProcesses', 1))
 
 HTML_PATTERNS = [
     re.compile(r"(?is)<(script|style).*?>.*?(</\1>)"),
@@ -45,6 +47,11 @@ LANGUAGES_TO_MODEL_NAMES = {'English': 'en_core_web_sm',
                             }
 
 
+# every run of the script is executed with new globals, so the loaded spaCy pipelines of this container are kept
+# on the spacy module, which outlives the run
+SPACY_MODELS_ATTRIBUTE = 'word_tokenizer_models_cache'
+
+
 _unicode_chr_splitter = _Re('(?s)((?:[\ud800-\udbff][\udc00-\udfff])|.)').split
 
 
@@ -72,16 +79,44 @@ def hash_word(word):
     return str(hash_djb2(word, int(HASH_SEED)))
 
 
-def tokenize_text(text):
+def to_unicode(text):
     try:
-        unicode_text = unicode(text)
+        return unicode(text)
     except Exception:
-        unicode_text = text
+        return text
+
+
+def tokenize_text(text):
+    unicode_text = to_unicode(text)
     language = demisto.args()['language']
     if language in LANGUAGES_TO_MODEL_NAMES:
         original_words_to_tokens, tokens_list = tokenize_text_spacy(unicode_text, language)
     else:
         original_words_to_tokens, tokens_list = tokenize_text_other(unicode_text)
+    return build_tokenization_result(original_words_to_tokens, tokens_list)
+
+
+def tokenize_texts(texts):
+    """
+    Tokenize a list of texts. For spaCy languages the model is loaded once and the texts are processed in
+    batches using nlp.pipe.
+    :param texts: list of texts
+    :return: list of tokenize_text results, in the same order as the texts
+    """
+    language = demisto.args()['language']
+    if language not in LANGUAGES_TO_MODEL_NAMES:
+        return [tokenize_text(t) for t in texts]
+    unicode_texts = [to_unicode(t) for t in texts]
+    nlp = get_spacy_model(language)
+    pipe_kwargs = {'batch_size': BATCH_SIZE}
+    if N_PROCESS > 1:
+        pipe_kwargs['n_process'] = N_PROCESS
+    docs = nlp.pipe(unicode_texts, **pipe_kwargs)
+    return [build_tokenization_result(*tokenize_spacy_doc(nlp, doc, unicode_text))
+            for unicode_text, doc in zip(unicode_texts, docs)]
+
+
+def build_tokenization_result(original_words_to_tokens, tokens_list):
     hashed_tokens_list = []
     if HASH_SEED:
         for word in tokens_list:
@@ -114,9 +149,30 @@ def tokenize_text_other(unicode_text):
     return original_words_to_tokens, tokens_list
 
 
+def get_spacy_models():
+    """
+    Returns the loaded spaCy pipelines of this container, by language.
+    """
+    if not hasattr(spacy, SPACY_MODELS_ATTRIBUTE):
+        setattr(spacy, SPACY_MODELS_ATTRIBUTE, {})
+    return getattr(spacy, SPACY_MODELS_ATTRIBUTE)
+
+
+def get_spacy_model(language):
+    spacy_models = get_spacy_models()
+    if language not in spacy_models:
+        spacy_models[language] = spacy.load(LANGUAGES_TO_MODEL_NAMES[language],
+                                            disable=['tagger', 'parser', 'ner', 'textcat'])
+    return spacy_models[language]
+
+
 def tokenize_text_spacy(unicode_text, language):
-    nlp = spacy.load(LANGUAGES_TO_MODEL_NAMES[language], disable=['tagger', 'parser', 'ner', 'textcat'])
+    nlp = get_spacy_model(language)
     doc = nlp(unicode(unicode_text))
+    return tokenize_spacy_doc(nlp, doc, unicode_text)
+
+
+def tokenize_spacy_doc(nlp, doc, unicode_text):
     original_text_indices_to_words = map_indices_to_words(unicode_text)
     tokens_list = []
     original_words_to_tokens = {}  # type: ignore
@@ -176,12 +232,9 @@ def word_tokenize(text):
         text = [text]
 
     result = []
-    for t in text:
-        original_text = t
-        t = remove_line_breaks(t)
-        t = clean_html(t)
-        t = remove_multiple_whitespaces(t)
-        tokenized_text, hash_tokenized_text, original_words_to_tokens, words_to_hashed_tokens = tokenize_text(t)
+    clean_texts = [remove_multiple_whitespaces(clean_html(remove_line_breaks(t))) for t in text]
+    for original_text, tokenization_result in zip(text, tokenize_texts(clean_texts)):
+        tokenized_text, hash_tokenized_text, original_words_to_tokens, words_to_hashed_tokens = tokenization_result
         text_result = {
             'originalText': original_text,
             'tokenizedText': tokenized_text,
@@ -1,4 +1,5 @@
 # coding=utf-8
+import imp
 from collections import defaultdict
 
 import demistomock
@@ -17,7 +18,8 @@ def get_args():
 demistomock.args = get_args
 
 from WordTokenizerV2 import remove_line_breaks, clean_html, tokenize_text, word_tokenize,\
-    remove_multiple_whitespaces, map_indices_to_words  # noqa
+    remove_multiple_whitespaces, map_indices_to_words, get_spacy_models  # noqa
+import WordTokenizerV2  # noqa
 
 
 def test_remove_line_breaks():
@@ -56,6 +58,22 @@ def test_word_tokenize_words_to_tokens():
         assert all(t in tokens_list_output for t in tokens_list) and all(t in tokens_list for t in tokens_list_output)
 
 
+def test_word_tokenize_list_loads_model_once(mocker):
+    get_spacy_models().clear()
+    load_spy = mocker.spy(WordTokenizerV2.spacy, 'load')
+    texts = ["test@demisto.com is 100 going to http://google.com bla bla", "going to bla"]
+    entry = word_tokenize(texts)
+    assert load_spy.call_count == 1
+    assert [r['tokenizedText'] for r in entry['Contents']] == ["EMAIL_PATTERN NUMBER_PATTERN go URL_PATTERN bla bla",
+                                                               "go bla"]
+    word_tokenize(texts[1])
+    assert load_spy.call_count == 1
+    # the next run of the script is executed with new globals, and reuses the pipeline kept on the spacy module
+    new_run = imp.load_source('WordTokenizerV2_new_run', WordTokenizerV2.__file__.replace('.pyc', '.py'))
+    new_run.word_tokenize(texts[1])
+    assert load_spy.call_count == 1
+
+
 def test_inclusion():
     text = 'a aa  aaa'
     indices_to_words = map_indices_to_words(text)
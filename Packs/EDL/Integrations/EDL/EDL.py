@@ -8,8 +8,8 @@ from multiprocessing import Process
 from gevent.pywsgi import WSGIServer
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
-from netaddr import IPAddress, iprange_to_cidrs
-from typing import Callable, List, Any, Dict, cast, Tuple
+from netaddr import IPAddress
+from typing import Callable, List, Any, Dict, cast, Tuple, Optional
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 
 
@@ -25,6 +25,7 @@ PAGE_SIZE: int = 200
 DEMISTO_LOGGER: Handler = Handler()
 APP: Flask = Flask('demisto-edl')
 EDL_VALUES_KEY: str = 'dmst_edl_values'
+EDL_FULL_REFRESH_INTERVAL: str = '1 day'  # the default maximal time between full refreshes of the EDL
 EDL_LIMIT_ERR_MSG: str = 'Please provide a valid integer for EDL Size'
 EDL_OFFSET_ERR_MSG: str = 'Please provide a valid integer for Starting Index'
 EDL_COLLAPSE_ERR_MSG: str = 'The Collapse parameter can only get the following: 0 - Dont Collapse, ' \
@@ -113,41 +114,131 @@ def get_params_port(params: dict = demisto.params()) -> int:
     return port
 
 
-def refresh_edl_context(request_args: RequestArguments) -> str:
+def compact_iocs(iocs: list) -> list:
     """
-    Refresh the cache values and format using an indicator_query to call demisto.searchIndicators
+    Keeps only the fields of the IoCs which are needed to format the EDL, as [value, indicator_type] pairs
+    """
+    return [[ioc.get('value'), ioc.get('indicator_type')] for ioc in iocs if ioc.get('value')]
 
-    Parameters:
-        request_args: Request arguments
 
-    Returns: List(IoCs in output format)
+def expand_iocs(iocs: list) -> list:
+    """
+    Transforms compact [value, indicator_type] pairs back to IoC dicts. IoC dicts are returned as they are.
+    """
+    return [ioc if isinstance(ioc, dict) else {'value': ioc[0], 'indicator_type': ioc[1]} for ioc in iocs]
+
+
+def get_full_refresh_interval(full_refresh_interval: Optional[str]) -> int:
+    """
+    Gets the maximal time between full refreshes of the EDL, in milliseconds.
+    Indicators which were deleted, expired or stopped matching the query are not returned by the search of the
+    modified indicators, so the EDL is fully refreshed at least once per full refresh interval to remove them.
+    """
+    start_time, end_time = parse_date_range(full_refresh_interval or EDL_FULL_REFRESH_INTERVAL, to_timestamp=True)
+    return end_time - start_time
+
+
+def is_incremental_refresh(request_args: RequestArguments, integration_context: dict, now: int,
+                           full_refresh_interval: int) -> bool:
+    """
+    Checks whether the EDL can be refreshed with only the indicators which were modified since the last refresh.
+    A full refresh is done when the request changed, when the EDL reached its size limit (new indicators could not be
+    added to it), and at least once every full_refresh_interval.
+    """
+    current_iocs = integration_context.get('current_iocs')
+    return bool(current_iocs) \
+        and len(current_iocs) < request_args.limit \
+        and integration_context.get('last_modified') is not None \
+        and request_args.query == integration_context.get('last_query') \
+        and not request_args.is_request_change(integration_context) \
+        and now - integration_context.get('last_full_refresh', 0) < full_refresh_interval
+
+
+def find_modified_indicators(request_args: RequestArguments, integration_context: dict) -> list:
+    """
+    Updates the cached IoCs with the indicators which were modified since the last refresh
+
+    Returns:
+        list: The updated IoCs, as [value, indicator_type] pairs
     """
-    now = datetime.now()
-    # poll indicators into edl from demisto
-    iocs = find_indicators_to_limit(request_args.query, request_args.limit, request_args.offset)
-    out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
+    iocs = integration_context.get('current_iocs', [])
+    modified_query = f'modified:>="{integration_context["last_modified"]}"'
+    if request_args.query:
+        modified_query = f'({request_args.query}) and {modified_query}'
+    value_to_index = {ioc[0]: index for index, ioc in enumerate(iocs)}
+    for value, indicator_type in compact_iocs(find_indicators_to_limit(modified_query, request_args.limit)):
+        if value in value_to_index:
+            iocs[value_to_index[value]] = [value, indicator_type]
+        elif len(iocs) < request_args.limit:
+            value_to_index[value] = len(iocs)
+            iocs.append([value, indicator_type])
+    return iocs
 
-    while actual_indicator_amount < request_args.limit:
-        # from where to start the new poll and how many results should be fetched
-        new_offset = len(iocs) + request_args.offset + actual_indicator_amount - 1
-        new_limit = request_args.limit - actual_indicator_amount
 
-        # poll additional indicators into list from demisto
-        new_iocs = find_indicators_to_limit(request_args.query, new_limit, new_offset)
+def refresh_edl_context(request_args: RequestArguments, integration_context: dict = None,
+                        full_refresh_interval: str = None) -> str:
+    """
+    Refresh the cache values and format using an indicator_query to call demisto.searchIndicators.
+    If the EDL was fully refreshed within the full refresh interval with the same request, only the indicators which
+    were modified since then are fetched.
 
-        # in case no additional indicators exist - exit
-        if len(new_iocs) == 0:
-            break
+    Parameters:
+        request_args: Request arguments
+        integration_context: The integration context
+        full_refresh_interval: The full_refresh_interval configuration value
 
-        # add the new results to the existing results
-        iocs += new_iocs
+    Returns: List(IoCs in output format)
+    """
+    integration_context = integration_context or {}
+    now = date_to_timestamp(datetime.now())
+    last_modified = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
 
-        # reformat the output
-        out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
+    if is_incremental_refresh(request_args, integration_context, now, get_full_refresh_interval(full_refresh_interval)):
+        iocs = find_modified_indicators(request_args, integration_context)
+        out_dict, _ = create_values_for_returned_dict(expand_iocs(iocs), request_args)
+        last_full_refresh = integration_context.get('last_full_refresh')
 
-    out_dict["last_run"] = date_to_timestamp(now)
-    out_dict["current_iocs"] = iocs
-    demisto.setIntegrationContext(out_dict)
+    else:
+        # poll indicators into edl from demisto
+        iocs = compact_iocs(find_indicators_to_limit(request_args.query, request_args.limit, request_args.offset))
+        formatted_indicators = format_indicators(expand_iocs(iocs), request_args)
+        actual_indicator_amount = count_formatted_indicators(formatted_indicators, request_args)
+
+        while actual_indicator_amount < request_args.limit:
+            # from where to start the new poll and how many results should be fetched
+            new_offset = len(iocs) + request_args.offset
+            new_limit = request_args.limit - actual_indicator_amount
+
+            # poll additional indicators into list from demisto
+            new_iocs = compact_iocs(find_indicators_to_limit(request_args.query, new_limit, new_offset))
+
+            # in case no additional indicators exist - exit
+            if len(new_iocs) == 0:
+                break
+
+            # add the new results to the existing results, formatting only the new ones
+            iocs += new_iocs
+            for formatted, new_formatted in zip(formatted_indicators,
+                                                format_indicators(expand_iocs(new_iocs), request_args)):
+                formatted.extend(new_formatted)
+            actual_indicator_amount = count_formatted_indicators(formatted_indicators, request_args)
+
+        out_dict, _ = values_to_returned_dict(formatted_indicators, request_args)
+        last_full_refresh = now
+
+    demisto.setIntegrationContext({
+        'last_output': out_dict,
+        'last_run': now,
+        'last_full_refresh': last_full_refresh,
+        'last_modified': last_modified,
+        'last_limit': request_args.limit,
+        'last_offset': request_args.offset,
+        'last_query': request_args.query,
+        'drop_invalids': request_args.drop_invalids,
+        'url_port_stripping': request_args.url_port_stripping,
+        'collapse_ips': request_args.collapse_ips,
+        'current_iocs': iocs
+    })
     return out_dict[EDL_VALUES_KEY]
 
 
@@ -212,73 +303,6 @@ def find_indicators_to_limit_loop(indicator_query: str, limit: int, total_fetche
     return iocs, next_page
 
 
-def ip_groups_to_cidrs(ip_range_groups: list):
-    """Collapse ip groups list to CIDRs
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of CIDRs.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        moved_ip = False
-        # CIDR must begin with an even LSB
-        # if the first ip does not - separate it from the rest of the range
-        if (int(str(min_ip).split('.')[-1]) % 2) != 0:
-            ip_ranges.append(str(min_ip))
-            min_ip = group[1]
-            moved_ip = True
-
-        # CIDR must end with uneven LSB
-        # if the last ip does not - separate it from the rest of the range
-        if (int(str(max_ip).split('.')[-1]) % 2) == 0:
-            ip_ranges.append(str(max_ip))
-            max_ip = group[-2]
-            moved_ip = True
-
-        # if both min and max ips were shifted and there are only 2 ips in the range
-        # we added both ips by the shift and now we move to the next  range
-        if moved_ip and len(group) == 2:
-            continue
-
-        else:
-            ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
-
-    return ip_ranges
-
-
-def ip_groups_to_ranges(ip_range_groups: list):
-    """Collapse ip groups list to ranges.
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of Ranges.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        ip_ranges.append(str(min_ip) + "-" + str(max_ip))
-
-    return ip_ranges
-
-
 def ips_to_ranges(ips: list, collapse_ips):
     """Collapse IPs to Ranges or CIDRs.
 
@@ -289,36 +313,27 @@ def ips_to_ranges(ips: list, collapse_ips):
     Returns:
         list. a list to Ranges or CIDRs.
     """
-    ips_range_groups = []  # type:List
-    ips = sorted(ips)
-
-    if len(ips) > 0:
-        ips_range_groups.append([ips[0]])
-
-    if len(ips) > 1:
-        for ip in ips[1:]:
-            appended = False
-
-            for group in ips_range_groups:
-                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
-                    group.append(ip)
-                    sorted(group)
-                    appended = True
-
-            if not appended:
-                ips_range_groups.append([ip])
-
     if collapse_ips == COLLAPSE_TO_RANGES:
-        return ip_groups_to_ranges(ips_range_groups)
+        return collapse_ips_to_ranges(ips)
 
     else:
-        return ip_groups_to_cidrs(ips_range_groups)
+        return collapse_ips_to_cidrs(ips)
 
 
 def create_values_for_returned_dict(iocs: list, request_args: RequestArguments) -> Tuple[dict, int]:
     """
     Create a dictionary for output values
     """
+    return values_to_returned_dict(format_indicators(iocs, request_args), request_args)
+
+
+def format_indicators(iocs: list, request_args: RequestArguments) -> Tuple[list, list, list]:
+    """
+    Formats the IoCs to EDL values
+
+    Returns:
+        tuple. The formatted indicators, and the IPv4 and IPv6 indicators to collapse.
+    """
     formatted_indicators = []
     ipv4_formatted_indicators = []
     ipv6_formatted_indicators = []
@@ -362,20 +377,48 @@ def create_values_for_returned_dict(iocs: list, request_args: RequestArguments)
         else:
             formatted_indicators.append(indicator)
 
+    return formatted_indicators, ipv4_formatted_indicators, ipv6_formatted_indicators
+
+
+def collapse_formatted_indicators(formatted_indicators: Tuple[list, list, list],
+                                  request_args: RequestArguments) -> list:
+    """
+    Collapses the IPs of the formatted indicators and returns all the EDL values
+    """
+    values, ipv4_formatted_indicators, ipv6_formatted_indicators = formatted_indicators
+    values = list(values)
     if len(ipv4_formatted_indicators) > 0:
-        ipv4_formatted_indicators = ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.extend(ipv4_formatted_indicators)
+        values.extend(ips_to_ranges(ipv4_formatted_indicators, request_args.collapse_ips))
 
     if len(ipv6_formatted_indicators) > 0:
-        ipv6_formatted_indicators = ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips)
-        formatted_indicators.extend(ipv6_formatted_indicators)
-    return {EDL_VALUES_KEY: list_to_str(formatted_indicators, '\n')}, len(formatted_indicators)
+        values.extend(ips_to_ranges(ipv6_formatted_indicators, request_args.collapse_ips))
+    return values
+
+
+def count_formatted_indicators(formatted_indicators: Tuple[list, list, list], request_args: RequestArguments) -> int:
+    """
+    Counts the EDL values of the formatted indicators
+    """
+    values, ipv4_formatted_indicators, ipv6_formatted_indicators = formatted_indicators
+    if not ipv4_formatted_indicators and not ipv6_formatted_indicators:
+        return len(values)
+    return len(collapse_formatted_indicators(formatted_indicators, request_args))
+
+
+def values_to_returned_dict(formatted_indicators: Tuple[list, list, list],
+                            request_args: RequestArguments) -> Tuple[dict, int]:
+    """
+    Create a dictionary for output values from the formatted indicators
+    """
+    values = collapse_formatted_indicators(formatted_indicators, request_args)
+    return {EDL_VALUES_KEY: list_to_str(values, '\n')}, len(values)
 
 
 def get_edl_ioc_values(on_demand: bool,
                        request_args: RequestArguments,
                        integration_context: dict,
-                       cache_refresh_rate: str = None) -> str:
+                       cache_refresh_rate: str = None,
+                       full_refresh_interval: str = None) -> str:
     """
     Get the ioc list to return in the edl
 
@@ -384,13 +427,14 @@ def get_edl_ioc_values(on_demand: bool,
         request_args: the request arguments
         integration_context: The integration context
         cache_refresh_rate: The cache_refresh_rate configuration value
+        full_refresh_interval: The full_refresh_interval configuration value
 
     Returns:
         string representation of the iocs
     """
     last_run = integration_context.get('last_run')
     last_query = integration_context.get('last_query')
-    current_iocs = integration_context.get('current_iocs')
+    current_iocs = expand_iocs(integration_context.get('current_iocs') or [])
 
     # on_demand ignores cache
     if on_demand:
@@ -404,7 +448,7 @@ def get_edl_ioc_values(on_demand: bool,
             cache_time, _ = parse_date_range(cache_refresh_rate, to_timestamp=True)
             if last_run <= cache_time or request_args.is_request_change(integration_context) or \
                     request_args.query != last_query:
-                values_str = refresh_edl_context(request_args)
+                values_str = refresh_edl_context(request_args, integration_context, full_refresh_interval)
             else:
                 values_str = get_ioc_values_str_from_context(integration_context, request_args=request_args)
         else:
@@ -495,13 +539,22 @@ def route_edl_values() -> Response:
 
     request_args = get_request_args(request.args, params)
 
+    # in on-demand mode the EDL may be updated by a command, so the integration context is always checked
+    integration_context = demisto.getIntegrationContext() if params.get('on_demand') else None
+    rendered_edl = get_cached_output(request_args, params, integration_context)
+    if rendered_edl:
+        return create_output_response(rendered_edl)
+
     values = get_edl_ioc_values(
         on_demand=params.get('on_demand'),
         request_args=request_args,
-        integration_context=demisto.getIntegrationContext(),
+        integration_context=integration_context or demisto.getIntegrationContext(),
         cache_refresh_rate=params.get('cache_refresh_rate'),
+        full_refresh_interval=params.get('full_refresh_interval'),
     )
-    return Response(values, status=200, mimetype='text/plain')
+    rendered_edl = render_output(values, demisto.getIntegrationContext().get('last_run'))
+    cache_output(request_args, rendered_edl)
+    return create_output_response(rendered_edl)
 
 
 def get_request_args(request_args: dict, params: dict) -> RequestArguments:
@@ -552,6 +605,7 @@ def test_module(_, params):
     Validates:
         1. Valid port.
         2. Valid cache_refresh_rate
+        3. full_refresh_interval is longer than cache_refresh_rate
     """
     get_params_port(params)
     on_demand = params.get('on_demand', None)
@@ -572,7 +626,10 @@ def test_module(_, params):
                                   'years']:
             raise ValueError(
                 'Invalid time unit for the Refresh Rate. Must be minutes, hours, days, months, or years.')
-        parse_date_range(cache_refresh_rate, to_timestamp=True)
+        cache_start_time, cache_end_time = parse_date_range(cache_refresh_rate, to_timestamp=True)
+        # validate the EDL can be refreshed incrementally between full refreshes
+        if get_full_refresh_interval(params.get('full_refresh_interval')) <= cache_end_time - cache_start_time:
+            raise ValueError('The Full Refresh Interval must be longer than the Refresh Rate.')
     run_long_running(params, is_test=True)
     return 'ok', {}, {}
 
@@ -652,7 +709,8 @@ def update_edl_command(args, params):
     drop_invalids = args.get('drop_invalids', '').lower() == 'true'
     offset = try_parse_integer(args.get('offset', 0), EDL_OFFSET_ERR_MSG)
     request_args = RequestArguments(query, limit, offset, url_port_stripping, drop_invalids, collapse_ips)
-    indicators = refresh_edl_context(request_args)
+    indicators = refresh_edl_context(request_args, demisto.getIntegrationContext(),
+                                     params.get('full_refresh_interval'))
     hr = tableToMarkdown('EDL was updated successfully with the following values', indicators,
                          ['Indicators']) if print_indicators == 'true' else 'EDL was updated successfully'
     return hr, {}, indicators
@@ -690,5 +748,8 @@ def main():
         return_error(err_msg)
 
 
+from IPCollapseApiModule import *  # noqa: E402
+from RenderedOutputApiModule import *  # noqa: E402
+
 if __name__ in ['__main__', '__builtin__', 'builtins']:
     main()
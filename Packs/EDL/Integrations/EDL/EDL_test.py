@@ -3,6 +3,8 @@ import json
 import pytest
 import demistomock as demisto
 from netaddr import IPAddress
+from CommonServerPython import date_to_timestamp
+from datetime import datetime
 
 IOC_RES_LEN = 38
 
@@ -137,6 +139,128 @@ class TestHelperFunctions:
                 else:
                     assert ip in edl_vals
 
+    @pytest.mark.refresh_edl_context
+    def test_refresh_edl_context_compact_cache(self, mocker):
+        """
+        Given
+        - Indicators which match the query
+
+        When
+        - Refreshing the EDL for the first time
+
+        Then
+        - Ensure a full refresh is done, and only the value and type of each indicator are kept in the context
+        """
+        import EDL as edl
+        with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
+            iocs_json = json.loads(iocs_json_f.read())
+        mocker.patch.object(edl, 'find_indicators_to_limit', return_value=iocs_json)
+        set_context = mocker.patch.object(demisto, 'setIntegrationContext')
+        request_args = edl.RequestArguments(query='type:IP', limit=37, url_port_stripping=True)
+        edl.refresh_edl_context(request_args)
+        integration_context = set_context.call_args[0][0]
+        assert integration_context['current_iocs'] == [[ioc['value'], ioc['indicator_type']] for ioc in iocs_json]
+        assert integration_context['last_full_refresh'] == integration_context['last_run']
+        assert len(integration_context['last_output'][edl.EDL_VALUES_KEY].split('\n')) == 37
+
+    @pytest.mark.refresh_edl_context
+    def test_refresh_edl_context_incremental(self, mocker):
+        """
+        Given
+        - An EDL which was refreshed recently with the same request
+
+        When
+        - Refreshing the EDL again
+
+        Then
+        - Ensure only the indicators modified since the last refresh are fetched and merged into the cached ones
+        """
+        import EDL as edl
+        request_args = edl.RequestArguments(query='type:IP', limit=3)
+        now = date_to_timestamp(datetime.now())
+        integration_context = {
+            'last_run': now - 1000,
+            'last_full_refresh': now - 1000,
+            'last_modified': '2020-06-01T10:00:00Z',
+            'last_query': 'type:IP',
+            'last_limit': 3,
+            'last_offset': 0,
+            'drop_invalids': False,
+            'url_port_stripping': False,
+            'collapse_ips': edl.DONT_COLLAPSE,
+            'current_iocs': [['1.1.1.1', 'IP'], ['2.2.2.2', 'IP']]
+        }
+        find_indicators = mocker.patch.object(edl, 'find_indicators_to_limit', return_value=[
+            {'value': '2.2.2.2', 'indicator_type': 'IP'},
+            {'value': '3.3.3.3', 'indicator_type': 'IP'},
+            {'value': '4.4.4.4', 'indicator_type': 'IP'}
+        ])
+        set_context = mocker.patch.object(demisto, 'setIntegrationContext')
+        assert edl.refresh_edl_context(request_args, integration_context, '1 hour') == '1.1.1.1\n2.2.2.2\n3.3.3.3'
+        assert find_indicators.call_args[0][0] == '(type:IP) and modified:>="2020-06-01T10:00:00Z"'
+        assert set_context.call_args[0][0]['last_full_refresh'] == now - 1000
+
+        # a full refresh is done when the EDL reached its size limit
+        assert len(integration_context['current_iocs']) == 3
+        edl.refresh_edl_context(request_args, integration_context, '1 hour')
+        assert find_indicators.call_args[0][0] == 'type:IP'
+
+        # a full refresh is done when the last one is older than the full refresh interval
+        integration_context['current_iocs'] = [['1.1.1.1', 'IP']]
+        integration_context['last_full_refresh'] = now - 60 * 60 * 1000 - 1000
+        edl.refresh_edl_context(request_args, integration_context, '1 hour')
+        assert find_indicators.call_args[0][0] == 'type:IP'
+
+    @pytest.mark.get_edl_ioc_values
+    def test_get_edl_ioc_values_incremental_refresh(self, mocker):
+        """
+        Given
+        - An EDL which is not updated on demand, with a refresh rate of 5 minutes and a full refresh interval of 1 day
+
+        When
+        - The EDL cache expires twice
+
+        Then
+        - Ensure the first refresh is a full one and the second one fetches only the modified indicators
+        """
+        import EDL as edl
+        request_args = edl.RequestArguments(query='type:IP', limit=10)
+
+        def find_indicators_to_limit(indicator_query, limit, offset=0):
+            if 'modified:>=' in indicator_query:
+                return [{'value': '3.3.3.3', 'indicator_type': 'IP'}]
+            if offset:
+                return []
+            return [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': '2.2.2.2', 'indicator_type': 'IP'}]
+
+        find_indicators = mocker.patch.object(edl, 'find_indicators_to_limit', side_effect=find_indicators_to_limit)
+        set_context = mocker.patch.object(demisto, 'setIntegrationContext')
+
+        def expire_cache():
+            # moves the saved integration context 6 minutes back in time, as if the refresh rate has passed
+            integration_context = dict(set_context.call_args[0][0])
+            integration_context['last_run'] -= 6 * 60 * 1000
+            integration_context['last_full_refresh'] -= 6 * 60 * 1000
+            return integration_context
+
+        assert edl.get_edl_ioc_values(False, request_args, {}, '5 minutes', '1 day') == '1.1.1.1\n2.2.2.2'
+        assert find_indicators.call_args_list[0][0][0] == 'type:IP'
+
+        integration_context = expire_cache()
+        find_indicators.reset_mock()
+        assert edl.get_edl_ioc_values(False, request_args, integration_context, '5 minutes', '1 day') == \
+            '1.1.1.1\n2.2.2.2\n3.3.3.3'
+        assert find_indicators.call_count == 1
+        assert find_indicators.call_args[0][0] == '(type:IP) and modified:>="{}"'.format(
+            integration_context['last_modified'])
+        assert set_context.call_args[0][0]['last_full_refresh'] == integration_context['last_full_refresh']
+
+        # the next expiry is incremental as well
+        integration_context = expire_cache()
+        find_indicators.reset_mock()
+        edl.get_edl_ioc_values(False, request_args, integration_context, '5 minutes', '1 day')
+        assert 'modified:>=' in find_indicators.call_args[0][0]
+
     @pytest.mark.find_indicators_to_limit
     def test_find_indicators_to_limit_1(self, mocker):
         """Test find indicators limit"""
@@ -272,3 +396,33 @@ class TestHelperFunctions:
         assert "1.1.1.3" not in ip_range_list
         assert "2.2.2.2" in ip_range_list
         assert "25.24.23.22" in ip_range_list
+
+
+class TestRoute:
+    def test_route_edl_values(self, mocker):
+        """
+        Given
+        - A running server
+
+        When
+        - Requesting the EDL twice, the second time with the ETag of the EDL
+
+        Then
+        - Ensure the EDL is created once, and 304 is returned for the ETag
+        """
+        import EDL as edl
+        edl.RENDERED_OUTPUTS.clear()
+        mocker.patch.object(demisto, 'params', return_value={'cache_refresh_rate': '5 minutes',
+                                                             'indicators_query': 'type:IP'})
+        mocker.patch.object(demisto, 'getIntegrationContext',
+                            return_value={'last_run': date_to_timestamp(datetime.now())})
+        get_values = mocker.patch.object(edl, 'get_edl_ioc_values', return_value='1.1.1.1\n2.2.2.2')
+        client = edl.APP.test_client()
+
+        response = client.get('/')
+        assert response.status_code == 200
+        assert response.data == b'1.1.1.1\n2.2.2.2'
+
+        response = client.get('/', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+        assert get_values.call_count == 1
@@ -9,6 +9,7 @@ from elasticsearch_dsl import Search
 from elasticsearch_dsl.query import QueryString
 from datetime import datetime
 import json
+import time
 import requests
 import warnings
 from dateutil.parser import parse
@@ -46,6 +47,9 @@ FETCH_TIME = demisto.params().get('fetch_time', '3 days')
 FETCH_SIZE = int(demisto.params().get('fetch_size', 50))
 INSECURE = not demisto.params().get('insecure', False)
 TIME_METHOD = demisto.params().get('time_method', 'Simple-Date')
+FETCH_SEARCH_AFTER = demisto.params().get('fetch_search_after', False)
+FETCH_TIEBREAKER_FIELD = demisto.params().get('fetch_tiebreaker_field', '')
+FETCH_TIME_BUDGET = int(demisto.params().get('fetch_time_budget') or 30)
 
 
 def get_timestamp_first_fetch(last_fetch):
@@ -263,6 +267,9 @@ def fetch_params_check():
     if FETCH_QUERY == '' or FETCH_QUERY is None:
         str_error.append("Query by which to fetch incidents is not configured.")
 
+    if FETCH_SEARCH_AFTER and not FETCH_TIEBREAKER_FIELD:
+        str_error.append("Tiebreaker field for search_after paging is not configured.")
+
     if len(str_error) > 0:
         return_error("Got the following errors in test:\nFetches incidents is enabled.\n" + '\n'.join(str_error))
 
@@ -445,6 +452,24 @@ def incident_label_maker(source):
     return labels
 
 
+def hit_to_incident(hit, occurred):
+    """Creates an incident of a hit.
+
+    Args:
+        hit(dict): a hit of the search results.
+        occurred(str): the time of the hit in the format: YYYY-MM-DDThh:mm:ssZ
+
+    Returns:
+        (dict).The incident.
+    """
+    return {
+        'name': 'Elasticsearch: Index: ' + str(hit.get('_index')) + ", ID: " + str(hit.get('_id')),
+        'rawJSON': json.dumps(hit),
+        'labels': incident_label_maker(hit.get('_source')),
+        'occurred': occurred
+    }
+
+
 def results_to_incidents_timestamp(response, last_fetch):
     """Converts the current results into incidents.
 
@@ -470,13 +495,7 @@ def results_to_incidents_timestamp(response, last_fetch):
 
             # avoid duplication due to weak time query
             if hit_timestamp > current_fetch:
-                inc = {
-                    'name': 'Elasticsearch: Index: ' + str(hit.get('_index')) + ", ID: " + str(hit.get('_id')),
-                    'rawJSON': json.dumps(hit),
-                    'labels': incident_label_maker(hit.get('_source')),
-                    'occurred': hit_date.isoformat() + 'Z'
-                }
-                incidents.append(inc)
+                incidents.append(hit_to_incident(hit, hit_date.isoformat() + 'Z'))
 
     return incidents, last_fetch
 
@@ -508,16 +527,10 @@ def results_to_incidents_datetime(response, last_fetch):
 
             # avoid duplication due to weak time query
             if hit_timestamp > current_fetch:
-                inc = {
-                    'name': 'Elasticsearch: Index: ' + str(hit.get('_index')) + ", ID: " + str(hit.get('_id')),
-                    'rawJSON': json.dumps(hit),
-                    'labels': incident_label_maker(hit.get('_source')),
-                    # parse function returns iso format sometimes as YYYY-MM-DDThh:mm:ss+00:00
-                    # and sometimes as YYYY-MM-DDThh:mm:ss
-                    # we want to return format: YYYY-MM-DDThh:mm:ssZ in our incidents
-                    'occurred': format_to_iso(hit_date.isoformat())
-                }
-                incidents.append(inc)
+                # parse function returns iso format sometimes as YYYY-MM-DDThh:mm:ss+00:00
+                # and sometimes as YYYY-MM-DDThh:mm:ss
+                # we want to return format: YYYY-MM-DDThh:mm:ssZ in our incidents
+                incidents.append(hit_to_incident(hit, format_to_iso(hit_date.isoformat())))
 
     return incidents, format_to_iso(last_fetch.isoformat())
 
@@ -540,6 +553,80 @@ def format_to_iso(date_string):
     return date_string
 
 
+def results_to_incidents_search_after(response):
+    """Converts the current results into incidents, including the hits which share the time of the last fetch,
+    as the hits are paged by their sort values.
+
+    Args:
+        response(dict): the raw search results from Elasticsearch.
+
+    Returns:
+        (list).The incidents.
+        (dict).The last run of the last hit - its time and sort values, or an empty dict if there are no hits.
+    """
+    incidents = []
+    last_run = {}  # type: dict
+
+    for hit in response.get('hits', {}).get('hits'):
+        last_run['search_after'] = hit.get('sort')
+        if hit.get('_source') is not None and hit.get('_source').get(str(TIME_FIELD)) is not None:
+            hit_time = hit.get('_source')[str(TIME_FIELD)]
+            if 'Timestamp' in TIME_METHOD:
+                occurred = timestamp_to_date(str(hit_time)).isoformat() + 'Z'
+                last_run['time'] = int(hit_time)
+
+            else:
+                occurred = format_to_iso(parse(str(hit_time)).isoformat())
+                last_run['time'] = occurred
+
+            incidents.append(hit_to_incident(hit, occurred))
+
+    return incidents, last_run
+
+
+def fetch_incidents_search_after(es, last_run, last_fetch_timestamp):
+    """Fetches the incidents page by page with search_after, sorted by the time field and the tiebreaker field,
+    until there are no more results or the time budget of the fetch is over.
+
+    Args:
+        es(Elasticsearch): the Elasticsearch client.
+        last_run(dict): the last run, holding the sort values of the last fetched hit.
+        last_fetch_timestamp(num): the date or timestamp of the last fetch.
+
+    Returns:
+        (list).The incidents.
+    """
+    if not FETCH_TIEBREAKER_FIELD:
+        return_error("Tiebreaker field for search_after paging is not configured.")
+
+    last_run = dict(last_run)
+    search_after = last_run.get('search_after')
+    # with a cursor, hits which share the time of the last fetched hit are paged by the tiebreaker
+    time_filter = 'gte' if search_after else 'gt'
+    query = QueryString(query=FETCH_QUERY + " AND " + TIME_FIELD + ":*")
+    search = Search(using=es, index=FETCH_INDEX).filter({'range': {TIME_FIELD: {time_filter: last_fetch_timestamp}}})
+    search = search.sort({TIME_FIELD: {'order': 'asc'}}, {FETCH_TIEBREAKER_FIELD: {'order': 'asc'}})
+    search = search[0:FETCH_SIZE].query(query)
+
+    incidents = []  # type: List
+    end_time = time.time() + FETCH_TIME_BUDGET
+    while True:
+        page_search = search.extra(search_after=search_after) if search_after else search
+        response = page_search.execute().to_dict()
+        page_incidents, page_last_run = results_to_incidents_search_after(response)
+        incidents.extend(page_incidents)
+        if page_last_run:
+            last_run = dict(last_run, **page_last_run)
+            search_after = last_run.get('search_after')
+
+        if len(response.get('hits', {}).get('hits')) < FETCH_SIZE or time.time() >= end_time:
+            break
+
+    demisto.setLastRun(last_run)
+    demisto.info('extract {} incidents'.format(len(incidents)))
+    return incidents
+
+
 def fetch_incidents():
     last_run = demisto.getLastRun()
     last_fetch = last_run.get('time')
@@ -566,6 +653,10 @@ def fetch_incidents():
 
     es = elasticsearch_builder()
 
+    if FETCH_SEARCH_AFTER:
+        demisto.incidents(fetch_incidents_search_after(es, last_run, last_fetch_timestamp))
+        return
+
     query = QueryString(query=FETCH_QUERY + " AND " + TIME_FIELD + ":*")
     # Elastic search can use epoch timestamps (in milliseconds) as date representation regardless of date format.
     search = Search(using=es, index=FETCH_INDEX).filter({'range': {TIME_FIELD: {'gt': last_fetch_timestamp}}})
@@ -442,3 +442,114 @@ def test_elasticsearch_builder_called_with_no_creds(mocker):
     elasticsearch_builder()
     assert es_mock.call_args[1].get('http_auth') is None
     assert es_mock.call_args[1].get('api_key') is None
+
+
+def search_after_page(hits_times, first_id):
+    hits = [{'_index': 'customer', '_id': str(first_id + i), '_source': {'Date': hit_time},
+             'sort': [int(parse(hit_time).timestamp() * 1000), str(first_id + i)]}
+            for i, hit_time in enumerate(hits_times)]
+    return {'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': hits}}
+
+
+@patch("Elasticsearch_v2.TIME_METHOD", 'Simple-Date')
+@patch("Elasticsearch_v2.TIME_FIELD", 'Date')
+@patch("Elasticsearch_v2.FETCH_INDEX", "customer")
+@patch("Elasticsearch_v2.FETCH_QUERY", "*")
+@patch("Elasticsearch_v2.FETCH_SIZE", 2)
+@patch("Elasticsearch_v2.FETCH_TIEBREAKER_FIELD", "event_id")
+def test_fetch_incidents_search_after(mocker):
+    """
+    Given:
+        - A last run with the sort values of the last fetched hit.
+        - Pages of hits which share their times at the page boundaries.
+    When:
+        - Fetching incidents with search_after.
+    Then:
+        - All of the pages are fetched in one fetch, each one after the sort values of the previous page.
+        - No hit which shares the time of the previous page is lost.
+        - The last run holds the time and the sort values of the last hit.
+    """
+    from elasticsearch_dsl import Search
+    import Elasticsearch_v2
+    from Elasticsearch_v2 import fetch_incidents_search_after
+    pages = [search_after_page(['2019-08-27T18:00:00Z', '2019-08-27T18:01:00Z'], 1),
+             search_after_page(['2019-08-27T18:01:00Z', '2019-08-27T18:01:00Z'], 3),
+             search_after_page(['2019-08-27T18:02:00Z'], 5)]
+    searches = []
+
+    def execute(search):
+        searches.append(search.to_dict())
+        response = mocker.Mock()
+        response.to_dict.return_value = pages[len(searches) - 1]
+        return response
+
+    mocker.patch.object(Search, 'execute', autospec=True, side_effect=execute)
+    set_last_run_mock = mocker.patch.object(Elasticsearch_v2.demisto, 'setLastRun')
+    mocker.patch.object(Elasticsearch_v2.demisto, 'info')
+    last_run = {'time': '2019-08-27T18:00:00Z', 'search_after': [1566928800000, '0']}
+
+    incidents = fetch_incidents_search_after(None, last_run, 1566928800000)
+
+    assert [incident['name'] for incident in incidents] == ['Elasticsearch: Index: customer, ID: {}'.format(i)
+                                                            for i in range(1, 6)]
+    assert searches[0]['search_after'] == [1566928800000, '0']
+    assert searches[1]['search_after'] == [1566928860000, '2']
+    assert searches[2]['search_after'] == [1566928860000, '4']
+    assert searches[0]['sort'] == [{'Date': {'order': 'asc'}}, {'event_id': {'order': 'asc'}}]
+    assert searches[0]['query']['bool']['filter'] == [{'range': {'Date': {'gte': 1566928800000}}}]
+    set_last_run_mock.assert_called_once_with({'time': '2019-08-27T18:02:00Z', 'search_after': [1566928920000, '5']})
+
+
+@patch("Elasticsearch_v2.TIME_METHOD", 'Timestamp-Milliseconds')
+@patch("Elasticsearch_v2.TIME_FIELD", 'Date')
+@patch("Elasticsearch_v2.FETCH_INDEX", "customer")
+@patch("Elasticsearch_v2.FETCH_QUERY", "*")
+@patch("Elasticsearch_v2.FETCH_SIZE", 1)
+@patch("Elasticsearch_v2.FETCH_TIME_BUDGET", 0)
+@patch("Elasticsearch_v2.FETCH_TIEBREAKER_FIELD", "event_id")
+def test_fetch_incidents_search_after_time_budget(mocker):
+    """
+    Given:
+        - A first fetch, with more hits than the page size.
+    When:
+        - Fetching incidents with search_after, when the time budget is over.
+    Then:
+        - Only the first page is fetched, and the last run holds its sort values for the next fetch.
+    """
+    from elasticsearch_dsl import Search
+    import Elasticsearch_v2
+    from Elasticsearch_v2 import fetch_incidents_search_after
+    response = mocker.Mock()
+    response.to_dict.return_value = {'hits': {'hits': [{'_index': 'customer', '_id': '1',
+                                                        '_source': {'Date': 1572502640000},
+                                                        'sort': [1572502640000, '1']}]}}
+    execute_mock = mocker.patch.object(Search, 'execute', return_value=response)
+    set_last_run_mock = mocker.patch.object(Elasticsearch_v2.demisto, 'setLastRun')
+    mocker.patch.object(Elasticsearch_v2.demisto, 'info')
+
+    incidents = fetch_incidents_search_after(None, {}, 1572502600000)
+
+    assert len(incidents) == 1
+    assert incidents[0]['occurred'] == '2019-10-31T06:17:20Z'
+    assert execute_mock.call_count == 1
+    set_last_run_mock.assert_called_once_with({'time': 1572502640000, 'search_after': [1572502640000, '1']})
+
+
+@patch("Elasticsearch_v2.TIME_FIELD", 'Date')
+@patch("Elasticsearch_v2.FETCH_INDEX", "customer")
+@patch("Elasticsearch_v2.FETCH_QUERY", "*")
+@patch("Elasticsearch_v2.FETCH_SEARCH_AFTER", True)
+@patch("Elasticsearch_v2.FETCH_TIEBREAKER_FIELD", "")
+def test_fetch_params_check_search_after_without_tiebreaker(mocker):
+    """
+    Given:
+        - Fetching with search_after, without a tiebreaker field.
+    When:
+        - Checking the fetch parameters.
+    Then:
+        - An error is returned, as there is no default tiebreaker field which can be sorted by in every version.
+    """
+    import Elasticsearch_v2
+    return_error_mock = mocker.patch.object(Elasticsearch_v2, 'return_error')
+    Elasticsearch_v2.fetch_params_check()
+    assert 'Tiebreaker field for search_after paging is not configured.' in return_error_mock.call_args[0][0]
@@ -10,7 +10,7 @@ from multiprocessing import Process
 from gevent.pywsgi import WSGIServer
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
-from netaddr import IPAddress, iprange_to_cidrs
+from netaddr import IPAddress
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from typing import Callable, List, Any, cast, Dict, Tuple
 
@@ -281,73 +281,6 @@ def find_indicators_with_limit_loop(indicator_query: str, limit: int, total_fetc
     return iocs, next_page
 
 
-def ip_groups_to_cidrs(ip_range_groups: list):
-    """Collapse ip groups list to CIDRs
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of CIDRs.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        moved_ip = False
-        # CIDR must begin with an even LSB
-        # if the first ip does not - separate it from the rest of the range
-        if (int(str(min_ip).split('.')[-1]) % 2) != 0:
-            ip_ranges.append(str(min_ip))
-            min_ip = group[1]
-            moved_ip = True
-
-        # CIDR must end with uneven LSB
-        # if the last ip does not - separate it from the rest of the range
-        if (int(str(max_ip).split('.')[-1]) % 2) == 0:
-            ip_ranges.append(str(max_ip))
-            max_ip = group[-2]
-            moved_ip = True
-
-        # if both min and max ips were shifted and there are only 2 ips in the range
-        # we added both ips by the shift and now we move to the next  range
-        if moved_ip and len(group) == 2:
-            continue
-
-        else:
-            ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
-
-    return ip_ranges
-
-
-def ip_groups_to_ranges(ip_range_groups: list):
-    """Collapse ip groups list to ranges
-
-    Args:
-        ip_range_groups (list): a list of lists containing connected IPs
-
-    Returns:
-        list. a list of Ranges.
-    """
-    ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        ip_ranges.append(str(min_ip) + "-" + str(max_ip))
-
-    return ip_ranges
-
-
 def ips_to_ranges(ips: list, collapse_ips):
     """Collapse IPs to Ranges or CIDRs.
 
@@ -358,36 +291,11 @@ def ips_to_ranges(ips: list, collapse_ips):
     Returns:
         list. a list to Ranges or CIDRs.
     """
-    ips_range_groups = []  # type:List
-    ips = sorted(ips)
-    if len(ips) > 0:
-        ips_range_groups.append([ips[0]])
-
-    if len(ips) > 1:
-        for ip in ips[1:]:
-            appended = False
-
-            if len(ips_range_groups) == 0:
-                ips_range_groups.append([ip])
-                continue
-
-            for group in ips_range_groups:
-                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
-                    group.append(ip)
-                    sorted(group)
-                    appended = True
-
-            if not appended:
-                ips_range_groups.append([ip])
-
-    for group in ips_range_groups:
-        sorted(group)
-
     if collapse_ips == COLLAPSE_TO_RANGES:
-        return ip_groups_to_ranges(ips_range_groups)
+        return collapse_ips_to_ranges(ips)
 
     else:
-        return ip_groups_to_cidrs(ips_range_groups)
+        return collapse_ips_to_cidrs(ips)
 
 
 def panos_url_formatting(iocs: list, drop_invalids: bool, strip_port: bool):
@@ -776,14 +684,21 @@ def route_list_values() -> Response:
 
         request_args = get_request_args(params)
 
+        # in on-demand mode the list may be updated by a command, so the integration context is always checked
+        integration_context = demisto.getIntegrationContext() if params.get('on_demand') else None
+        rendered_output = get_cached_output(request_args, params, integration_context)
+        if rendered_output:
+            return create_output_response(rendered_output)
+
         values = get_outbound_ioc_values(
             on_demand=params.get('on_demand'),
-            last_update_data=demisto.getIntegrationContext(),
+            last_update_data=integration_context or demisto.getIntegrationContext(),
             cache_refresh_rate=params.get('cache_refresh_rate'),
             request_args=request_args
         )
 
-        if not demisto.getIntegrationContext() and params.get('on_demand'):
+        integration_context = demisto.getIntegrationContext()
+        if not integration_context and params.get('on_demand'):
             values = 'You are running in On-Demand mode - please run !eis-update command to initialize the ' \
                      'export process'
 
@@ -791,7 +706,9 @@ def route_list_values() -> Response:
             values = "No Results Found For the Query"
 
         mimetype = get_outbound_mimetype()
-        return Response(values, status=200, mimetype=mimetype)
+        rendered_output = render_output(values, integration_context.get('last_run'), mimetype)
+        cache_output(request_args, rendered_output)
+        return create_output_response(rendered_output)
 
     except Exception:
         return Response(traceback.format_exc(), status=400, mimetype='text/plain')
@@ -961,5 +878,8 @@ def main():
         return_error(err_msg)
 
 
+from IPCollapseApiModule import *  # noqa: E402
+from RenderedOutputApiModule import *  # noqa: E402
+
 if __name__ in ['__main__', '__builtin__', 'builtins']:
     main()
@@ -572,3 +572,42 @@ class TestHelperFunctions:
         mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
         mimtype = get_outbound_mimetype()
         assert mimtype == 'text/plain'
+
+
+class TestRoute:
+    @staticmethod
+    def mock_server(mocker, values):
+        import ExportIndicators as ei
+        from CommonServerPython import date_to_timestamp
+        from datetime import datetime
+        ei.RENDERED_OUTPUTS.clear()
+        mocker.patch.object(demisto, 'params', return_value={'cache_refresh_rate': '5 minutes', 'format': 'text',
+                                                             'indicators_query': 'type:IP'})
+        mocker.patch.object(demisto, 'getIntegrationContext', return_value={
+            'last_run': date_to_timestamp(datetime.now()),
+            'last_output': {ei.CTX_MIMETYPE_KEY: ei.MIMETYPE_TEXT}
+        })
+        get_values = mocker.patch.object(ei, 'get_outbound_ioc_values', return_value=values)
+        return ei.APP.test_client(), get_values
+
+    def test_route_list_values_rendered_once(self, mocker):
+        """
+        Given
+        - A running server
+
+        When
+        - Requesting the list several times, once with the ETag of the list
+
+        Then
+        - Ensure the list is created once, and the request with the ETag gets 304 with no body
+        """
+        client, get_values = self.mock_server(mocker, '1.1.1.1\n2.2.2.2')
+        response = client.get('/')
+        assert response.status_code == 200
+        assert response.data == b'1.1.1.1\n2.2.2.2'
+        etag = response.headers['ETag']
+
+        response = client.get('/', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert get_values.call_count == 1
@@ -8,6 +8,8 @@ from elasticsearch_dsl import Search
 from elasticsearch_dsl.query import QueryString
 import requests
 import warnings
+import threading
+import queue
 
 # Disable insecure warnings
 requests.packages.urllib3.disable_warnings()
@@ -26,6 +28,9 @@ HTTP_ERRORS = {
 
 '''VARIABLES FOR FETCH INDICATORS'''
 FETCH_SIZE = 50
+INDICATORS_BATCH_SIZE = 2000
+# the maximal number of scanned hits which wait to be converted to indicators
+HITS_QUEUE_SIZE = 5000
 API_KEY_PREFIX = '_api_key_id:'
 MODULE_TO_FEEDMAP_KEY = 'moduleToFeedMap'
 FEED_TYPE_GENERIC = 'Generic Feed'
@@ -35,7 +40,7 @@ FEED_TYPE_CORTEX_MT = 'Cortex XSOAR MT Shared Feed'
 
 class ElasticsearchClient:
     def __init__(self, insecure=None, server=None, username=None, password=None, api_key=None, api_id=None,
-                 time_field=None, time_method=None, fetch_index=None, fetch_time=None, query=None):
+                 time_field=None, time_method=None, fetch_index=None, fetch_time=None, query=None, scroll_slices=1):
         self._insecure = insecure
         self._proxy = handle_proxy()
         # _elasticsearch_builder expects _proxy to be None if empty
@@ -50,6 +55,7 @@ class ElasticsearchClient:
         self.fetch_index = fetch_index
         self.fetch_time = fetch_time
         self.query = query
+        self.scroll_slices = scroll_slices
         self.es = self._elasticsearch_builder()
 
     def _elasticsearch_builder(self):
@@ -181,25 +187,85 @@ def fetch_indicators_command(client, feed_type, src_val, src_type, default_type,
     if FEED_TYPE_GENERIC not in feed_type:
         # Insight is the name of the indicator object as it's saved into the database
         search = get_scan_insight_format(client, now, last_fetch_timestamp)
-        for hit in search.scan():
+    else:
+        search = get_scan_generic_format(client, now, last_fetch_timestamp)
+
+    # the indicators are created in batches while the hits are scanned, so they are not all kept in memory
+    for hit in scan_sliced(search, client.scroll_slices):
+        if FEED_TYPE_GENERIC not in feed_type:
             hit_lst, hit_enrch_lst = extract_indicators_from_insight_hit(hit)
             ioc_lst.extend(hit_lst)
             ioc_enrch_lst.extend(hit_enrch_lst)
-    else:
-        search = get_scan_generic_format(client, now, last_fetch_timestamp)
-        for hit in search.scan():
+        else:
             ioc_lst.extend(extract_indicators_from_generic_hit(hit, src_val, src_type, default_type))
+        if len(ioc_lst) >= INDICATORS_BATCH_SIZE:
+            create_indicators(ioc_lst, ioc_enrch_lst)
+            ioc_lst, ioc_enrch_lst = [], []
 
+    create_indicators(ioc_lst, ioc_enrch_lst)
+    demisto.setLastRun({'time': now.timestamp() * 1000})
+
+
+def create_indicators(ioc_lst, ioc_enrch_lst):
+    """Creates a batch of indicators, and then their enrichments"""
     if ioc_lst:
-        for b in batch(ioc_lst, batch_size=2000):
+        for b in batch(ioc_lst, batch_size=INDICATORS_BATCH_SIZE):
             demisto.createIndicators(b)
     if ioc_enrch_lst:
         ioc_enrch_batches = create_enrichment_batches(ioc_enrch_lst)
         for enrch_batch in ioc_enrch_batches:
             # ensure batch sizes don't exceed 2000
-            for b in batch(enrch_batch, batch_size=2000):
+            for b in batch(enrch_batch, batch_size=INDICATORS_BATCH_SIZE):
                 demisto.createIndicators(b)
-    demisto.setLastRun({'time': now.timestamp() * 1000})
+
+
+def scan_sliced(search, slices):
+    """
+    Scans the hits of a search. When there is more than one slice, the search is split with a sliced scroll which
+    is scanned by a thread per slice, and the hits are yielded as they arrive
+    """
+    if slices <= 1:
+        yield from search.scan()
+        return
+
+    hits_queue: queue.Queue = queue.Queue(maxsize=HITS_QUEUE_SIZE)
+    stop_event = threading.Event()
+    slice_done = object()
+
+    def put(item):
+        # stop waiting for the queue once the hits are no longer consumed
+        while not stop_event.is_set():
+            try:
+                hits_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_slice(slice_id):
+        try:
+            for hit in search.extra(slice={'id': slice_id, 'max': slices}).scan():
+                if not put(hit):
+                    return
+        except Exception as e:
+            put(e)
+        put(slice_done)
+
+    threads = [threading.Thread(target=scan_slice, args=(slice_id,), daemon=True) for slice_id in range(slices)]
+    for thread in threads:
+        thread.start()
+    try:
+        done_slices = 0
+        while done_slices < slices:
+            item = hits_queue.get()
+            if item is slice_done:
+                done_slices += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop_event.set()
 
 
 def get_last_fetch_timestamp(last_fetch, time_method, fetch_time):
@@ -329,9 +395,10 @@ def main():
         fetch_index = params.get('fetch_index')
         fetch_time = params.get('fetch_time', '3 days')
         query = params.get('es_query')
+        scroll_slices = int(params.get('scroll_slices') or 1)
         api_id, api_key = extract_api_from_username_password(username, password)
         client = ElasticsearchClient(insecure, server, username, password, api_key, api_id, time_field, time_method,
-                                     fetch_index, fetch_time, query)
+                                     fetch_index, fetch_time, query, scroll_slices)
         src_val = params.get('src_val')
         src_type = params.get('src_type')
         default_type = params.get('default_type')
@@ -263,3 +263,58 @@ def test_extract_api_from_username_password_username_api_key():
     import FeedElasticsearch as esf
     username = esf.API_KEY_PREFIX + 'api_id'
     assert esf.extract_api_from_username_password(username, 'api_key') == ('api_id', 'api_key')
+
+
+class MockSearch:
+    def __init__(self, hits_by_slice, slice_params=None):
+        self._hits_by_slice = hits_by_slice
+        self.slice_params = slice_params
+
+    def extra(self, slice):
+        return MockSearch(self._hits_by_slice, slice)
+
+    def scan(self):
+        if self.slice_params is None:
+            return iter([hit for hits in self._hits_by_slice for hit in hits])
+        hits = self._hits_by_slice[self.slice_params['id']]
+        if isinstance(hits, Exception):
+            raise hits
+        return iter(hits)
+
+
+def test_scan_sliced():
+    import FeedElasticsearch as esf
+    hits_by_slice = [[MockHit({'name': str(i)}) for i in range(slice_id, 3000, 3)] for slice_id in range(3)]
+    hits = list(esf.scan_sliced(MockSearch(hits_by_slice), 3))
+    assert sorted(int(hit.to_dict()['name']) for hit in hits) == list(range(3000))
+    assert len(list(esf.scan_sliced(MockSearch(hits_by_slice), 1))) == 3000
+
+
+def test_scan_sliced_slice_error():
+    import pytest
+    import FeedElasticsearch as esf
+    hits_by_slice = [[MockHit({'name': '1'})], ValueError('scroll expired')]
+    with pytest.raises(ValueError, match='scroll expired'):
+        list(esf.scan_sliced(MockSearch(hits_by_slice), 2))
+
+
+def test_fetch_indicators_command_batches(mocker):
+    """
+    Given:
+        - A generic feed with 4500 hits in 2 slices.
+    When:
+        - Fetching indicators.
+    Then:
+        - The indicators are created in batches of up to 2000 indicators, while the hits are scanned.
+    """
+    import FeedElasticsearch as esf
+    hits_by_slice = [[MockHit({CUSTOM_VAL_KEY: f'{slice_id}.{i}', CUSTOM_TYPE_KEY: 'IP'}) for i in range(2250)]
+                     for slice_id in range(2)]
+    mocker.patch.object(esf, 'get_scan_generic_format', return_value=MockSearch(hits_by_slice))
+    create_indicators_mock = mocker.patch.object(esf.demisto, 'createIndicators')
+    mocker.patch.object(esf.demisto, 'setLastRun')
+    client = mocker.Mock(time_method='Simple-Date', fetch_time='3 days', scroll_slices=2)
+    esf.fetch_indicators_command(client, esf.FEED_TYPE_GENERIC, CUSTOM_VAL_KEY, CUSTOM_TYPE_KEY, None, 1000)
+    batches = [call[0][0] for call in create_indicators_mock.call_args_list]
+    assert [len(b) for b in batches] == [2000, 2000, 500]
+    assert len({ioc['value'] for b in batches for ioc in b}) == 4500
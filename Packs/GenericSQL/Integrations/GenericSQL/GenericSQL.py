@@ -2,7 +2,11 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Any, Tuple, Dict, List, Callable
+from typing import Any, Tuple, Dict, List, Callable, Optional
+import re
+import sys
+import types
+import hashlib
 import sqlalchemy
 import pymysql
 import traceback
@@ -11,6 +15,24 @@ from sqlalchemy.sql import text
 # In order to use and convert from pymysql to MySQL this line is necessary
 pymysql.install_as_MySQLdb()
 
+FETCH_BATCH_SIZE = 1000
+SELECT_QUERY_REGEX = re.compile(r'^\s*(select|with)\b', re.IGNORECASE)
+# every command is executed with new globals, so the pooled engines are kept in a module which outlives the command
+ENGINES_MODULE_NAME = 'GenericSQL_engines'
+
+
+def get_engines() -> Dict[str, sqlalchemy.engine.base.Engine]:
+    """
+    Getting the pooled engines of the process, keyed by the connection url and arguments
+    :return: the engines which are reused by the commands which run in the same process
+    """
+    engines_module = sys.modules.get(ENGINES_MODULE_NAME)
+    if engines_module is None:
+        engines_module = types.ModuleType(ENGINES_MODULE_NAME)
+        engines_module.engines = {}  # type: ignore
+        sys.modules[ENGINES_MODULE_NAME] = engines_module
+    return engines_module.engines  # type: ignore
+
 
 class Client:
     """
@@ -19,7 +41,7 @@ class Client:
     """
 
     def __init__(self, dialect: str, host: str, username: str, password: str, port: str,
-                 database: str, connect_parameters: str, ssl_connect: bool):
+                 database: str, connect_parameters: str, ssl_connect: bool, use_pool: bool = False):
         self.dialect = dialect
         self.host = host
         self.username = username
@@ -28,6 +50,7 @@ class Client:
         self.dbname = database
         self.connect_parameters = connect_parameters
         self.ssl_connect = ssl_connect
+        self.use_pool = use_pool
         self.connection = self._create_engine_and_connect()
 
     @staticmethod
@@ -69,21 +92,53 @@ class Client:
             if self.ssl_connect:
                 ssl_connection = {'ssl': {'ssl-mode': 'preferred'}}
 
-            return sqlalchemy.create_engine(db_preferences, connect_args=ssl_connection).connect()
+            return self._get_engine(db_preferences, ssl_connection).connect()
         except Exception as err:
             raise Exception(err)
 
-    def sql_query_execute_request(self, sql_query: str, bind_vars: Any) -> Tuple[Dict, List]:
+    def _get_engine(self, db_preferences: str, ssl_connection: dict) -> sqlalchemy.engine.base.Engine:
+        """
+        Getting the engine of the connection. When a pool is used the engine is created once and reused,
+        otherwise every connection is closed when the command ends
+        :param db_preferences: the connection url
+        :param ssl_connection: the connection arguments
+        :return: an engine which streams the query results
+        """
+        # server side cursors are used where the dialect supports them, so rows are fetched in batches
+        engine_options: Dict[str, Any] = {'connect_args': ssl_connection,
+                                          'execution_options': {'stream_results': True}}
+        if not self.use_pool:
+            return sqlalchemy.create_engine(db_preferences, poolclass=sqlalchemy.pool.NullPool, **engine_options)
+
+        engines = get_engines()
+        engine_key = f'{db_preferences}{ssl_connection}'
+        if engine_key not in engines:
+            engines[engine_key] = sqlalchemy.create_engine(db_preferences, pool_pre_ping=True, **engine_options)
+        return engines[engine_key]
+
+    def sql_query_execute_request(self, sql_query: str, bind_vars: Any, limit: Optional[int] = None,
+                                  skip: int = 0) -> Tuple[List, List]:
         """Execute query in DB via engine
         :param bind_vars: in case there are names and values - a bind_var dict, in case there are only values - list
         :param sql_query: the SQL query
+        :param limit: the maximum number of rows to fetch, all of the rows are fetched if None
+        :param skip: the number of rows to skip before fetching
         :return: results of query, table headers
         """
         if type(bind_vars) is dict:
             sql_query = text(sql_query)
 
         result = self.connection.execute(sql_query, bind_vars)
-        results = result.fetchall()
+        results: List = []
+        # the rows are fetched in batches, and only until the limit is reached
+        while limit is None or len(results) < limit + skip:
+            batch_size = FETCH_BATCH_SIZE if limit is None else min(FETCH_BATCH_SIZE, limit + skip - len(results))
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            results.extend(rows)
+        result.close()
+        results = results[skip:]
         headers = []
         if results:
             # if the table isn't empty
@@ -110,6 +165,52 @@ def generate_default_port_by_dialect(dialect: str) -> str:
         return "3306"
 
 
+def generate_paginated_query(dialect: str, sql_query: str, limit: int, skip: int) -> Optional[str]:
+    """
+    Wrapping a select query so the limit and skip are applied by the database. Statements which are not a single
+    select query are not wrapped, and neither are queries of the dialects in which a derived table has to be
+    ordered or have all of its columns named (Microsoft SQL Server)
+    :param dialect: sql db type
+    :param sql_query: the SQL query
+    :param limit: the maximum number of rows to return
+    :param skip: the number of rows to skip
+    :return: the paginated query, or None if the query can't be paginated by the database
+    """
+    sql_query = sql_query.strip().rstrip(';')
+    if not SELECT_QUERY_REGEX.match(sql_query) or ';' in sql_query:
+        return None
+    # the query is closed in a new line, so a trailing comment in the query doesn't comment the closing parenthesis
+    if dialect in ('MySQL', 'PostgreSQL'):
+        return f'SELECT * FROM ({sql_query}\n) AS paginated_query LIMIT {limit} OFFSET {skip}'
+    elif dialect == 'Oracle':
+        return f'SELECT * FROM ({sql_query}\n) paginated_query OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY'
+    return None
+
+
+def generate_fetch_query(dialect: str, fetch_query: str, column: str, has_last_value: bool, limit: int,
+                         include_last_value: bool = False) -> str:
+    """
+    Wrapping the fetch query so only the rows after the last fetched value of the column are selected,
+    ordered by the column
+    :param dialect: sql db type
+    :param fetch_query: the SQL query of the incidents
+    :param column: a monotonically increasing column of the query
+    :param has_last_value: whether to select only the rows after the last fetched value
+    :param limit: the maximum number of rows to fetch
+    :param include_last_value: whether to select the rows of the last fetched value as well
+    :return: the SQL query which selects the next incidents, with a last_value bind variable
+    """
+    fetch_query = fetch_query.strip().rstrip(';')
+    operator = '>=' if include_last_value else '>'
+    condition = f' WHERE {column} {operator} :last_value' if has_last_value else ''
+    # the query is closed in a new line, so a trailing comment in the query doesn't comment the closing parenthesis
+    if dialect == 'Microsoft SQL Server':
+        return f'SELECT TOP {limit} * FROM ({fetch_query}\n) AS fetch_query{condition} ORDER BY {column}'
+    elif dialect == 'Oracle':
+        return f'SELECT * FROM ({fetch_query}\n) fetch_query{condition} ORDER BY {column} FETCH FIRST {limit} ROWS ONLY'
+    return f'SELECT * FROM ({fetch_query}\n) AS fetch_query{condition} ORDER BY {column} LIMIT {limit}'
+
+
 def generate_bind_vars(bind_variables_names: str, bind_variables_values: str) -> Any:
     """
     The bind variables can be given in 2 legal ways: as 2 lists - names and values, or only values
@@ -138,6 +239,28 @@ def test_module(client: Client, *_) -> Tuple[str, Dict[Any, Any], List[Any]]:
     return 'ok', {}, []
 
 
+def execute_paginated_query(client: Client, sql_query: str, bind_variables: Any, limit: int,
+                            skip: int) -> Tuple[List, List]:
+    """
+    Executes the query with the limit and skip applied by the database. Queries which can't be wrapped as a derived
+    table (e.g. a join which selects two columns of the same name in MySQL) are executed as is, and only the rows up
+    to the limit are fetched
+    :param client: the client object with the db connection
+    :param sql_query: the SQL query
+    :param bind_variables: the bind variables of the query
+    :param limit: the maximum number of rows to return
+    :param skip: the number of rows to skip
+    :return: results of query, table headers
+    """
+    paginated_query = generate_paginated_query(client.dialect, sql_query, limit, skip)
+    if paginated_query:
+        try:
+            return client.sql_query_execute_request(paginated_query, bind_variables, limit=limit)
+        except Exception as err:
+            demisto.debug(f'Failed to paginate the query by the database, executing it as is: {err}')
+    return client.sql_query_execute_request(sql_query, bind_variables, limit=limit, skip=skip)
+
+
 def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
     """
     Executes the sql query with the connection that was configured in the client
@@ -153,12 +276,11 @@ def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, An
         bind_variables_values = args.get('bind_variables_values', "")
         bind_variables = generate_bind_vars(bind_variables_names, bind_variables_values)
 
-        result, headers = client.sql_query_execute_request(sql_query, bind_variables)
+        result, headers = execute_paginated_query(client, sql_query, bind_variables, limit, skip)
         # converting an sqlalchemy object to a table
         converted_table = [dict(row) for row in result]
         # converting b'' and datetime objects to readable ones
         table = [{str(key): str(value) for key, value in dictionary.items()} for dictionary in converted_table]
-        table = table[skip:skip + limit]
         human_readable = tableToMarkdown(name="Query result:", t=table, headers=headers,
                                          removeNull=True)
         context = {
@@ -178,6 +300,76 @@ def sql_query_execute(client: Client, args: dict, *_) -> Tuple[str, Dict[str, An
         raise err
 
 
+def get_row_id(raw_row: Dict[str, str]) -> str:
+    """
+    Identifying a fetched row, so the rows of the last fetched value aren't fetched again
+    :param raw_row: the row with its values converted to strings
+    :return: a hash of the row
+    """
+    return hashlib.md5(json.dumps(raw_row, sort_keys=True).encode('utf-8')).hexdigest()  # nosec
+
+
+def fetch_incidents(client: Client, params: dict) -> List[Dict[str, Any]]:
+    """
+    Fetches the rows of the fetch query which were added since the last fetch as incidents. The rows are tracked by
+    a monotonically increasing column, so only the new rows are selected by the database. The column doesn't have to
+    be unique (e.g. a timestamp), so the rows of the last fetched value are selected again and the ones which were
+    already fetched are dropped
+    :param client: the client object with the db connection
+    :param params: demisto.params() including the fetch query and column
+    :return: the incidents
+    """
+    fetch_query = params.get('fetch_query', '')
+    column = params.get('fetch_column', '')
+    if not fetch_query or not column:
+        raise ValueError('Fetch query and column to track must be provided in order to fetch incidents.')
+    max_fetch = int(params.get('max_fetch') or 50)
+    incident_name_column = params.get('incident_name_column')
+
+    last_run = demisto.getLastRun()
+    last_value = last_run.get('last_value', params.get('first_fetch_value'))
+    # the ids of the fetched rows of the last value, there are none for the first fetch value
+    last_ids = last_run.get('last_ids')
+    has_last_value = last_value not in (None, '')
+    include_last_value = has_last_value and last_ids is not None
+    last_ids = last_ids or []
+    bind_vars = {'last_value': last_value} if has_last_value else {}
+    limit = max_fetch + len(last_ids)
+    sql_query = generate_fetch_query(client.dialect, fetch_query, column, has_last_value, limit, include_last_value)
+    result, _ = client.sql_query_execute_request(sql_query, bind_vars, limit=limit)
+
+    incidents: List[Dict[str, Any]] = []
+    fetched_ids = set(last_ids)
+    for row in result:
+        if len(incidents) >= max_fetch:
+            break
+        row = dict(row)
+        # some dialects return the column names in a different case than the query
+        column_value = next((value for key, value in row.items() if str(key).lower() == column.lower()), last_value)
+        if not isinstance(column_value, (int, float)):
+            column_value = str(column_value)
+        # converting b'' and datetime objects to readable ones
+        raw_row = {str(key): str(value) for key, value in row.items()}
+        row_id = get_row_id(raw_row)
+        if column_value != last_value:
+            last_value = column_value
+            last_ids = []
+            fetched_ids = set()
+        elif row_id in fetched_ids:
+            continue
+        last_ids.append(row_id)
+        fetched_ids.add(row_id)
+        name = raw_row.get(incident_name_column) if incident_name_column else None
+        incidents.append({
+            'name': name or f'Generic SQL {column}: {last_value}',
+            'rawJSON': json.dumps(raw_row)
+        })
+
+    if incidents:
+        demisto.setLastRun({'last_value': last_value, 'last_ids': last_ids})
+    return incidents
+
+
 def main():
     params = demisto.params()
     dialect = params.get('dialect')
@@ -190,17 +382,21 @@ def main():
     database = params.get('dbname')
     ssl_connect = params.get('ssl_connect')
     connect_parameters = params.get('connect_parameters')
+    use_pool = params.get('use_pool', False)
     try:
         command = demisto.command()
         LOG(f'Command being called in SQL is: {command}')
         client = Client(dialect=dialect, host=host, username=user, password=password,
-                        port=port, database=database, connect_parameters=connect_parameters, ssl_connect=ssl_connect)
+                        port=port, database=database, connect_parameters=connect_parameters, ssl_connect=ssl_connect,
+                        use_pool=use_pool)
         commands: Dict[str, Callable[[Client, Dict[str, str], str], Tuple[str, Dict[Any, Any], List[Any]]]] = {
             'test-module': test_module,
             'query': sql_query_execute,
             'sql-command': sql_query_execute
         }
-        if command in commands:
+        if command == 'fetch-incidents':
+            demisto.incidents(fetch_incidents(client, params))
+        elif command in commands:
             return_outputs(*commands[command](client, demisto.args(), command))
         else:
             raise NotImplementedError(f'{command} is not an existing Generic SQL command')
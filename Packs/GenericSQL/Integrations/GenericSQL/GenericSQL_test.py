@@ -1,4 +1,7 @@
-from GenericSQL import Client, sql_query_execute
+import demistomock as demisto
+import GenericSQL
+from GenericSQL import Client, sql_query_execute, generate_paginated_query, generate_fetch_query, fetch_incidents, \
+    get_row_id
 import pytest
 
 
@@ -9,6 +12,32 @@ class ConnectionMock:
     def fetchall(self):
         return []
 
+    def fetchmany(self, size):
+        return []
+
+    def close(self):
+        pass
+
+
+class RowMock(dict):
+    """
+    A row of the query result which has keys, like sqlalchemy RowProxy
+    """
+
+
+class ResultMock:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched_sizes = []
+
+    def fetchmany(self, size):
+        self.fetched_sizes.append(size)
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
 
 ARGS1 = {
     'query': "select Name from city",
@@ -216,3 +245,184 @@ def test_sql_queries_with_empty_table(mocker):
     mocker.patch.object(client.connection, 'execute', return_value=ConnectionMock())
     result = sql_query_execute(client, ARGS3)
     assert EMPTY_OUTPUT == result[1]  # entry context is found in the 2nd place in the result of the command
+
+
+@pytest.mark.parametrize('dialect, query, expected_query', [
+    ('MySQL', 'select Name from city;',
+     'SELECT * FROM (select Name from city\n) AS paginated_query LIMIT 5 OFFSET 10'),
+    ('PostgreSQL', 'WITH c AS (select Name from city) select * from c',
+     'SELECT * FROM (WITH c AS (select Name from city) select * from c\n) AS paginated_query LIMIT 5 OFFSET 10'),
+    ('MySQL', 'select Name from city -- the city names',
+     'SELECT * FROM (select Name from city -- the city names\n) AS paginated_query LIMIT 5 OFFSET 10'),
+    ('Oracle', 'select Name from city',
+     'SELECT * FROM (select Name from city\n) paginated_query OFFSET 10 ROWS FETCH NEXT 5 ROWS ONLY'),
+    ('Microsoft SQL Server', 'select Name from city', None),
+    ('MySQL', "insert into city (Name) values ('Kabul')", None),
+    ('MySQL', 'select 1; delete from city', None),
+])
+def test_generate_paginated_query(dialect, query, expected_query):
+    """Unit test
+    Given
+    - a query of a dialect
+    When
+    - paginating the query by the database
+    Then
+    - only single select queries of dialects which support it are wrapped with the limit and offset
+    """
+    assert generate_paginated_query(dialect, query, 5, 10) == expected_query
+
+
+def test_sql_query_execute_paginates_by_database(mocker):
+    """Unit test
+    Given
+    - select query with limit and skip
+    When
+    - executing the query in MySQL
+    Then
+    - the limit and skip are applied in the query, and not on the fetched rows
+    """
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    request_mock = mocker.patch.object(Client, 'sql_query_execute_request', return_value=(RAW1[:2], HEADER1))
+    client = Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    result = sql_query_execute(client, {'query': 'select Name from city', 'limit': 2, 'skip': 1})
+    assert request_mock.call_args[0][0] == 'SELECT * FROM (select Name from city\n) AS paginated_query LIMIT 2 OFFSET 1'
+    assert request_mock.call_args[1] == {'limit': 2}
+    assert result[2] == [{'Name': 'Kabul'}, {'Name': 'Qandahar'}]
+
+
+def test_sql_query_execute_falls_back_when_pagination_fails(mocker):
+    """Unit test
+    Given
+    - select query which can't be wrapped as a derived table, e.g. a join of two columns of the same name in MySQL
+    When
+    - executing the query with limit and skip
+    Then
+    - the query is executed as is, and the limit and skip are applied on the fetched rows
+    """
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    request_mock = mocker.patch.object(Client, 'sql_query_execute_request',
+                                       side_effect=[Exception('Duplicate column name'), (RAW1[:2], HEADER1)])
+    client = Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    query = 'select a.id, b.id from a join b on a.name = b.name'
+    result = sql_query_execute(client, {'query': query, 'limit': 2, 'skip': 1})
+    assert request_mock.call_args[0][0] == query
+    assert request_mock.call_args[1] == {'limit': 2, 'skip': 1}
+    assert result[2] == [{'Name': 'Kabul'}, {'Name': 'Qandahar'}]
+
+
+def test_sql_query_execute_request_fetches_until_limit(mocker):
+    """Unit test
+    Given
+    - a query result with many rows
+    When
+    - executing the query with limit and skip
+    Then
+    - only the rows up to the limit are fetched, and the skipped rows are dropped
+    """
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    client = Client('Microsoft SQL Server', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    result_mock = ResultMock([RowMock(Name=str(i)) for i in range(5000)])
+    mocker.patch.object(client.connection, 'execute', return_value=result_mock)
+    rows, headers = client.sql_query_execute_request('select Name from city', [], limit=1500, skip=10)
+    assert [row['Name'] for row in rows] == [str(i) for i in range(10, 1510)]
+    assert list(headers) == ['Name']
+    assert result_mock.fetched_sizes == [1000, 510]
+
+
+@pytest.mark.parametrize('dialect, has_last_value, include_last_value, expected_query', [
+    ('MySQL', True, False,
+     'SELECT * FROM (select * from audit\n) AS fetch_query WHERE id > :last_value ORDER BY id LIMIT 10'),
+    ('MySQL', True, True,
+     'SELECT * FROM (select * from audit\n) AS fetch_query WHERE id >= :last_value ORDER BY id LIMIT 10'),
+    ('MySQL', False, False, 'SELECT * FROM (select * from audit\n) AS fetch_query ORDER BY id LIMIT 10'),
+    ('Microsoft SQL Server', True, False,
+     'SELECT TOP 10 * FROM (select * from audit\n) AS fetch_query WHERE id > :last_value ORDER BY id'),
+    ('Oracle', True, False,
+     'SELECT * FROM (select * from audit\n) fetch_query WHERE id > :last_value ORDER BY id FETCH FIRST 10 ROWS ONLY'),
+])
+def test_generate_fetch_query(dialect, has_last_value, include_last_value, expected_query):
+    """Unit test
+    Given
+    - a fetch query and the column to track
+    When
+    - generating the query of the next incidents
+    Then
+    - only the rows after the last value are selected, ordered by the column and limited by the database
+    """
+    query = generate_fetch_query(dialect, 'select * from audit;', 'id', has_last_value, 10, include_last_value)
+    assert query == expected_query
+
+
+def test_fetch_incidents(mocker):
+    """Unit test
+    Given
+    - a last run with the last fetched id
+    When
+    - fetching incidents
+    Then
+    - the rows after the last id are fetched as incidents
+    - the last run is updated to the id of the last row
+    """
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    mocker.patch.object(demisto, 'getLastRun', return_value={'last_value': 3})
+    set_last_run_mock = mocker.patch.object(demisto, 'setLastRun')
+    request_mock = mocker.patch.object(Client, 'sql_query_execute_request',
+                                       return_value=([{'ID': 4, 'action': 'login'}, {'ID': 5, 'action': 'logout'}],
+                                                     ['ID', 'action']))
+    client = Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    params = {'fetch_query': 'select * from audit', 'fetch_column': 'id', 'max_fetch': '2',
+              'incident_name_column': 'action'}
+    incidents = fetch_incidents(client, params)
+    assert request_mock.call_args[0][1] == {'last_value': 3}
+    assert [incident['name'] for incident in incidents] == ['login', 'logout']
+    assert incidents[0]['rawJSON'] == '{"ID": "4", "action": "login"}'
+    set_last_run_mock.assert_called_with({'last_value': 5, 'last_ids': [get_row_id({'ID': '5', 'action': 'logout'})]})
+
+
+def test_fetch_incidents_of_the_same_value(mocker):
+    """Unit test
+    Given
+    - a last run with the last fetched timestamp and the ids of its fetched rows
+    When
+    - fetching incidents, and more rows of the last fetched timestamp were added
+    Then
+    - the rows of the last timestamp are selected again, and only the ones which weren't fetched are returned
+    - the ids of the fetched rows of the new last timestamp are saved in the last run
+    """
+    fetched_row = {'time': '2020-01-01 10:00:00', 'action': 'login'}
+    new_row = {'time': '2020-01-01 10:00:00', 'action': 'logout'}
+    next_row = {'time': '2020-01-01 11:00:00', 'action': 'login'}
+    mocker.patch.object(Client, '_create_engine_and_connect')
+    mocker.patch.object(demisto, 'getLastRun', return_value={'last_value': '2020-01-01 10:00:00',
+                                                             'last_ids': [get_row_id(fetched_row)]})
+    set_last_run_mock = mocker.patch.object(demisto, 'setLastRun')
+    request_mock = mocker.patch.object(Client, 'sql_query_execute_request',
+                                       return_value=([fetched_row, new_row, next_row], ['time', 'action']))
+    client = Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False)
+    params = {'fetch_query': 'select * from audit', 'fetch_column': 'time', 'max_fetch': '1',
+              'incident_name_column': 'action'}
+    incidents = fetch_incidents(client, params)
+    assert 'time >= :last_value' in request_mock.call_args[0][0]
+    assert 'LIMIT 2' in request_mock.call_args[0][0]
+    assert [incident['name'] for incident in incidents] == ['logout']
+    set_last_run_mock.assert_called_with({'last_value': '2020-01-01 10:00:00',
+                                          'last_ids': [get_row_id(fetched_row), get_row_id(new_row)]})
+
+
+def test_get_engine_reuses_pooled_engine(mocker):
+    """Unit test
+    Given
+    - an instance which uses a connection pool
+    When
+    - creating clients in different commands, which are executed with new globals
+    Then
+    - the engine is created once, and kept in a module of the process
+    """
+    import sys
+    create_engine_mock = mocker.patch.object(GenericSQL.sqlalchemy, 'create_engine')
+    mocker.patch.dict(sys.modules)
+    sys.modules.pop(GenericSQL.ENGINES_MODULE_NAME, None)
+    Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False, use_pool=True)
+    Client('MySQL', 'server_url', 'username', 'password', 'port', 'database', "", False, use_pool=True)
+    assert create_engine_mock.call_count == 1
+    assert len(sys.modules[GenericSQL.ENGINES_MODULE_NAME].engines) == 1
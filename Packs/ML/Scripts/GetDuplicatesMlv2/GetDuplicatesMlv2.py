@@ -4,12 +4,16 @@ import collections
 import re
 import dateutil.parser
 import pickle
+import base64
+import hashlib
 import ipaddress
 import tldextract
 import editdistance
 import zlib
 from rfc822 import parseaddr  # type:ignore
+from email.utils import parsedate_tz, mktime_tz
 from urlparse import urlparse
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from datetime import datetime, timedelta
@@ -249,6 +253,9 @@ BRAND_LABEL = 'Brand'
 INSTANCE_LABEL = 'Instance'
 CANDIDATES_FEATURES_NA_RATIO = 0.2
 TIME_FIELD = 'created'
+MODEL_NAME_PREFIX = 'GetDuplicatesMlv2_'
+# change when the model parameters change, so models which were trained before are not used
+MODEL_VERSION = '1'
 
 LABELS_BLACKLIST = [BRAND_LABEL, INSTANCE_LABEL, EMAIL_SENDER_ADDRESS_LABEL, EMAIL_SENDER_NAME_LABEL,
                     EMAIL_SUBJECT_LABEL, EMAIL_RECEIVED_LABEL, EMAIL_ATTACHMENT_LABEL, EMAIL_DATE_LABEL,
@@ -258,6 +265,9 @@ EMAIL_LABELS_FEATURES = []  # type: list
 EMAIL_LABELS_MAP = {}  # type: dict
 FEATURES = []  # type: list
 INDICATORS_FOR_JACCARD = []  # type: list
+TLD_EXTRACT = None
+# the incidents prepared for calculating features, by incident ID
+PREPARED_INCIDENTS = {}  # type: dict
 
 #############################################################################################
 
@@ -266,11 +276,18 @@ class Utils():
     email_pattern = re.compile(
         r"""[a-zA-Z0-9.!#$%&'*+/=?^_`{|}~-]+@[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*""")  # noqa: E501
 
+    @staticmethod
+    def get_tld_extract():
+        global TLD_EXTRACT
+        if TLD_EXTRACT is None:
+            TLD_EXTRACT = tldextract.TLDExtract(cache_file='/tmp/.tld_set')
+        return TLD_EXTRACT
+
     @staticmethod
     def extract_domain_from_url(url):
-        extract = tldextract.TLDExtract(cache_file='/tmp/.tld_set')
-        domain = extract(url).domain.lower()
-        suffix = extract(url).suffix.lower()
+        extract_result = Utils.get_tld_extract()(url)
+        domain = extract_result.domain.lower()
+        suffix = extract_result.suffix.lower()
         if len(domain) > 0 and len(suffix) > 0:
             return ".".join([domain, suffix])
 
@@ -415,6 +432,76 @@ class Utils():
         union_cardinality = len(Utils.union_set(x, y))
         return intersection_cardinality / float(union_cardinality)
 
+    @staticmethod
+    def get_hashed_tokens(x):
+        """
+        Gets the hashes of the hashable tokens which the jaccard similarity of x is calculated by.
+        """
+        if x is None:
+            return set()
+        if isinstance(x, dict):
+            x = Utils.get_hashable_from_dict(x)
+        hashes = set()
+        for v in x:
+            try:
+                hashes.add(hash(v))
+            except TypeError:
+                # not hashable
+                pass
+        return hashes
+
+    @staticmethod
+    def get_hashed_text_tokens(text):
+        return set(map(hash, text.split()))
+
+    @staticmethod
+    def jaccard_similarity_column(tokens, candidates_tokens):
+        """
+        Calculates the jaccard similarity of hashed tokens to each of the candidates hashed tokens at once.
+        The similarity of a candidate whose tokens are None is None.
+        """
+        candidates_sizes = np.array([len(t) if t is not None else 0 for t in candidates_tokens], dtype=np.int64)
+        candidates_indexes = np.repeat(np.arange(len(candidates_tokens)), candidates_sizes)
+        candidates_flat = np.fromiter((h for t in candidates_tokens if t is not None for h in t), dtype=np.int64,
+                                      count=int(candidates_sizes.sum()))
+        is_common = np.in1d(candidates_flat, np.fromiter(tokens, dtype=np.int64, count=len(tokens)))
+        intersection = np.bincount(candidates_indexes[is_common], minlength=len(candidates_tokens))
+        union = len(tokens) + candidates_sizes - intersection
+        similarity = np.where((candidates_sizes > 0) & (len(tokens) > 0), intersection / np.maximum(union, 1.0), 0)
+        return [float(v) if t is not None else None for v, t in zip(similarity, candidates_tokens)]
+
+    @staticmethod
+    def time_diff_seconds_column(date, candidates_dates):
+        """
+        Calculates the time difference in seconds of a date to each of the candidates dates at once.
+        The difference of a candidate whose date is None or can't be parsed is None.
+        """
+        seconds = Utils.dates_to_epoch_seconds([date] + list(candidates_dates))
+        diff = np.abs(seconds[1:] - seconds[0])
+        return [float(v) if not np.isnan(v) and d is not None else None for v, d in zip(diff, candidates_dates)]
+
+    @staticmethod
+    def dates_to_epoch_seconds(dates):
+        """
+        Converts dates to seconds since epoch, NaN for a date which is None or can't be parsed.
+        Email dates are parsed as RFC 2822 dates, and the other dates are parsed by pandas at once.
+        """
+        seconds = np.full(len(dates), np.nan)
+        other_dates_indexes = []
+        for i, date in enumerate(dates):
+            parsed_date = parsedate_tz(date) if isinstance(date, basestring) else None
+            if parsed_date is not None:
+                if parsed_date[9] is None:
+                    parsed_date = parsed_date[:9] + (0,)
+                seconds[i] = mktime_tz(parsed_date)
+            elif date is not None:
+                other_dates_indexes.append(i)
+        if other_dates_indexes:
+            other_dates = pd.to_datetime([dates[i] for i in other_dates_indexes], utc=True, errors='coerce')
+            other_seconds = (other_dates - pd.Timestamp(0, tz='UTC')).total_seconds()
+            seconds[other_dates_indexes] = np.asarray(other_seconds, dtype=float)
+        return seconds
+
     @staticmethod
     def canonize_ip_to_netrok(ip_address, mast_bits):
         try:
@@ -423,35 +510,54 @@ class Utils():
             return ip_address
 
 
+class PreparedIncident:
+    """
+    The parts of an incident which its features are calculated from, which are prepared once per incident.
+    """
+    def __init__(self, incident):
+        self.incident = incident
+        self.labels_map = Utils.get_incident_labels_map(incident['labels'])
+
+        self.indicators = dict(incident['indicators'])
+        domains = Utils.get_unique_list(
+            self.indicators.get('Domain', []) + Utils.get_domains(self.indicators, self.labels_map))
+        if len(domains) > 0:
+            self.indicators['Domain'] = domains
+
+        if IP_MASK_BITS_FOR_COMPARISON < 32 and IP_MASK_BITS_FOR_COMPARISON > 0:
+            if 'IP' in self.indicators:
+                self.indicators['IP'] = map(lambda ip: Utils.canonize_ip_to_netrok(
+                    ip, IP_MASK_BITS_FOR_COMPARISON), self.indicators['IP'])
+
+        self.labels_tokens = Utils.get_hashed_tokens(
+            [(k, v) for (k, v) in self.labels_map.items() if k not in LABELS_BLACKLIST])
+        self.custom_fields_tokens = Utils.get_hashed_tokens(incident.get('CustomFields', []))
+        self.sender_address = Utils.get_email_address(self.labels_map[EMAIL_SENDER_ADDRESS_LABEL]) \
+            if EMAIL_SENDER_ADDRESS_LABEL in self.labels_map else None
+
+
+def get_prepared_incident(incident):
+    prepared_incident = PREPARED_INCIDENTS.get(incident['id'])
+    if prepared_incident is None or prepared_incident.incident is not incident:
+        prepared_incident = PreparedIncident(incident)
+        PREPARED_INCIDENTS[incident['id']] = prepared_incident
+    return prepared_incident
+
+
 class IncidentFeatures:
     def __init__(self, incident1, incident2):
 
         self.incident1 = incident1
         self.incident2 = incident2
 
-        self.indicators1 = incident1['indicators']
-        self.indicators2 = incident2['indicators']
+        prepared_incident1 = get_prepared_incident(incident1)
+        prepared_incident2 = get_prepared_incident(incident2)
 
-        self.labels_map1 = Utils.get_incident_labels_map(self.incident1['labels'])
-        self.labels_map2 = Utils.get_incident_labels_map(self.incident2['labels'])
+        self.indicators1 = prepared_incident1.indicators
+        self.indicators2 = prepared_incident2.indicators
 
-        domains1 = Utils.get_unique_list(
-            self.indicators1.get('Domain', []) + Utils.get_domains(self.indicators1, self.labels_map2))
-        domains2 = Utils.get_unique_list(
-            self.indicators2.get('Domain', []) + Utils.get_domains(self.indicators2, self.labels_map2))
-
-        if len(domains1) > 0:
-            self.indicators1['Domain'] = domains1
-        if len(domains2) > 0:
-            self.indicators2['Domain'] = domains2
-
-        if IP_MASK_BITS_FOR_COMPARISON < 32 and IP_MASK_BITS_FOR_COMPARISON > 0:
-            if 'IP' in self.indicators1:
-                self.indicators1['IP'] = map(lambda ip: Utils.canonize_ip_to_netrok(
-                    ip, IP_MASK_BITS_FOR_COMPARISON), self.indicators1['IP'])
-            if 'IP' in self.indicators2:
-                self.indicators2['IP'] = map(lambda ip: Utils.canonize_ip_to_netrok(
-                    ip, IP_MASK_BITS_FOR_COMPARISON), self.indicators2['IP'])
+        self.labels_map1 = prepared_incident1.labels_map
+        self.labels_map2 = prepared_incident2.labels_map
 
     def get_email_labels_features(self):
         def add_label_ld_feature(label_name):
@@ -521,6 +627,68 @@ class IncidentFeatures:
         return features
 
 
+def calculate_candidates_features(incident, candidates, expected_features=FEATURES):
+    """
+    Calculates the features of an incident and each of the candidates, as the IncidentFeatures of each pair.
+    The incident is prepared once, and every feature is calculated for all of the candidates at once.
+    """
+    source = get_prepared_incident(incident)
+    prepared_candidates = [get_prepared_incident(candidate) for candidate in candidates]
+    columns = collections.OrderedDict()  # type: collections.OrderedDict
+
+    def add_column(name, values):
+        if name in expected_features or any(v is not None for v in values):
+            columns[name] = values
+
+    def labels_pairs(label_name):
+        if label_name not in source.labels_map:
+            return [None] * len(prepared_candidates)
+        return [c.labels_map[label_name] if label_name in c.labels_map else None for c in prepared_candidates]
+
+    def add_label_ld_column(label_name):
+        add_column(label_name, [editdistance.eval(source.labels_map[label_name], value) if value is not None else None
+                                for value in labels_pairs(label_name)])
+
+    def add_label_text_column(label_name):
+        values = labels_pairs(label_name)
+        tokens = Utils.get_hashed_text_tokens(source.labels_map[label_name]) if label_name in source.labels_map else set()
+        add_column(label_name, Utils.jaccard_similarity_column(
+            tokens, [Utils.get_hashed_text_tokens(value) if value is not None else None for value in values]))
+
+    columns['id'] = [candidate['id'] for candidate in candidates]
+
+    # incident features
+    add_column('incident_time_diff', Utils.time_diff_seconds_column(incident[TIME_FIELD],
+                                                                    [c[TIME_FIELD] for c in candidates]))
+    add_column('same_type', [incident['type'] == c['type'] for c in candidates])
+    add_column('same_severity', [incident['severity'] == c['severity'] for c in candidates])
+    add_column('custom_fields_jaccard', Utils.jaccard_similarity_column(
+        source.custom_fields_tokens, [c.custom_fields_tokens for c in prepared_candidates]))
+    add_column('labels_jaccard', Utils.jaccard_similarity_column(
+        source.labels_tokens, [c.labels_tokens for c in prepared_candidates]))
+    add_column('same_instance', [source.labels_map[INSTANCE_LABEL] == value if value is not None else None
+                                 for value in labels_pairs(INSTANCE_LABEL)])
+    for indicator_type in INDICATORS_FOR_JACCARD:
+        if indicator_type in source.indicators:
+            add_column('indicator_%s_jaccard' % indicator_type, Utils.jaccard_similarity_column(
+                Utils.get_hashed_tokens(source.indicators[indicator_type]),
+                [Utils.get_hashed_tokens(c.indicators[indicator_type]) if indicator_type in c.indicators else None
+                 for c in prepared_candidates]))
+
+    # email labels features
+    add_column(EMAIL_SENDER_ADDRESS_LABEL, [
+        editdistance.eval(source.sender_address, c.sender_address) if source.sender_address and c.sender_address
+        else None for c in prepared_candidates])
+    add_column(EMAIL_DATE_LABEL, Utils.time_diff_seconds_column(source.labels_map.get(EMAIL_DATE_LABEL),
+                                                                labels_pairs(EMAIL_DATE_LABEL)))
+    add_label_ld_column(EMAIL_SUBJECT_LABEL)
+    add_label_ld_column(EMAIL_ATTACHMENT_LABEL)
+    add_label_text_column(EMAIL_TEXT_LABEL)
+    add_label_text_column(EMAIL_HTML_LABEL)
+
+    return pd.DataFrame(columns, columns=columns.keys())
+
+
 ##################################################################################
 
 
@@ -617,6 +785,57 @@ def get_ml_model():
     return RandomForestClassifier(max_depth=10, n_estimators=100, random_state=1)
 
 
+def get_model_name(X):
+    # one model is stored per features set, and overridden when it is trained on new data
+    features = '%s\n%s' % (MODEL_VERSION, ','.join(str(column) for column in X.columns))
+    return MODEL_NAME_PREFIX + hashlib.md5(features).hexdigest()
+
+
+def get_training_data_hash(X, Y):
+    training_data = '%s\n%s' % (X.to_csv(), Y.to_csv(header=True))
+    return hashlib.md5(training_data).hexdigest()
+
+
+def load_model(model_name, training_data_hash):
+    res = demisto.executeCommand('getMLModel', {'modelName': model_name})[0]
+    if is_error(res):
+        return None
+    try:
+        model_data = pickle.loads(base64.b64decode(res['Contents']['modelData']))
+    except Exception as e:
+        demisto.debug('Failed to load model %s: %s' % (model_name, str(e)))
+        return None
+    # the stored model was trained on other data
+    if not isinstance(model_data, dict) or model_data.get('training_data_hash') != training_data_hash:
+        return None
+    return model_data['model']
+
+
+def store_model(model_name, training_data_hash, model):
+    model_data = pickle.dumps({'training_data_hash': training_data_hash, 'model': model}, pickle.HIGHEST_PROTOCOL)
+    res = demisto.executeCommand('createMLModel', {'modelData': base64.b64encode(model_data),
+                                                   'modelName': model_name,
+                                                   'modelLabels': [str(label) for label in model.classes_],
+                                                   'modelOverride': 'true'})
+    if is_error(res):
+        demisto.debug('Failed to store model %s: %s' % (model_name, get_error(res)))
+
+
+def get_trained_model(X, Y):
+    """
+    Gets the model trained on the given data. The trained model is stored, and is trained again only when the
+    training data changes, overriding the stored model of the features set.
+    """
+    model_name = get_model_name(X)
+    training_data_hash = get_training_data_hash(X, Y)
+    model = load_model(model_name, training_data_hash)
+    if model is None:
+        model = get_ml_model()
+        model.fit(X, Y)
+        store_model(model_name, training_data_hash, model)
+    return model
+
+
 def get_result_record(incident, probabilty):
     occured_time = incident[TIME_FIELD]
     try:
@@ -711,24 +930,18 @@ def main():
 
     X = filter_features(features_df, use_features)
     Y = features_df[DUPLICATE_COL]
-    model = get_ml_model()
-    model.fit(X, Y)
+    model = get_trained_model(X, Y)
     candidates = enrich_incidents_by_indicators(get_incidents_by_time_diff(incident.get('id'),
                                                                            incident[TIME_FIELD],
                                                                            IGNORE_CLOSED_INCIDENTS,
                                                                            MAX_INCIDENTS, TIME_DIFF_HOURS), MAX_INDICATORS)
     candidates.pop(incident['id'], None)
 
-    candidates_features_list = []
-    for candidate in candidates.values():
-        feature_dict = IncidentFeatures(incident, candidate).calculate_features()
-        feature_dict['id'] = candidate['id']
-        candidates_features_list.append(feature_dict)
-    if len(candidates_features_list) == 0:
+    if len(candidates) == 0:
         demisto.results('Did not find any duplicate incidents candidates')
         return
 
-    candidates_features = pd.DataFrame.from_dict(candidates_features_list)
+    candidates_features = calculate_candidates_features(incident, candidates.values())
     candidates_features = candidates_features.dropna(axis=0, thresh=(len(use_features) * (1 - CANDIDATES_FEATURES_NA_RATIO)))
     candidates_features_x = filter_features(candidates_features, use_features)
     candidates_features_x = union_complete_missing_values(X, candidates_features_x, ['features', 'candidates']).loc['candidates']
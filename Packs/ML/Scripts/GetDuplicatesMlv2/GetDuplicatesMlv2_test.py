@@ -1,5 +1,5 @@
 import demistomock as demisto
-from GetDuplicatesMlv2 import main, Utils
+from GetDuplicatesMlv2 import main, Utils, get_trained_model, get_model_name
 from CommonServerPython import entryTypes
 
 
@@ -18,6 +18,10 @@ def test_main(mocker):
             ]
         elif name == 'getIncidents':
             return demisto.exampleIncidents  # use original mock
+        elif name == 'getMLModel':
+            return [{'Type': entryTypes['error'], 'Contents': 'model not found'}]
+        elif name == 'createMLModel':
+            return [{'Type': entryTypes['note'], 'Contents': 'done'}]
         else:
             raise ValueError('Unimplemented command called: {}'.format(name))
 
@@ -42,3 +46,94 @@ def test_extract_domain_from_url():
     assert res == 'google.com'
     res = Utils.extract_domain_from_url("https://www.google.co.il")  # disable-secrets-detection
     assert res == 'google.co.il'
+
+
+def test_get_trained_model(mocker):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    models = {}
+
+    def executeCommand(name, args=None):
+        if name == 'getMLModel':
+            if args['modelName'] in models:
+                return [{'Type': entryTypes['note'], 'Contents': {'modelData': models[args['modelName']]}}]
+            return [{'Type': entryTypes['error'], 'Contents': 'model not found'}]
+        elif name == 'createMLModel':
+            models[args['modelName']] = args['modelData']
+            return [{'Type': entryTypes['note'], 'Contents': 'done'}]
+        else:
+            raise ValueError('Unimplemented command called: {}'.format(name))
+
+    mocker.patch.object(demisto, 'executeCommand', side_effect=executeCommand)
+    fit_mock = mocker.spy(RandomForestClassifier, 'fit')
+    X = pd.DataFrame({'labels_jaccard': [0.1, 0.9, 0.2, 0.8], 'incident_time_diff': [10, 1, 8, 2]})
+    Y = pd.Series([0, 1, 0, 1])
+
+    # first run trains and stores the model, the second one loads it
+    model = get_trained_model(X, Y)
+    loaded_model = get_trained_model(X, Y)
+    assert fit_mock.call_count == 1
+    assert list(models.keys()) == [get_model_name(X)]
+    assert list(loaded_model.predict(X)) == list(model.predict(X))
+
+    # new training data trains the model again, and overrides the stored model of the features set
+    get_trained_model(X, pd.Series([0, 1, 1, 1]))
+    assert fit_mock.call_count == 2
+    assert len(models) == 1
+    get_trained_model(X, pd.Series([0, 1, 1, 1]))
+    assert fit_mock.call_count == 2
+    # other features train a new model
+    get_trained_model(X[['labels_jaccard']], Y)
+    assert fit_mock.call_count == 3
+    assert len(models) == 2
+
+
+def create_incident(incident_id, created, labels, indicators, severity=1, custom_fields=None):
+    return {'id': incident_id, 'created': created, 'type': 'Phishing', 'severity': severity,
+            'CustomFields': custom_fields or {}, 'indicators': indicators,
+            'labels': [{'type': k, 'value': v} for k, v in labels.items()]}
+
+
+def test_calculate_candidates_features(mocker):
+    import math
+    import GetDuplicatesMlv2
+    from GetDuplicatesMlv2 import calculate_candidates_features, IncidentFeatures
+    mocker.patch.object(GetDuplicatesMlv2, 'INDICATORS_FOR_JACCARD', ['Email', 'IP', 'URL'])
+    mocker.patch.object(GetDuplicatesMlv2, 'IP_MASK_BITS_FOR_COMPARISON', 24)
+    incident = create_incident('1', '2019-10-10T10:00:00+03:00', {
+        'Email/headers/From': 'John <john@test.com>',
+        'Email/headers/Subject': 'Your invoice',
+        'Email/text': 'please pay the invoice now',
+        'Email/headers/Date': 'Thu, 10 Oct 2019 10:00:00 +0300',
+        'Instance': 'mail1',
+        'Custom': 'a'
+    }, {'Email': ['john@test.com'], 'IP': ['1.1.1.1', '2.2.2.2'], 'URL': ['http://test.com/a']},
+        custom_fields={'field': 'x', 'list': ['not', 'hashable']})
+    candidates = [
+        create_incident('2', '2019-10-10T12:00:00+03:00', {
+            'Email/headers/From': 'John <jon@test.com>',
+            'Email/headers/Subject': 'Your invoices',
+            'Email/text': 'please pay now',
+            'Email/headers/Date': 'Thu, 10 Oct 2019 08:00:00 +0100',
+            'Instance': 'mail1',
+            'Custom': 'a'
+        }, {'Email': ['jon@test.com'], 'IP': ['1.1.1.7'], 'URL': ['http://test.com/b']}, custom_fields={'field': 'x'}),
+        create_incident('3', '2019-10-09T10:00:00Z', {'Email/headers/Subject': 'hello', 'Instance': 'mail2'},
+                        {'IP': ['3.3.3.3']}, severity=2),
+        create_incident('4', 'not a date', {}, {}),
+    ]
+
+    features = calculate_candidates_features(incident, candidates, ['labels_jaccard', 'incident_time_diff'])
+
+    assert list(features['id']) == ['2', '3', '4']
+    for i, candidate in enumerate(candidates):
+        expected = IncidentFeatures(incident, candidate).calculate_features(['labels_jaccard', 'incident_time_diff'])
+        for feature in set(expected.keys()).union(features.columns).difference(['id']):
+            value = features.iloc[i][feature] if feature in features.columns else None
+            if expected.get(feature) is None:
+                assert value is None or (isinstance(value, float) and math.isnan(value)), feature
+            else:
+                assert value == expected[feature], feature
+    assert features.iloc[0]['indicator_IP_jaccard'] == 0.5
+    assert features.iloc[0]['Email/headers/Date'] == 0
+    assert features.iloc[1]['incident_time_diff'] == 75600
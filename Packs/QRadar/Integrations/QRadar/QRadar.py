@@ -7,6 +7,7 @@ import requests
 import traceback
 import urllib
 import re
+import time
 from requests.exceptions import HTTPError, ConnectionError
 from copy import deepcopy
 
@@ -26,6 +27,16 @@ if TOKEN:
     AUTH_HEADERS['SEC'] = str(TOKEN)
 OFFENSES_PER_CALL = int(demisto.params().get('offensesPerCall', 50))
 OFFENSES_PER_CALL = 50 if OFFENSES_PER_CALL > 50 else OFFENSES_PER_CALL
+CONNECTION_POOL_SIZE = int(demisto.params().get('connectionPoolSize') or 10)
+# Stop draining new offense pages once a fetch cycle has been running for this long
+FETCH_TIME_BUDGET_SECONDS = 60
+# Offense types, closing reasons and addresses rarely change, so they are kept in the integration context
+ENRICHMENT_CACHE_TTL_SECONDS = 60 * 60
+ENRICHMENT_CACHE_CONTEXT_KEY = 'enrichment_cache'
+ENRICHMENT_CACHE = None
+ENRICHMENT_CACHE_CHANGED = False
+# cache sections which were requested again in this run, after a value was missing from them
+REFRESHED_ENRICHMENT_SECTIONS = set()  # type: set
 
 if not TOKEN and not (USERNAME and PASSWORD):
     raise Exception('Either credentials or auth token should be provided.')
@@ -36,6 +47,15 @@ if not demisto.params()['proxy']:
     del os.environ['http_proxy']
     del os.environ['https_proxy']
 
+# A single session keeps connections to QRadar alive, so consecutive requests don't pay for a new TLS handshake
+SESSION = requests.Session()
+SESSION.verify = USE_SSL
+if not TOKEN:
+    SESSION.auth = (USERNAME, PASSWORD)
+for prefix in ('https://', 'http://'):
+    SESSION.mount(prefix, requests.adapters.HTTPAdapter(pool_connections=CONNECTION_POOL_SIZE,
+                                                        pool_maxsize=CONNECTION_POOL_SIZE))
+
 ''' Header names transformation maps '''
 # Format: {'OldName': 'NewName'}
 
@@ -239,15 +259,13 @@ def send_request_no_error_handling(headers, method, params, url, data):
     """
         Send request with no error handling, so the error handling can be done via wrapper function
     """
-    log_hdr = deepcopy(headers)
-    log_hdr.pop('SEC', None)
-    LOG('qradar is attempting {method} request sent to {url} with headers:\n{headers}\nparams:\n{params}'
-        .format(method=method, url=url, headers=json.dumps(log_hdr, indent=4), params=json.dumps(params, indent=4)))
-    if TOKEN:
-        res = requests.request(method, url, headers=headers, params=params, verify=USE_SSL, data=data)
-    else:
-        res = requests.request(method, url, headers=headers, params=params, verify=USE_SSL, data=data,
-                               auth=(USERNAME, PASSWORD))
+    # Formatting the request for the log is only worth its cost when someone is going to read it
+    if is_debug_mode():
+        log_hdr = dict(headers)
+        log_hdr.pop('SEC', None)
+        LOG('qradar is attempting {method} request sent to {url} with headers:\n{headers}\nparams:\n{params}'
+            .format(method=method, url=url, headers=json.dumps(log_hdr, indent=4), params=json.dumps(params, indent=4)))
+    res = SESSION.request(method, url, headers=headers, params=params, data=data)
     return res
 
 
@@ -284,47 +302,115 @@ def epoch_to_ISO(ms_passed_since_epoch):
     return ms_passed_since_epoch
 
 
+# Loads the enrichment cache from the integration context once per run, dropping expired entries
+def get_enrichment_cache():
+    global ENRICHMENT_CACHE
+    if ENRICHMENT_CACHE is None:
+        integration_context = demisto.getIntegrationContext() or {}
+        now = time.time()
+        ENRICHMENT_CACHE = {}
+        for section, entries in integration_context.get(ENRICHMENT_CACHE_CONTEXT_KEY, {}).iteritems():
+            ENRICHMENT_CACHE[section] = {key: entry for key, entry in entries.iteritems() if entry['expires'] > now}
+    return ENRICHMENT_CACHE
+
+
+# Returns a cached enrichment value, or None if it is missing or expired
+def get_cached_value(section, key):
+    entry = get_enrichment_cache().get(section, {}).get(str(key))
+    if entry and entry['expires'] > time.time():
+        return entry['value']
+    return None
+
+
+def set_cached_value(section, key, value):
+    global ENRICHMENT_CACHE_CHANGED
+    get_enrichment_cache().setdefault(section, {})[str(key)] = {
+        'value': value,
+        'expires': time.time() + ENRICHMENT_CACHE_TTL_SECONDS
+    }
+    ENRICHMENT_CACHE_CHANGED = True
+
+
+# Persists the enrichment cache to the integration context so it is reused by the next fetch cycles and commands
+def save_enrichment_cache():
+    global ENRICHMENT_CACHE_CHANGED
+    if not ENRICHMENT_CACHE_CHANGED:
+        return
+    integration_context = demisto.getIntegrationContext() or {}
+    integration_context[ENRICHMENT_CACHE_CONTEXT_KEY] = get_enrichment_cache()
+    demisto.setIntegrationContext(integration_context)
+    ENRICHMENT_CACHE_CHANGED = False
+
+
+# Returns a cached enrichment section, requesting it when it is missing or expired. A refresh requests the section
+# again, at most once per run, as the values may have been created since they were cached
+def get_cached_section(section, request_func, refresh=False):
+    values = get_cached_value(section, 'all')
+    if values is None or (refresh and section not in REFRESHED_ENRICHMENT_SECTIONS):
+        if refresh:
+            REFRESHED_ENRICHMENT_SECTIONS.add(section)
+        values = request_func()
+        set_cached_value(section, 'all', values)
+    return values
+
+
+# Returns all closing reasons (including deleted and reserved ones), using the enrichment cache
+def get_cached_closing_reasons(refresh=False):
+    return get_cached_section('closing_reasons',
+                              lambda: get_closing_reasons(include_deleted=True, include_reserved=True), refresh)
+
+
+# Returns all offense types, using the enrichment cache
+def get_cached_offense_types(refresh=False):
+    return get_cached_section('offense_types', get_offense_types, refresh)
+
+
+# Returns the result_key of the item whose match_key is match_value, or None if there is no such item
+def find_enrichment_value(items, match_key, match_value, result_key):
+    for item in items or []:
+        if item[match_key] == match_value:
+            return item[result_key]
+    return None
+
+
+# Converts a value by the items of an enrichment section, and if the value is missing (e.g. it was created since the
+# section was cached) - by the section requested again
+def convert_by_cached_section(value, items, get_cached_items, match_key, result_key):
+    if value is None:
+        return value
+    converted = find_enrichment_value(items or get_cached_items(), match_key, value, result_key)
+    if converted is None:
+        converted = find_enrichment_value(get_cached_items(refresh=True), match_key, value, result_key)
+    return value if converted is None else converted
+
+
 # Converts closing reason name to id
 def convert_closing_reason_name_to_id(closing_name, closing_reasons=None):
-    if not closing_reasons:
-        closing_reasons = get_closing_reasons(include_deleted=True, include_reserved=True)
-    for closing_reason in closing_reasons:
-        if closing_reason['text'] == closing_name:
-            return closing_reason['id']
-    return closing_name
+    return convert_by_cached_section(closing_name, closing_reasons, get_cached_closing_reasons, 'text', 'id')
 
 
 # Converts closing reason id to name
 def convert_closing_reason_id_to_name(closing_id, closing_reasons=None):
-    if not closing_reasons:
-        closing_reasons = get_closing_reasons(include_deleted=True, include_reserved=True)
-    for closing_reason in closing_reasons:
-        if closing_reason['id'] == closing_id:
-            return closing_reason['text']
-    return closing_id
+    return convert_by_cached_section(closing_id, closing_reasons, get_cached_closing_reasons, 'id', 'text')
 
 
 # Converts offense type id to name
 def convert_offense_type_id_to_name(offense_type_id, offense_types=None):
-    if not offense_types:
-        offense_types = get_offense_types()
-    if offense_types:
-        for o_type in offense_types:
-            if o_type['id'] == offense_type_id:
-                return o_type['name']
-    return offense_type_id
+    return convert_by_cached_section(offense_type_id, offense_types, get_cached_offense_types, 'id', 'name')
 
 
 ''' Request/Response methods '''
 
 
 # Returns the result of an offenses request
-def get_offenses(_range, _filter='', _fields=''):
+def get_offenses(_range, _filter='', _fields='', _sort=''):
     full_url = '{0}/api/siem/offenses'.format(SERVER)
     params = {'filter': _filter} if _filter else {}
     headers = dict(AUTH_HEADERS)
     if _fields:
         params['fields'] = _fields
+    if _sort:
+        params['sort'] = _sort
     if _range:
         headers['Range'] = 'items={0}'.format(_range)
     return send_request('GET', full_url, headers, params)
@@ -498,58 +584,41 @@ def fetch_incidents():
     full_enrich = demisto.params().get('full_enrich')
     last_run = demisto.getLastRun()
     offense_id = last_run['id'] if last_run and 'id' in last_run else 0
+    start_time_query = ''
     if last_run and offense_id == 0:
-        start_time = last_run['startTime'] if 'startTime' in last_run else '0'
-        fetch_query = 'start_time>{0}{1}'.format(start_time, ' AND ({0})'.format(query) if query else '')
-    else:
-        fetch_query = 'id>{0} {1}'.format(offense_id, 'AND ({0})'.format(query) if query else '')
-        # qradar returns offenses sorted desc on id and there's no way to change sorting.
-        # if we get `offensesPerCall` offenses it means we (probably) have more than that so we
-        # start looking for the end of the list by doubling the page position until we're empty.
-        # then start binary search back until you find the end of the list and finally return
-        # `offensesPerCall` from the end.
-    demisto.debug('QRadarMsg - Fetching {}'.format(fetch_query))
-    raw_offenses = get_offenses(_range='0-{0}'.format(OFFENSES_PER_CALL), _filter=fetch_query)
-    demisto.debug('QRadarMsg - Fetched {} successfully'.format(fetch_query))
-    if len(raw_offenses) >= OFFENSES_PER_CALL:
-        last_offense_pos = find_last_page_pos(fetch_query)
-        raw_offenses = get_offenses(_range='{0}-{1}'.format(last_offense_pos - OFFENSES_PER_CALL + 1, last_offense_pos),
-                                    _filter=fetch_query)
-    raw_offenses = unicode_to_str_recur(raw_offenses)
+        start_time_query = 'start_time>{0}'.format(last_run['startTime'] if 'startTime' in last_run else '0')
+    # Offenses are requested sorted ascending by id, and each page continues right after the highest id seen so far.
+    # This cursor stays stable while new offenses are created, so pages are drained until no full page is left or
+    # the time budget of the fetch cycle runs out.
+    fetch_deadline = time.time() + FETCH_TIME_BUDGET_SECONDS
     incidents = []
-    if full_enrich:
-        demisto.debug('QRadarMsg - Enriching  {}'.format(fetch_query))
-        enrich_offense_res_with_source_and_destination_address(raw_offenses)
-        demisto.debug('QRadarMsg - Enriched  {} successfully'.format(fetch_query))
-    for offense in raw_offenses:
-        offense_id = max(offense_id, offense['id'])
-        incidents.append(create_incident_from_offense(offense))
+    while True:
+        fetch_query = build_fetch_query(offense_id, start_time_query, query)
+        demisto.debug('QRadarMsg - Fetching {}'.format(fetch_query))
+        raw_offenses = get_offenses(_range='0-{0}'.format(OFFENSES_PER_CALL - 1), _filter=fetch_query, _sort='+id')
+        demisto.debug('QRadarMsg - Fetched {} offenses for {} successfully'.format(len(raw_offenses), fetch_query))
+        raw_offenses = unicode_to_str_recur(raw_offenses)
+        if full_enrich:
+            demisto.debug('QRadarMsg - Enriching  {}'.format(fetch_query))
+            enrich_offense_res_with_source_and_destination_address(raw_offenses)
+            demisto.debug('QRadarMsg - Enriched  {} successfully'.format(fetch_query))
+        for offense in raw_offenses:
+            offense_id = max(offense_id, offense['id'])
+            incidents.append(create_incident_from_offense(offense))
+        if len(raw_offenses) < OFFENSES_PER_CALL or time.time() >= fetch_deadline:
+            break
     demisto.setLastRun({'id': offense_id})
     return incidents
 
 
-# Finds the last page position for QRadar query that receives a range parameter
-def find_last_page_pos(fetch_query):
-    # Make sure it wasn't a fluke we have exactly OFFENSES_PER_CALL results
-    if len(get_offenses(_range='{0}-{0}'.format(OFFENSES_PER_CALL), _filter=fetch_query)) == 0:
-        return OFFENSES_PER_CALL - 1
-    # Search up until we don't have any more results
-    pos = OFFENSES_PER_CALL * 2
-    while len(get_offenses(_range='{0}-{0}'.format(pos), _filter=fetch_query)) == 1:
-        pos = pos * 2
-    # Binary search the gap from the las step
-    high = pos
-    low = pos / 2
-    while high > low + 1:
-        pos = (high + low) / 2
-        if len(get_offenses(_range='{0}-{0}'.format(pos), _filter=fetch_query)) == 1:
-            # we still have results, raise the bar
-            low = pos
-        else:
-            # we're too high, lower the bar
-            high = pos
-    # low holds the last pos of the list
-    return low
+# Builds the offenses filter that continues fetching after the given offense id
+def build_fetch_query(offense_id, start_time_query='', query=''):
+    fetch_query = 'id>{0}'.format(offense_id)
+    if start_time_query:
+        fetch_query += ' AND {0}'.format(start_time_query)
+    if query:
+        fetch_query += ' AND ({0})'.format(query)
+    return fetch_query
 
 
 # Creates incidents from offense
@@ -590,8 +659,8 @@ def get_offenses_command():
 def enrich_offense_result(response, full_enrichment=False):
     enrich_offense_res_with_source_and_destination_address(response)
     if isinstance(response, list):
-        type_dict = get_offense_types()
-        closing_reason_dict = get_closing_reasons(include_deleted=True, include_reserved=True)
+        type_dict = get_cached_offense_types()
+        closing_reason_dict = get_cached_closing_reasons()
         for offense in response:
             enrich_single_offense_result(offense, full_enrichment, type_dict, closing_reason_dict)
     else:
@@ -657,25 +726,46 @@ def populate_src_and_dst_dicts_with_single_offense(offense, src_ids, dst_ids):
 
 # Helper method: Enriches the source addresses ids dictionary with the source addresses values corresponding to the ids
 def enrich_source_addresses_dict(src_adrs):
-    src_ids_str = dict_values_to_comma_separated_string(src_adrs)
+    missing_ids = fill_addresses_from_cache(src_adrs, 'source_addresses')
+    if not missing_ids:
+        return src_adrs
+    src_ids_str = ','.join(convert_to_str(src_id) for src_id in missing_ids)
     source_url = '{0}/api/siem/source_addresses?filter=id in ({1})'.format(SERVER, src_ids_str)
     src_res = send_request('GET', source_url, AUTH_HEADERS)
     for src_adr in src_res:
         src_adrs[src_adr['id']] = convert_to_str(src_adr['source_ip'])
+        set_cached_value('source_addresses', src_adr['id'], src_adrs[src_adr['id']])
     return src_adrs
 
 
 # Helper method: Enriches the destination addresses ids dictionary with the source addresses values corresponding to
 # the ids
 def enrich_destination_addresses_dict(dst_adrs):
-    dst_ids_str = dict_values_to_comma_separated_string(dst_adrs)
+    missing_ids = fill_addresses_from_cache(dst_adrs, 'destination_addresses')
+    if not missing_ids:
+        return dst_adrs
+    dst_ids_str = ','.join(convert_to_str(dst_id) for dst_id in missing_ids)
     destination_url = '{0}/api/siem/local_destination_addresses?filter=id in ({1})'.format(SERVER, dst_ids_str)
     dst_res = send_request('GET', destination_url, AUTH_HEADERS)
     for dst_adr in dst_res:
         dst_adrs[dst_adr['id']] = convert_to_str(dst_adr['local_destination_ip'])
+        set_cached_value('destination_addresses', dst_adr['id'], dst_adrs[dst_adr['id']])
     return dst_adrs
 
 
+# Helper method: Replaces the address ids that are in the enrichment cache with their addresses and returns the ids
+# that still need to be requested
+def fill_addresses_from_cache(adrs, section):
+    missing_ids = []
+    for adr_id in adrs.keys():
+        cached_adr = get_cached_value(section, adr_id)
+        if cached_adr is None:
+            missing_ids.append(adr_id)
+        else:
+            adrs[adr_id] = cached_adr
+    return missing_ids
+
+
 # Helper method: For a single offense replaces the source and destination ids with the actual addresses
 def enrich_single_offense_res_with_source_and_destination_address(offense, src_adrs, dst_adrs):
     if isinstance(offense.get('source_address_ids'), list):
@@ -1221,6 +1311,7 @@ try:
         demisto.results(get_domains_by_id_command())
     elif demisto.command() == 'qradar-upload-indicators':
         return_outputs(*upload_indicators_command())
+    save_enrichment_cache()
 except Exception as e:
     message = e.message if hasattr(e, 'message') else convert_to_str(e)
     error = 'Error has occurred in the QRadar Integration: {error}\n {message}'.format(error=type(e), message=message)
@@ -1,6 +1,7 @@
 import pytest
 import demistomock as demisto
 import copy
+import time
 
 
 @pytest.fixture(autouse=True)
@@ -279,6 +280,138 @@ def test_upload_indicators_command_no_indicators_found(mocker):
     assert res == "No indicators found, Reference set test_ref_set didn't change"
 
 
+def test_fetch_incidents_drains_pages_by_id_cursor(mocker):
+    """
+    Given:
+        - More new offenses than fit in a single page
+    When:
+        - I fetch incidents
+    Then:
+        - Pages are requested sorted ascending by id, each one continuing after the last fetched id
+        - The last run holds the highest fetched offense id
+    """
+    import QRadar as qradar
+    mocker.patch.object(qradar, 'OFFENSES_PER_CALL', 2)
+    mocker.patch.object(demisto, 'getLastRun', return_value={'id': 10})
+    set_last_run = mocker.patch.object(demisto, 'setLastRun')
+    get_offenses = mocker.patch.object(qradar, 'get_offenses', side_effect=[
+        [fetched_offense(11), fetched_offense(12)],
+        [fetched_offense(13)]
+    ])
+    incidents = qradar.fetch_incidents()
+    assert [incident['name'] for incident in incidents] == ['11 offense', '12 offense', '13 offense']
+    assert [call[1]['_filter'] for call in get_offenses.call_args_list] == ['id>10', 'id>12']
+    assert all(call[1]['_sort'] == '+id' and call[1]['_range'] == '0-1' for call in get_offenses.call_args_list)
+    set_last_run.assert_called_once_with({'id': 13})
+
+
+def test_fetch_incidents_time_budget(mocker):
+    """
+    Given:
+        - More new offenses than fit in a single page, and an exhausted fetch time budget
+    When:
+        - I fetch incidents
+    Then:
+        - Only the first page is fetched, and the next fetch cycle continues after it
+    """
+    import QRadar as qradar
+    mocker.patch.object(qradar, 'OFFENSES_PER_CALL', 2)
+    mocker.patch.object(qradar, 'FETCH_TIME_BUDGET_SECONDS', 0)
+    mocker.patch.object(demisto, 'getLastRun', return_value={'id': 10})
+    set_last_run = mocker.patch.object(demisto, 'setLastRun')
+    get_offenses = mocker.patch.object(qradar, 'get_offenses', return_value=[fetched_offense(11), fetched_offense(12)])
+    assert len(qradar.fetch_incidents()) == 2
+    assert get_offenses.call_count == 1
+    set_last_run.assert_called_once_with({'id': 12})
+
+
+def test_enrichment_cache(mocker):
+    """
+    Given:
+        - Closing reasons and addresses that were already requested in a previous run
+    When:
+        - I enrich offenses again
+    Then:
+        - The cached values are taken from the integration context instead of being requested again
+    """
+    import QRadar as qradar
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+    set_integration_context = mocker.patch.object(demisto, 'setIntegrationContext')
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE', None)
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE_CHANGED', False)
+    get_closing_reasons = mocker.patch.object(qradar, 'get_closing_reasons',
+                                              return_value=[{'id': 1, 'text': 'False-Positive'}])
+    send_request = mocker.patch.object(qradar, 'send_request',
+                                       return_value=[{'id': 5, 'source_ip': '1.1.1.1'}])
+    assert qradar.convert_closing_reason_id_to_name(1) == 'False-Positive'
+    assert qradar.enrich_source_addresses_dict({5: 5}) == {5: '1.1.1.1'}
+    qradar.save_enrichment_cache()
+    integration_context = set_integration_context.call_args[0][0]
+
+    # a new run loads the cache from the integration context
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value=integration_context)
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE', None)
+    assert qradar.convert_closing_reason_id_to_name(1) == 'False-Positive'
+    assert qradar.enrich_source_addresses_dict({5: 5}) == {5: '1.1.1.1'}
+    assert get_closing_reasons.call_count == 1
+    assert send_request.call_count == 1
+
+    # expired entries are requested again
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE', None)
+    mocker.patch.object(qradar.time, 'time', return_value=time.time() + qradar.ENRICHMENT_CACHE_TTL_SECONDS + 1)
+    qradar.convert_closing_reason_id_to_name(1)
+    assert get_closing_reasons.call_count == 2
+
+
+def test_enrichment_cache_refresh_on_miss(mocker):
+    """
+    Given:
+        - Cached closing reasons, without a closing reason that was created since they were cached
+    When:
+        - I convert the new closing reason name to its id, and then an unknown name
+    Then:
+        - The closing reasons are requested again once, and the new closing reason is found and cached
+        - The unknown name is returned as is, without requesting the closing reasons again
+    """
+    import QRadar as qradar
+    mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE', None)
+    mocker.patch.object(qradar, 'ENRICHMENT_CACHE_CHANGED', False)
+    mocker.patch.object(qradar, 'REFRESHED_ENRICHMENT_SECTIONS', set())
+    get_closing_reasons = mocker.patch.object(qradar, 'get_closing_reasons',
+                                              side_effect=[[{'id': 1, 'text': 'False-Positive'}],
+                                                           [{'id': 1, 'text': 'False-Positive'},
+                                                            {'id': 2, 'text': 'Resolved'}]])
+    assert qradar.convert_closing_reason_name_to_id('False-Positive') == 1
+    assert qradar.convert_closing_reason_name_to_id('Resolved') == 2
+    assert qradar.convert_closing_reason_id_to_name(2) == 'Resolved'
+    assert qradar.convert_closing_reason_name_to_id('Unknown') == 'Unknown'
+    assert get_closing_reasons.call_count == 2
+
+
+def test_send_request_uses_session(mocker):
+    """
+    Given:
+        - Debug mode is disabled
+    When:
+        - I send a request to QRadar
+    Then:
+        - The request is sent through the pooled session and nothing is logged
+    """
+    import QRadar as qradar
+    mocker.patch.object(qradar, 'is_debug_mode', return_value=False)
+    log = mocker.patch.object(qradar, 'LOG')
+    session_request = mocker.patch.object(qradar.SESSION, 'request')
+    qradar.send_request_no_error_handling(REQUEST_HEADERS, 'GET', {'filter': 'id>1'}, 'www.qradar.com/api', None)
+    session_request.assert_called_once_with('GET', 'www.qradar.com/api', headers=REQUEST_HEADERS,
+                                            params={'filter': 'id>1'}, data=None)
+    assert not log.called
+
+
+def fetched_offense(offense_id):
+    return {'id': offense_id, 'description': 'offense', 'start_time': 1563433313767}
+
+
 """ CONSTANTS """
 REQUEST_HEADERS = {'Content-Type': 'application/json', 'SEC': 'token'}
 NON_URL_SAFE_MSG = 'non-safe/;/?:@=&"<>#%{}|\\^~[] `'
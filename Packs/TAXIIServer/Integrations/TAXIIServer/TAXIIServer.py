@@ -5,7 +5,8 @@ from gevent.pywsgi import WSGIServer
 from urllib.parse import urlparse, ParseResult
 from tempfile import NamedTemporaryFile
 from base64 import b64decode
-from typing import Callable, List, Generator
+from typing import Callable, List, Generator, Iterator, Tuple
+from xml.sax.saxutils import escape
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from multiprocessing import Process
 
@@ -19,7 +20,6 @@ from libtaxii.messages_11 import (
     PollRequest,
     PollingServiceInstance,
     ServiceInstance,
-    ContentBlock,
     generate_message_id,
     get_message_from_xml)
 from libtaxii.constants import (
@@ -59,6 +59,71 @@ APP: Flask = Flask('demisto-taxii')
 NAMESPACE_URI = 'https://www.paloaltonetworks.com/cortex'
 NAMESPACE = 'cortex'
 
+''' STIX XML TEMPLATES '''
+# Templates of the STIX XML which the STIX library creates for the observables of TYPE_MAPPING, used to serialize
+# indicators without building the STIX object graph of each one
+STIX_NAMESPACES = {
+    'stixVocabs': 'http://stix.mitre.org/default_vocabularies-1',
+    'indicator': 'http://stix.mitre.org/Indicator-2',
+    'cybox': 'http://cybox.mitre.org/cybox-2',
+    'cyboxCommon': 'http://cybox.mitre.org/common-2',
+    'stixCommon': 'http://stix.mitre.org/common-1',
+    'stix': 'http://stix.mitre.org/stix-1',
+    NAMESPACE: NAMESPACE_URI,
+    'xlink': 'http://www.w3.org/1999/xlink',
+    'ds': 'http://www.w3.org/2000/09/xmldsig#',
+    'xs': 'http://www.w3.org/2001/XMLSchema',
+    'xsi': 'http://www.w3.org/2001/XMLSchema-instance'
+}
+STIX_TLP_NAMESPACES = {
+    'tlpMarking': 'http://data-marking.mitre.org/extensions/MarkingStructure#TLP-1',
+    'marking': 'http://data-marking.mitre.org/Marking-1'
+}
+STIX_OBJECT_NAMESPACES = {
+    'AddressObj': 'http://cybox.mitre.org/objects#AddressObject-2',
+    'URIObj': 'http://cybox.mitre.org/objects#URIObject-2',
+    'DomainNameObj': 'http://cybox.mitre.org/objects#DomainNameObject-1'
+}
+STIX_PACKAGE_TEMPLATE = '<stix:STIX_Package \n{namespaces}\n\t id="{id}" version="1.2">\n{header}' \
+                        '    <stix:Indicators>\n{indicators}    </stix:Indicators>\n</stix:STIX_Package>\n'
+STIX_TLP_HEADER_TEMPLATE = '    <stix:STIX_Header>\n' \
+                           '        <stix:Handling>\n' \
+                           '            <marking:Marking>\n' \
+                           '                <marking:Controlled_Structure>//node() | //@*</marking:Controlled_Structure>\n' \
+                           '                <marking:Marking_Structure xsi:type=\'tlpMarking:TLPMarkingStructureType\' ' \
+                           'color="{color}"/>\n' \
+                           '            </marking:Marking>\n' \
+                           '        </stix:Handling>\n' \
+                           '    </stix:STIX_Header>\n'
+STIX_INDICATOR_TEMPLATE = '        <stix:Indicator id="{id}" timestamp="{timestamp}" xsi:type=\'indicator:IndicatorType\'>\n' \
+                          '            <indicator:Title>{title}</indicator:Title>\n' \
+                          '            <indicator:Type xsi:type="stixVocabs:IndicatorTypeVocab-1.1">{type}</indicator:Type>\n' \
+                          '            <indicator:Description>{description}</indicator:Description>\n' \
+                          '            <indicator:Observable id="{observable_id}">\n' \
+                          '                <cybox:Title>{observable_title}</cybox:Title>\n' \
+                          '                <cybox:Object id="{object_id}">\n' \
+                          '                    {properties}\n' \
+                          '                </cybox:Object>\n' \
+                          '            </indicator:Observable>\n' \
+                          '            <indicator:Confidence timestamp="{timestamp}">\n' \
+                          '                <stixCommon:Value>{confidence}</stixCommon:Value>\n' \
+                          '            </indicator:Confidence>\n' \
+                          '        </stix:Indicator>\n'
+STIX_ADDRESS_PROPERTIES_TEMPLATE = '<cybox:Properties xsi:type="AddressObj:AddressObjectType" category="{category}">\n' \
+                                   '                        <AddressObj:Address_Value>{value}</AddressObj:Address_Value>\n' \
+                                   '                    </cybox:Properties>'
+STIX_DOMAIN_PROPERTIES_TEMPLATE = '<cybox:Properties xsi:type="DomainNameObj:DomainNameObjectType" type="FQDN">\n' \
+                                  '                        <DomainNameObj:Value>{value}</DomainNameObj:Value>\n' \
+                                  '                    </cybox:Properties>'
+STIX_URL_PROPERTIES_TEMPLATE = '<cybox:Properties xsi:type="URIObj:URIObjectType" type="URL">\n' \
+                               '                        <URIObj:Value>{value}</URIObj:Value>\n' \
+                               '                    </cybox:Properties>'
+TAXII_CONTENT_BLOCK_TEMPLATE = '<taxii_11:Content_Block xmlns:taxii="http://taxii.mitre.org/messages/taxii_xml_binding-1" ' \
+                               'xmlns:taxii_11="http://taxii.mitre.org/messages/taxii_xml_binding-1.1" ' \
+                               'xmlns:tdq="http://taxii.mitre.org/query/taxii_default_query-1">' \
+                               '<taxii_11:Content_Binding binding_id="{binding}"/>' \
+                               '<taxii_11:Content>{content}</taxii_11:Content></taxii_11:Content_Block>'
+
 
 ''' Log Handler '''
 
@@ -256,13 +321,8 @@ class TAXIIServer:
 
             for indicator in find_indicators_by_time_frame(indicator_query, exclusive_begin_time, inclusive_end_time):
                 try:
-                    stix_xml_indicator = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
-                    content_block = ContentBlock(
-                        content_binding=CB_STIX_XML_11,
-                        content=stix_xml_indicator
-                    )
-
-                    content_xml = content_block.to_xml().decode('utf-8')
+                    content_xml = TAXII_CONTENT_BLOCK_TEMPLATE.format(binding=CB_STIX_XML_11,
+                                                                      content=get_stix_indicator_xml(indicator))
                     yield f'{content_xml}\n'
                 except Exception as e:
                     handle_long_running_error(f'Failed parsing indicator to STIX: {e}')
@@ -315,21 +375,8 @@ def create_stix_ip_observable(namespace: str, indicator: dict) -> List[Observabl
     if type_ in [FeedIndicatorType.IPv6, FeedIndicatorType.IPv6CIDR]:
         category = cybox.objects.address_object.Address.CAT_IPV6
 
-    indicator_values = [value]
-    if '-' in value:
-        # looks like an IP Range, let's try to make it a CIDR
-        a1, a2 = value.split('-', 1)
-        if a1 == a2:
-            # same IP
-            indicator_values = [a1]
-        else:
-            # use netaddr builtin algo to summarize range into CIDR
-            iprange = netaddr.IPRange(a1, a2)
-            cidrs = iprange.cidrs()
-            indicator_values = list(map(str, cidrs))
-
     observables = []
-    for indicator_value in indicator_values:
+    for indicator_value in get_ip_indicator_values(value):
         id_ = f'{namespace}:observable-{uuid.uuid4()}'
         address_object = cybox.objects.address_object.Address(
             address_value=indicator_value,
@@ -347,6 +394,99 @@ def create_stix_ip_observable(namespace: str, indicator: dict) -> List[Observabl
     return observables
 
 
+def get_ip_indicator_values(value: str) -> List[str]:
+    """
+    Get the addresses of an IP indicator, splitting IP ranges to CIDRs.
+    Args:
+        value: The IP indicator value.
+
+    Returns:
+        The IP addresses or CIDRs.
+    """
+    indicator_values = [value]
+    if '-' in value:
+        # looks like an IP Range, let's try to make it a CIDR
+        a1, a2 = value.split('-', 1)
+        if a1 == a2:
+            # same IP
+            indicator_values = [a1]
+        else:
+            # use netaddr builtin algo to summarize range into CIDR
+            iprange = netaddr.IPRange(a1, a2)
+            cidrs = iprange.cidrs()
+            indicator_values = list(map(str, cidrs))
+    return indicator_values
+
+
+def create_stix_ip_observable_xml(namespace: str, indicator: dict) -> List[Tuple[str, str, str]]:
+    """
+    Create STIX IP observables XML from the template.
+    Args:
+        namespace: The XML namespace.
+        indicator: The Demisto IP indicator.
+
+    Returns:
+        The (title, object ID, properties XML) of the STIX IP observables.
+    """
+    category = cybox.objects.address_object.Address.CAT_IPV4
+    type_ = indicator.get('indicator_type', '')
+    value = indicator.get('value', '')
+
+    if type_ in [FeedIndicatorType.IPv6, FeedIndicatorType.IPv6CIDR]:
+        category = cybox.objects.address_object.Address.CAT_IPV6
+
+    return [(f'{type_}: {indicator_value}', f'{namespace}:Address-{uuid.uuid4()}',
+             STIX_ADDRESS_PROPERTIES_TEMPLATE.format(category=category, value=escape(indicator_value)))
+            for indicator_value in get_ip_indicator_values(value)]
+
+
+def create_stix_email_observable_xml(namespace: str, indicator: dict) -> List[Tuple[str, str, str]]:
+    """
+    Create STIX Email observable XML from the template.
+    Args:
+        namespace: The XML namespace.
+        indicator: The Demisto Email indicator.
+
+    Returns:
+        The (title, object ID, properties XML) of the STIX Email observable.
+    """
+    type_ = indicator.get('indicator_type', '')
+    value = indicator.get('value', '')
+    properties = STIX_ADDRESS_PROPERTIES_TEMPLATE.format(category=cybox.objects.address_object.Address.CAT_EMAIL,
+                                                         value=escape(value))
+    return [(f'{type_}: {value}', f'{namespace}:Address-{uuid.uuid4()}', properties)]
+
+
+def create_stix_domain_observable_xml(namespace: str, indicator: dict) -> List[Tuple[str, str, str]]:
+    """
+    Create STIX Domain observable XML from the template.
+    Args:
+        namespace: The XML namespace.
+        indicator: The Demisto Domain indicator.
+
+    Returns:
+        The (title, object ID, properties XML) of the STIX Domain observable.
+    """
+    value = indicator.get('value', '')
+    return [(f'FQDN: {value}', f'{namespace}:DomainName-{uuid.uuid4()}',
+             STIX_DOMAIN_PROPERTIES_TEMPLATE.format(value=escape(value)))]
+
+
+def create_stix_url_observable_xml(namespace: str, indicator: dict) -> List[Tuple[str, str, str]]:
+    """
+    Create STIX URL observable XML from the template.
+    Args:
+        namespace: The XML namespace.
+        indicator: The Demisto URL indicator.
+
+    Returns:
+        The (title, object ID, properties XML) of the STIX URL observable.
+    """
+    value = indicator.get('value', '')
+    return [(f'URL: {value}', f'{namespace}:URI-{uuid.uuid4()}',
+             STIX_URL_PROPERTIES_TEMPLATE.format(value=escape(value)))]
+
+
 def create_stix_email_observable(namespace: str, indicator: dict) -> List[Observable]:
     """
     Create STIX Email observable.
@@ -459,27 +599,39 @@ def create_stix_hash_observable(namespace, indicator):
 TYPE_MAPPING = {
     FeedIndicatorType.IP: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_IP_WATCHLIST,
-        'mapper': create_stix_ip_observable
+        'mapper': create_stix_ip_observable,
+        'xml_mapper': create_stix_ip_observable_xml,
+        'object_namespace': 'AddressObj'
     },
     FeedIndicatorType.CIDR: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_IP_WATCHLIST,
-        'mapper': create_stix_ip_observable
+        'mapper': create_stix_ip_observable,
+        'xml_mapper': create_stix_ip_observable_xml,
+        'object_namespace': 'AddressObj'
     },
     FeedIndicatorType.IPv6: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_IP_WATCHLIST,
-        'mapper': create_stix_ip_observable
+        'mapper': create_stix_ip_observable,
+        'xml_mapper': create_stix_ip_observable_xml,
+        'object_namespace': 'AddressObj'
     },
     FeedIndicatorType.IPv6CIDR: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_IP_WATCHLIST,
-        'mapper': create_stix_ip_observable
+        'mapper': create_stix_ip_observable,
+        'xml_mapper': create_stix_ip_observable_xml,
+        'object_namespace': 'AddressObj'
     },
     FeedIndicatorType.URL: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_URL_WATCHLIST,
-        'mapper': create_stix_url_observable
+        'mapper': create_stix_url_observable,
+        'xml_mapper': create_stix_url_observable_xml,
+        'object_namespace': 'URIObj'
     },
     FeedIndicatorType.Domain: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_DOMAIN_WATCHLIST,
-        'mapper': create_stix_domain_observable
+        'mapper': create_stix_domain_observable,
+        'xml_mapper': create_stix_domain_observable_xml,
+        'object_namespace': 'DomainNameObj'
     },
     FeedIndicatorType.File: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_FILE_HASH_WATCHLIST,
@@ -487,7 +639,9 @@ TYPE_MAPPING = {
     },
     FeedIndicatorType.Email: {
         'indicator_type': stix.common.vocabs.IndicatorType.TERM_MALICIOUS_EMAIL,
-        'mapper': create_stix_email_observable
+        'mapper': create_stix_email_observable,
+        'xml_mapper': create_stix_email_observable_xml,
+        'object_namespace': 'AddressObj'
     }
 }
 
@@ -504,6 +658,94 @@ def set_id_namespace(uri: str, name: str):
     mixbox.idgen.set_id_namespace(namespace)
 
 
+def get_indicator_confidence(indicator: dict) -> str:
+    """
+    Get the STIX confidence of a Demisto indicator, which is mapped by the indicator score.
+    Args:
+        indicator: The Demisto indicator.
+
+    Returns:
+        The STIX confidence.
+    """
+    confidence = 'Low'
+    indicator_score = indicator.get('score')
+    if indicator_score is None:
+        demisto.error(f'indicator without score: {indicator.get("value", "")}')
+    else:
+        score = int(indicator_score)
+        if score >= 3:
+            confidence = 'High'
+        elif score >= 2:
+            confidence = 'Medium'
+    return confidence
+
+
+def get_indicator_share_level(indicator: dict) -> str:
+    """
+    Get the TLP color of a Demisto indicator, if it has a valid one.
+    Args:
+        indicator: The Demisto indicator.
+
+    Returns:
+        The TLP color, or an empty string.
+    """
+    share_level = indicator.get('trafficlightprotocol', '').upper()
+    return share_level if share_level in ['WHITE', 'GREEN', 'AMBER', 'RED'] else ''
+
+
+def get_stix_indicator_xml(indicator: dict) -> str:
+    """
+    Convert a Demisto indicator to STIX XML. Indicator types which have an XML template are serialized from the
+    template, other types are serialized by the STIX library.
+    Args:
+        indicator: The Demisto indicator.
+
+    Returns:
+        The STIX indicator as XML string.
+    """
+    type_ = indicator.get('indicator_type', '')
+    type_mapper: dict = TYPE_MAPPING.get(type_, {})
+    if 'xml_mapper' not in type_mapper:
+        return get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE}).decode('utf-8')
+
+    value = indicator.get('value', '')
+    if type_ == 'URL':
+        indicator_value = werkzeug.urls.iri_to_uri(value, safe_conversion=True)
+    else:
+        indicator_value = value
+    sources = ','.join(indicator.get('sourceBrands', []))
+    timestamp = datetime.utcnow().replace(tzinfo=pytz.utc).isoformat()
+    confidence = get_indicator_confidence(indicator)
+
+    indicators_xml = ''.join(STIX_INDICATOR_TEMPLATE.format(
+        id=f'{NAMESPACE}:indicator-{uuid.uuid4()}',
+        timestamp=timestamp,
+        title=escape(f'{type_}: {indicator_value}'),
+        type=type_mapper['indicator_type'],
+        description=escape(f'{type_} indicator from {sources}'),
+        observable_id=f'{NAMESPACE}:observable-{uuid.uuid4()}',
+        observable_title=escape(observable_title),
+        object_id=object_id,
+        properties=properties,
+        confidence=confidence
+    ) for observable_title, object_id, properties in type_mapper['xml_mapper'](NAMESPACE, indicator))
+
+    namespaces = dict(STIX_NAMESPACES)
+    namespaces[type_mapper['object_namespace']] = STIX_OBJECT_NAMESPACES[type_mapper['object_namespace']]
+    header = ''
+    share_level = get_indicator_share_level(indicator)
+    if share_level:
+        namespaces.update(STIX_TLP_NAMESPACES)
+        header = STIX_TLP_HEADER_TEMPLATE.format(color=share_level)
+
+    return STIX_PACKAGE_TEMPLATE.format(
+        namespaces='\n'.join(f'\txmlns:{prefix}="{uri}"' for prefix, uri in namespaces.items()),
+        id=f'{NAMESPACE}:observable-{uuid.uuid4()}',
+        header=header,
+        indicators=indicators_xml
+    )
+
+
 def get_stix_indicator(indicator: dict) -> stix.core.STIXPackage:
     """
     Convert a Demisto indicator to STIX.
@@ -525,8 +767,8 @@ def get_stix_indicator(indicator: dict) -> stix.core.STIXPackage:
     handling = None
 
     # Add TLP if available
-    share_level = indicator.get('trafficlightprotocol', '').upper()
-    if share_level and share_level in ['WHITE', 'GREEN', 'AMBER', 'RED']:
+    share_level = get_indicator_share_level(indicator)
+    if share_level:
         marking_specification = stix.data_marking.MarkingSpecification()
         marking_specification.controlled_structure = "//node() | //@*"
 
@@ -567,21 +809,7 @@ def get_stix_indicator(indicator: dict) -> stix.core.STIXPackage:
         )
 
         # Confidence is mapped by the indicator score
-        confidence = 'Low'
-        indicator_score = indicator.get('score')
-        if indicator_score is None:
-            demisto.error(f'indicator without score: {value}')
-            stix_indicator.confidence = "Unknown"
-        else:
-            score = int(indicator.get('score', 0))
-            if score < 2:
-                pass
-            elif score < 3:
-                confidence = 'Medium'
-            else:
-                confidence = 'High'
-
-        stix_indicator.confidence = confidence
+        stix_indicator.confidence = get_indicator_confidence(indicator)
 
         stix_indicator.add_indicator_type(type_mapper['indicator_type'])
 
@@ -719,7 +947,7 @@ def get_collections(params: dict = demisto.params()) -> dict:
     return collections
 
 
-def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> Iterator[dict]:
     """
     Find indicators according to a query and begin time/end time.
     Args:
@@ -749,26 +977,23 @@ def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, en
     return find_indicators_loop(indicator_query)
 
 
-def find_indicators_loop(indicator_query: str):
+def find_indicators_loop(indicator_query: str) -> Iterator[dict]:
     """
-    Find indicators in a loop according to a query.
+    Find indicators in a loop according to a query. The indicators are fetched page by page, so every page is
+    fetched only when the previous one was consumed.
     Args:
         indicator_query: The indicator query.
 
     Returns:
         Indicator query results from Demisto.
     """
-    iocs: List[dict] = []
-    total_fetched = 0
     next_page = 0
     last_found_len = PAGE_SIZE
     while last_found_len == PAGE_SIZE:
-        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs')
-        iocs.extend(fetched_iocs)
+        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs') or []
+        yield from fetched_iocs
         last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
         next_page += 1
-    return iocs
 
 
 def taxii_make_response(taxii_message: TAXIIMessage):
@@ -412,7 +412,7 @@ def test_find_indicators_loop(mocker):
     mocker.patch.object(demisto, 'searchIndicators', return_value=json.loads(IP_INDICATORS))
 
     # Arrange
-    indicators = find_indicators_loop('q')
+    indicators = list(find_indicators_loop('q'))
 
     # Assert
     assert len(indicators) == 1
@@ -435,3 +435,72 @@ def test_validate_indicators(indicator):
 
     # Assert
     assert sdv.validate_xml(tree)
+
+
+def test_find_indicators_loop_lazy(mocker):
+    """
+    Given:
+        - Two pages of indicators, the first one full.
+    When:
+        - Consuming the indicators of the first page.
+    Then:
+        - The second page is fetched only after the first page was consumed.
+    """
+    import TAXIIServer
+    from TAXIIServer import find_indicators_loop
+
+    # Set
+    mocker.patch.object(TAXIIServer, 'PAGE_SIZE', 2)
+    pages = [{'iocs': [{'value': '1.1.1.1'}, {'value': '2.2.2.2'}]}, {'iocs': [{'value': '3.3.3.3'}]}]
+    search_mock = mocker.patch.object(demisto, 'searchIndicators', side_effect=pages)
+
+    # Arrange
+    indicators = find_indicators_loop('q')
+    first_page = [next(indicators), next(indicators)]
+
+    # Assert
+    assert search_mock.call_count == 1
+    assert [i['value'] for i in first_page + list(indicators)] == ['1.1.1.1', '2.2.2.2', '3.3.3.3']
+    assert search_mock.call_count == 2
+
+
+def normalize_stix_xml(element):
+    """
+    Get the tags, attributes and text of a STIX XML element, without the generated IDs and timestamps.
+    """
+    attributes = {k: v for k, v in element.attrib.items() if k not in ['id', 'timestamp']}
+    return (element.tag, attributes, (element.text or '').strip(),
+            [normalize_stix_xml(child) for child in element])
+
+
+@pytest.mark.parametrize('indicator',
+                         [json.loads(IP_INDICATORS)['iocs'][0], json.loads(URL_INDICATORS)['iocs'][0],
+                          json.loads(EMAIL_INDICATORS)['iocs'][0], json.loads(CIDR_INDICATORS)['iocs'][0],
+                          json.loads(DOMAIN_INDICATORS)['iocs'][0],
+                          json.loads(FILE_INDICATORS)['iocs'][0],
+                          dict(json.loads(IP_INDICATORS)['iocs'][0], value='1.1.1.0-1.1.1.5',
+                               trafficlightprotocol='amber'),
+                          dict(json.loads(URL_INDICATORS)['iocs'][0], value='https://example.com/a?b=1&c=<d>',
+                               score=3)])
+def test_get_stix_indicator_xml(mocker, indicator):
+    """
+    Given:
+        - Demisto indicators.
+    When:
+        - Serializing the indicators to STIX XML from the templates.
+    Then:
+        - The XML is valid STIX.
+        - The XML is identical to the STIX library serialization, apart of the generated IDs and timestamps.
+    """
+    from TAXIIServer import get_stix_indicator, get_stix_indicator_xml, NAMESPACE_URI, NAMESPACE
+    mocker.patch.object(demisto, 'error')
+
+    # Arrange
+    stix_xml = get_stix_indicator_xml(indicator)
+    library_xml = get_stix_indicator(indicator).to_xml(ns_dict={NAMESPACE_URI: NAMESPACE})
+    xml_file = lxml.etree.fromstring(stix_xml)
+    tree = lxml.etree.ElementTree(xml_file)
+
+    # Assert
+    assert sdv.validate_xml(tree)
+    assert normalize_stix_xml(xml_file) == normalize_stix_xml(lxml.etree.fromstring(library_xml))
@@ -1,4 +1,6 @@
 import datetime
+import json
+import re
 
 import Whois
 import demistomock as demisto
@@ -141,3 +143,152 @@ def test_query_result(whois_result, domain, expected):
     from Whois import create_outputs
     md, standard_ec, dbot_score = create_outputs(whois_result, domain)
     assert standard_ec['Whois']['QueryResult'] == expected
+
+
+def test_whois_request_cache(mocker):
+    class MockSocket(object):
+        def __init__(self, *args):
+            self.responses = [b'Domain Name: google.com\n', b'Registrar: MarkMonitor Inc.\n', b'']
+
+        def settimeout(self, timeout):
+            pass
+
+        def connect(self, address):
+            pass
+
+        def send(self, data):
+            pass
+
+        def recv(self, size):
+            return self.responses.pop(0)
+
+        def close(self):
+            pass
+
+    socket_mock = mocker.patch.object(Whois.socket, 'socket', side_effect=MockSocket)
+    mocker.patch.dict(sys.modules)
+    sys.modules.pop(Whois.WHOIS_RESPONSES_CACHE_MODULE_NAME, None)
+    response = Whois.whois_request('google.com', 'whois.test.com')
+    assert response == 'Domain Name: google.com\nRegistrar: MarkMonitor Inc.\n'
+    assert Whois.whois_request('google.com', 'whois.test.com') == response
+    assert socket_mock.call_count == 1
+    Whois.whois_request('google.co.uk', 'whois.test.com')
+    assert socket_mock.call_count == 2
+
+    # the next command is executed with new globals, and reuses the responses kept in the cache module
+    mocker.patch.object(Whois, 'TTLCache', side_effect=AssertionError('the cache was created again'))
+    assert Whois.get_whois_responses_cache().get(('whois.test.com', 43, 'google.com')) == response
+
+
+def test_ttl_cache(mocker):
+    cache = Whois.TTLCache(ttl=60, max_size=2)
+    mocker.patch.object(Whois.time, 'time', return_value=1000)
+    cache.set('a', 1)
+    mocker.patch.object(Whois.time, 'time', return_value=1010)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # the cache is full, so the value which expires first is dropped
+    mocker.patch.object(Whois.time, 'time', return_value=1020)
+    cache.set('c', 3)
+    assert cache.get('a') is None
+    assert (cache.get('b'), cache.get('c')) == (2, 3)
+    mocker.patch.object(Whois.time, 'time', return_value=1071)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_query_whois_server_timeout(mocker):
+    class StalledSocket(object):
+        def __init__(self, *args):
+            self.timeout = None
+
+        def settimeout(self, timeout):
+            self.timeout = timeout
+
+        def connect(self, address):
+            pass
+
+        def send(self, data):
+            pass
+
+        def recv(self, size):
+            raise Whois.socket.timeout('timed out')
+
+        def close(self):
+            pass
+
+    stalled_socket = StalledSocket()
+    mocker.patch.object(Whois.socket, 'socket', return_value=stalled_socket)
+    with pytest.raises(Whois.WhoisQueryFailedException) as e:
+        Whois.query_whois_server('google.com', 'whois.test.com')
+    assert "didn't respond in {} seconds".format(Whois.QUERY_TIMEOUT_SECONDS) in str(e.value)
+    assert stalled_socket.timeout == Whois.QUERY_TIMEOUT_SECONDS
+
+
+def test_domain_command_multiple_domains(mocker):
+    def get_whois(domain):
+        if domain == 'unsupported.test':
+            raise Whois.WhoisQueryFailedException(domain, 'The domain - {} - is not supported'.format(domain))
+        return {'raw': 'Domain Name: {}'.format(domain), 'registrar': ['Registrar']}
+
+    mocker.patch.object(demisto, 'args', return_value={'domain': 'google.com,unsupported.test,google.com,paypal.com'})
+    mocker.patch.object(demisto, 'results')
+    mocker.patch.object(Whois, 'get_whois', side_effect=get_whois)
+    Whois.domain_command()
+    assert demisto.results.call_count == 1
+    entries = demisto.results.call_args[0][0]
+    assert [entry['EntryContext'][Whois.outputPaths['domain']]['Name'] for entry in entries] == \
+        ['google.com', 'unsupported.test', 'paypal.com']
+    assert entries[0]['EntryContext'][Whois.outputPaths['domain']]['Whois']['QueryStatus'] == 'Success'
+    assert entries[1]['EntryContext'][Whois.outputPaths['domain']]['Whois']['QueryStatus'] == 'Failed'
+    assert entries[1]['Contents'] == 'The domain - unsupported.test - is not supported'
+
+
+@pytest.mark.parametrize('regex, expected', [
+    ('Creation Date:\\s?(?P<val>.+)', 'creation date:'),
+    ('Exp(?:iry)? Date\\s?[.]*:\\s?(?P<val>.+)', 'exp'),
+    ('Last update\\.?', 'last update'),
+    ('Expires|Expiry', 'expir'),
+    ('Expires|Renewal', None),
+    ('(C|c)hanged:\\s*(?P<val>.+)', 'hanged:'),
+    ('(?P<val>[\\w.-]+@[\\w.-]+\\.[\\w]{2,6})', '@'),
+    ('\\[Status\\]\\s*(?P<val>.+)', '[status]'),
+    ('(?<=[ .]{2})(?P<val>[^ ]+)', None),
+])
+def test_get_regex_required_text(regex, expected):
+    assert Whois.get_regex_required_text(re.compile(regex, re.IGNORECASE)) == expected
+
+
+def test_parse_raw_whois():
+    with open('test_data/whois_responses.json') as f:
+        raw_data = json.load(f)['google.com']
+    result = Whois.parse_raw_whois(raw_data)
+    assert result['id'] == ['2138514_DOMAIN_COM-VRSN']
+    assert result['registrar'] == ['MarkMonitor, Inc.']
+    assert result['whois_server'] == ['whois.markmonitor.com']
+    assert result['creation_date'] == [datetime.datetime(1997, 9, 15, 0, 0)]
+    assert result['updated_date'] == [datetime.datetime(2019, 9, 9, 8, 39, 4)]
+    assert result['nameservers'] == ['ns1.google.com', 'ns2.google.com', 'ns4.google.com', 'ns3.google.com']
+    assert result['emails'] == ['abusecomplaints@markmonitor.com', 'whoisrequest@markmonitor.com']
+    assert len(result['status']) == 6
+    assert result['contacts']['registrant'] == {'country': 'US', 'organization': 'Google LLC', 'state': 'CA'}
+    assert result['contacts']['admin'] == {'country': 'US', 'name': 'Google LLC', 'state': 'CA'}
+    assert result['contacts']['billing'] is None
+
+
+@pytest.mark.parametrize('domain, expected', [
+    ('paloaltonetworks.com', 'whois.verisign-grs.com'),
+    ('test.aeroport.fr', 'whois.smallregistry.net'),
+    ('testaeroport.fr', 'whois.nic.fr'),
+    ('test.uk.net', 'whois.centralnic.com'),
+    ('testuk.net', 'whois.verisign-grs.com'),
+])
+def test_get_root_server(domain, expected):
+    assert Whois.get_root_server(domain) == expected
+
+
+def test_get_root_server_unsupported_domain():
+    with pytest.raises(Whois.WhoisQueryFailedException):
+        Whois.get_root_server('test.zw')
+    with pytest.raises(Whois.WhoisException):
+        Whois.get_root_server('test.notatld')
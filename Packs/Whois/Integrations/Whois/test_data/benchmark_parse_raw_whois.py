@@ -0,0 +1,19 @@
+"""
+Measures the parsing time of the recorded WHOIS responses in whois_responses.json.
+Run it from the integration directory, with CommonServerPython and demistomock in the PYTHONPATH:
+    python test_data/benchmark_parse_raw_whois.py [iterations]
+"""
+import json
+import sys
+import timeit
+
+import demistomock as demisto  # noqa: F401 # pylint: disable=unused-import
+import Whois
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with open('test_data/whois_responses.json') as f:
+        responses = json.load(f)
+    for domain, raw_data in sorted(responses.items()):
+        seconds = timeit.timeit(lambda: Whois.parse_raw_whois(raw_data), number=iterations)
+        print('{}: {:.2f} ms per response'.format(domain, seconds * 1000 / iterations))
@@ -2,7 +2,9 @@ import os
 import threading
 import sys
 import json
+import hashlib
 import traceback
+from collections import OrderedDict
 
 if sys.version_info[0] < 3:
     import Queue as queue
@@ -12,6 +14,11 @@ else:
 __read_thread = None
 __input_queue = None
 
+# max number of compiled scripts kept in memory (0 disables the cache)
+COMPILED_CODE_CACHE_SIZE = int(os.environ.get('DEMISTO_COMPILED_CODE_CACHE_SIZE', '64'))
+# optional comma separated list of modules to import once when the container starts, e.g. requests,dateutil.parser
+PRELOAD_MODULES = os.environ.get('DEMISTO_PRELOAD_MODULES', '')
+
 win = sys.platform.startswith('win')
 if win:
     __input_queue = queue.Queue()
@@ -395,7 +402,8 @@ print = demisto_print
 # notifies demisto server that the current executed script is completed
 # and the process is ready to execute the next script
 def send_script_completed():
-    json.dump({'type': 'completed'}, sys.stdout)
+    json.dump({'type': 'completed', 'args': {'compileCacheHits': compiled_code_cache.hits,
+                                             'compileCacheMisses': compiled_code_cache.misses}}, sys.stdout)
     sys.stdout.write('\\n')
     sys.stdout.flush()
 
@@ -403,7 +411,7 @@ def send_script_completed():
 def send_script_exception(exc_type, exc_value, exc_traceback):
     ex_string = traceback.format_exception(exc_type, exc_value, exc_traceback)
     if ex_string == 'None\n':
-        ex_string = str(ex)
+        ex_string = str(exc_value)
 
     json.dump({'type': 'exception', 'args': {'exception': ex_string}}, sys.stdout)
     sys.stdout.write('\\n')
@@ -427,6 +435,47 @@ def do_ping_pong():
             return ping
 
 
+class CompiledCodeCache(object):
+    """LRU cache of compiled code objects keyed by the hash of the script content"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def get_code(self, code_string, is_integ_script):
+        key = hashlib.sha256(('1' if is_integ_script else '0').encode('utf-8') + code_string.encode('utf-8')).hexdigest()
+        code = self._cache.pop(key, None)
+        if code is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            template = integ_template_code if is_integ_script else template_code
+            code = compile(template.replace('###CODE_HERE###', code_string), '<string>', 'exec')
+        if self.max_size > 0:
+            # re-insert so the most recently used entry is the last one
+            self._cache[key] = code
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return code
+
+
+def preload_modules(module_names):
+    """Imports heavy modules once so scripts executed in this container find them in sys.modules"""
+    for module_name in module_names.split(','):
+        module_name = module_name.strip()
+        if not module_name:
+            continue
+        try:
+            __import__(module_name)
+        except Exception:
+            # the module is not installed in this docker image
+            pass
+
+
+compiled_code_cache = CompiledCodeCache(COMPILED_CODE_CACHE_SIZE)
+
 backup_env_vars = {}
 for key in os.environ.keys():
     backup_env_vars[key] = os.environ[key]
@@ -438,52 +487,53 @@ def rollback_system():
         os.environ[key] = backup_env_vars[key]
 
 
-while True:
-    contextString = do_ping_pong()
-    if contextString == '':
-        # finish executing python
-        break
+def main():
+    preload_modules(PRELOAD_MODULES)
 
-    contextJSON = json.loads(contextString)
+    while True:
+        contextString = do_ping_pong()
+        if contextString == '':
+            # finish executing python
+            break
 
-    code_string = contextJSON['script']
-    contextJSON.pop('script', None)
+        contextJSON = json.loads(contextString)
 
-    is_integ_script = contextJSON['integration']
-    complete_code = ''
-    if is_integ_script:
-        complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
-    else:
-        complete_code = template_code.replace('###CODE_HERE###', code_string)
+        code_string = contextJSON['script']
+        contextJSON.pop('script', None)
+
+        is_integ_script = contextJSON['integration']
 
-    try:
-        code = compile(complete_code, '<string>', 'exec')
+        try:
+            code = compiled_code_cache.get_code(code_string, is_integ_script)
 
-        sub_globals = {
-            '__readWhileAvailable': __readWhileAvailable,
-            'context': contextJSON,
-            'win': win
-        }
+            sub_globals = {
+                '__readWhileAvailable': __readWhileAvailable,
+                'context': contextJSON,
+                'win': win
+            }
 
-        exec(code, sub_globals, sub_globals)  # guardrails-disable-line
+            exec(code, sub_globals, sub_globals)  # guardrails-disable-line
 
-    except Exception as ex:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        send_script_exception(exc_type, exc_value, exc_traceback)
-    except SystemExit:
-        # print 'Will not stop on sys.exit(0)'
-        pass
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            send_script_exception(exc_type, exc_value, exc_traceback)
+        except SystemExit:
+            # print 'Will not stop on sys.exit(0)'
+            pass
 
-    rollback_system()
+        rollback_system()
 
-    # ping back to Demisto server that script is completed
-    send_script_completed()
+        # ping back to Demisto server that script is completed
+        send_script_completed()
+
+        # if the script running on native python then terminate the process after finished the script
+        is_python_native = contextJSON['native']
+        if is_python_native:
+            break
 
-    # if the script running on native python then terminate the process after finished the script
-    is_python_native = contextJSON['native']
-    if is_python_native:
-        break
+    if __read_thread:
+        __read_thread.join(timeout=1)
 
 
-if __read_thread:
-    __read_thread.join(timeout=1)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import sys
+
+from Utils._script_docker_python_loop import CompiledCodeCache, preload_modules
+
+
+def test_compiled_code_cache():
+    """
+    Given
+    - a compiled code cache of two scripts
+    When
+    - getting the code of scripts which were already compiled and of new ones
+    Then
+    - the code is compiled once per script content, and the least recently used script is evicted
+    """
+    cache = CompiledCodeCache(2)
+    first_code = cache.get_code('x = 1', False)
+    assert cache.get_code('x = 1', False) is first_code
+    # the same content in an integration is compiled with the integration template
+    assert cache.get_code('x = 1', True) is not first_code
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.get_code('x = 2', False)
+    assert cache.get_code('x = 1', True) is not None
+    assert cache.misses == 3
+    # the script which was used least recently was evicted
+    assert cache.get_code('x = 1', False) is not first_code
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_compiled_code_cache_disabled():
+    """
+    Given
+    - a compiled code cache with no size
+    When
+    - getting the code of the same script twice
+    Then
+    - the script is compiled every time
+    """
+    cache = CompiledCodeCache(0)
+    assert cache.get_code('x = 1', False) is not cache.get_code('x = 1', False)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_preload_modules():
+    """
+    Given
+    - a list of modules to preload, including a module which is not installed
+    When
+    - preloading the modules
+    Then
+    - the installed modules are imported and the missing module is skipped
+    """
+    sys.modules.pop('colorsys', None)
+    preload_modules(' colorsys, not_installed_module,')
+    assert 'colorsys' in sys.modules
+    assert 'not_installed_module' not in sys.modules